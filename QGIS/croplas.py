@@ -27,6 +27,13 @@ from qgis.core import (
 from qgis.PyQt.QtWidgets import QFileDialog
 
 import subprocess
+import numpy as np
+
+# Native cropping requires laspy, otherwise the R script is used
+try:
+    import laspy
+except ImportError:
+    laspy = None
 
 script_dir = "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/git/FieldworkTools/R"
 script_name = "crop_las.R"
@@ -83,6 +90,93 @@ def get_rscript_path(feedback = None):
     
     return None
 
+##Native cropping-------------------------------------------------------------
+CHUNK_SIZE = 2_000_000
+
+def geometry_rings(geometry):
+    """
+    Vertices of all rings (exteriors and holes) of a (multi)polygon
+    QgsGeometry as arrays of shape (n, 2).
+    """
+    polygons = geometry.asMultiPolygon() if geometry.isMultipart() \
+        else [geometry.asPolygon()]
+    return [
+        np.array([(p.x(), p.y()) for p in ring])
+        for polygon in polygons for ring in polygon
+        ]
+
+def points_in_polygon(x, y, rings):
+    """
+    Vectorised even-odd point-in-polygon test. Holes and multiple parts
+    are handled by counting crossings over all rings.
+    """
+    inside = np.zeros(len(x), dtype = bool)
+    for ring in rings:
+        x0, y0 = ring[:, 0], ring[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        for xa, ya, xb, yb in zip(x0, y0, x1, y1):
+            if ya == yb:
+                continue
+            crosses = (ya > y) != (yb > y)
+            x_cross = xa + (y - ya) * (xb - xa) / (yb - ya)
+            inside ^= crosses & (x < x_cross)
+    return inside
+
+def crop_las(las_path, rings, output_path, chunk_size = CHUNK_SIZE,
+             feedback = None):
+    """
+    Crop a LAS file to a polygon, reading and writing chunk by chunk so
+    that memory use does not depend on the file size. Points are tested
+    against the bounding box of the polygon first. Header bounds and
+    point counts of the output are updated by laspy when it is closed.
+    
+    Returns the number of points read and written, or None if the run
+    was cancelled. The incomplete output is removed in that case.
+    """
+    vertices = np.vstack(rings)
+    xmin, ymin = vertices.min(axis = 0)
+    xmax, ymax = vertices.max(axis = 0)
+    n_read = n_written = 0
+    cancelled = False
+    with laspy.open(las_path) as reader:
+        header = reader.header
+        if header.maxs[0] < xmin or header.mins[0] > xmax or \
+                header.maxs[1] < ymin or header.mins[1] > ymax:
+            raise ValueError(
+                "Point cloud and cropping polygon extents do not intersect."
+                )
+        with laspy.open(output_path, mode = "w", header = header) as writer:
+            for points in reader.chunk_iterator(chunk_size):
+                x = np.asarray(points.x)
+                y = np.asarray(points.y)
+                in_bbox = (x >= xmin) & (x <= xmax) & \
+                    (y >= ymin) & (y <= ymax)
+                idx = np.flatnonzero(in_bbox)
+                keep = idx[points_in_polygon(x[idx], y[idx], rings)]
+                if len(keep):
+                    writer.write_points(points[keep])
+                n_read += len(points)
+                n_written += len(keep)
+                if feedback is not None:
+                    if feedback.isCanceled():
+                        cancelled = True
+                        break
+                    feedback.setProgress(100 * n_read / header.point_count)
+    if cancelled:
+        os.remove(output_path)
+        return None
+    return n_read, n_written
+
+def las_crs(las_path):
+    """
+    CRS of a LAS file as QgsCoordinateReferenceSystem (None if unknown).
+    """
+    with laspy.open(las_path) as reader:
+        crs = reader.header.parse_crs()
+    if crs is None:
+        return None
+    return QgsCoordinateReferenceSystem.fromWkt(crs.to_wkt())
+
 ##CropPointCloud----------------------------------------------------------------
 class CropPointCloud(QgsProcessingAlgorithm):
     VECTOR = "VECTOR"
@@ -116,6 +210,31 @@ class CropPointCloud(QgsProcessingAlgorithm):
         
         output_path = self.parameterAsFile(parameters, self.OUTPUT, context)
         
+        if laspy is not None:
+            # Cropping polygon in the CRS of the point cloud
+            geometry = QgsGeometry.unaryUnion(
+                [f.geometry() for f in vector_layer.getFeatures()]
+                )
+            target_crs = las_crs(las_path)
+            if target_crs is not None and target_crs.isValid() and \
+                    target_crs != vector_layer.crs():
+                geometry.transform(QgsCoordinateTransform(
+                    vector_layer.crs(), target_crs, context.transformContext()
+                    ))
+            
+            feedback.pushInfo("Cropping point cloud...")
+            result = crop_las(
+                las_path, geometry_rings(geometry), output_path,
+                feedback = feedback
+                )
+            if result is None:
+                feedback.reportError("Cropping cancelled.")
+                return {}
+            n_read, n_written = result
+            feedback.pushInfo(f"Kept {n_written} of {n_read} points.")
+            feedback.pushInfo(f"Cropped point cloud saved to {output_path}")
+            return {}
+        
         # Path to your R script
         if not os.path.exists(os.path.join(script_dir, script_name)):
             feedback.reportError(f"R script not found: {script_dir}")
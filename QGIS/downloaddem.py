@@ -5,7 +5,8 @@ from qgis.core import (
     QgsProcessingParameterNumber, QgsApplication, QgsAuthMethodConfig,
     QgsRasterLayer, QgsCoordinateReferenceSystem,
     QgsProcessingParameterBoolean, QgsProcessingUtils,
-    QgsProcessingParameterRasterLayer, QgsPointXY
+    QgsProcessingParameterRasterLayer, QgsPointXY,
+    QgsProcessingParameterFile
     )
 from qgis import processing
 import os
@@ -14,9 +15,225 @@ import math
 import tempfile
 import requests
 import zipfile
+import importlib.util
+from pathlib import Path
+from osgeo import gdal
 
 default_geoid = "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/git/FieldworkTools/data/egm96/us_nga_egm96_15.tif"
 
+OPENTOPOGRAPHY_URL = "https://portal.opentopography.org/API/globaldem"
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".fieldworktools", "dem_cache"
+    )
+TILE_SIZE = 0.25
+CHUNK_SIZE = 1024 * 1024
+MAX_RETRIES = 5
+TIMEOUT = 60
+# Metadata item read by the flightplanner (see flightplanner/lib/geoid.py)
+DATUM_TAG = "VERTICAL_DATUM"
+
+##Geoid and vertical datum------------------------------------------------------
+def get_geoid():
+    """
+    EGM96 geoid grid of the repository. The geoid module of the
+    flightplanner is loaded by its file path, so neither its directory
+    is put on sys.path nor is the repository needed unless the geoid is
+    added.
+    """
+    candidates = [Path(default_geoid).parents[2]]
+    try:
+        candidates.insert(0, Path(__file__).resolve().parent.parent)
+    except NameError:
+        # __file__ is undefined when run from the QGIS script editor
+        pass
+    for repo_dir in candidates:
+        module_path = repo_dir / "flightplanner" / "lib" / "geoid.py"
+        if module_path.is_file():
+            break
+    else:
+        raise Exception(
+            "FieldworkTools repository not found, but required to add the " +
+            "geoid. Adjust default_geoid in downloaddem.py."
+            )
+    spec = importlib.util.spec_from_file_location(
+        "fieldworktools_geoid", module_path
+        )
+    geoid = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(geoid)
+    return geoid.get_geoid(
+        str(repo_dir / "data" / "egm96" / "us_nga_egm96_15.tif")
+        )
+
+def set_vertical_datum(path, datum):
+    """
+    Store the vertical datum (egm96 or ellipsoid) in the raster metadata.
+    """
+    dataset = gdal.Open(path, gdal.GA_Update)
+    if dataset is None:
+        raise Exception(f"Cannot open {path} to set its vertical datum.")
+    dataset.SetMetadataItem(DATUM_TAG, datum)
+    dataset = None
+
+##Tile cache--------------------------------------------------------------------
+def tile_indices(west, south, east, north, tile_size = TILE_SIZE):
+    """
+    Indices (column, row) of the cache grid tiles covering an extent.
+    """
+    columns = range(
+        math.floor(west / tile_size), math.ceil(east / tile_size)
+        )
+    rows = range(
+        math.floor(south / tile_size), math.ceil(north / tile_size)
+        )
+    return [(i, j) for j in rows for i in columns]
+
+def tile_bounds(i, j, tile_size = TILE_SIZE):
+    """
+    Extent (west, south, east, north) of a cache grid tile.
+    """
+    return (
+        i * tile_size, j * tile_size, (i + 1) * tile_size, (j + 1) * tile_size
+        )
+
+def tile_path(cache_dir, dem_type, i, j, tile_size = TILE_SIZE):
+    """
+    Cache file of a tile. The directory is keyed by product and tile
+    size, the file name by the south-west corner of the tile.
+    """
+    west, south, _, _ = tile_bounds(i, j, tile_size)
+    name = "{0}{1:05.2f}_{2}{3:06.2f}.tif".format(
+        "N" if south >= 0 else "S", abs(south),
+        "E" if west >= 0 else "W", abs(west)
+        )
+    return os.path.join(cache_dir, dem_type, f"{tile_size:g}deg", name)
+
+def download_file(
+        url, dst, params = None, headers = None, session = None,
+        chunk_size = CHUNK_SIZE, max_retries = MAX_RETRIES
+        ):
+    """
+    Download a file with resumable HTTP Range requests. Data is written
+    to dst + ".part", which is renamed to dst when complete, so that an
+    interrupted download continues where it stopped.
+    
+    Returns dst, or the decoded body if the server answered with JSON
+    instead of a file.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok = True)
+    part = dst + ".part"
+    session = requests.Session() if session is None else session
+    for attempt in range(max_retries):
+        pos = os.path.getsize(part) if os.path.exists(part) else 0
+        request_headers = dict(headers or {})
+        if pos:
+            request_headers["Range"] = f"bytes={pos}-"
+        try:
+            with session.get(
+                url, params = params, headers = request_headers,
+                stream = True, timeout = TIMEOUT
+                ) as r:
+                if r.status_code == 416 and pos:
+                    # Nothing left to download
+                    break
+                r.raise_for_status()
+                if "application/json" in r.headers.get("Content-Type", ""):
+                    return r.json()
+                resumed = r.status_code == 206 and r.headers.get(
+                    "Content-Range", ""
+                    ).startswith(f"bytes {pos}-")
+                with open(part, "ab" if resumed else "wb") as f:
+                    for chunk in r.iter_content(chunk_size = chunk_size):
+                        f.write(chunk)
+            break
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.Timeout
+            ):
+            if attempt == max_retries - 1:
+                raise
+            time.sleep(2 ** attempt)
+    os.replace(part, dst)
+    return dst
+
+def fetch_opentopography_tile(
+        dem_type, bounds, apikey, dst, base_url = OPENTOPOGRAPHY_URL,
+        session = None
+        ):
+    """
+    Download the DEM of one extent from the OpenTopography global DEM
+    API, following the download URL if the API returns one as JSON.
+    """
+    west, south, east, north = bounds
+    params = {
+        "demtype": dem_type, "south": south, "north": north,
+        "west": west, "east": east, "outputFormat": "GTiff",
+        "API_Key": apikey
+        }
+    result = download_file(
+        base_url, dst, params = params, headers = {"accept": "*/*"},
+        session = session
+        )
+    if isinstance(result, dict):
+        download_url = result.get("result", {}).get("URL")
+        if not download_url:
+            raise Exception(f"No download URL found in API response: {result}")
+        result = download_file(download_url, dst, session = session)
+    return result
+
+def get_dem_tiles(
+        dem_type, west, south, east, north, apikey,
+        cache_dir = DEFAULT_CACHE_DIR, tile_size = TILE_SIZE,
+        base_url = OPENTOPOGRAPHY_URL, feedback = None
+        ):
+    """
+    Cached DEM tiles covering an extent. Only tiles missing from the
+    cache are downloaded.
+    
+    Returns
+    -------
+    list of str
+        Paths to the tiles.
+    """
+    tiles = tile_indices(west, south, east, north, tile_size)
+    paths = [tile_path(cache_dir, dem_type, i, j, tile_size) for i, j in tiles]
+    missing = [
+        (tile, path) for tile, path in zip(tiles, paths)
+        if not os.path.isfile(path)
+        ]
+    if feedback is not None:
+        feedback.pushInfo(
+            f"{len(tiles)} DEM tiles required, {len(missing)} not cached."
+            )
+    with requests.Session() as session:
+        for k, ((i, j), path) in enumerate(missing):
+            if feedback is not None:
+                if feedback.isCanceled():
+                    break
+                feedback.pushInfo(f"Downloading tile {os.path.basename(path)}")
+                feedback.setProgress(100 * k / len(missing))
+            fetch_opentopography_tile(
+                dem_type, tile_bounds(i, j, tile_size), apikey, path,
+                base_url = base_url, session = session
+                )
+    return paths
+
+def mosaic_tiles(tile_paths, bounds, output_file):
+    """
+    Mosaic cached tiles and crop them to an extent (west, south, east,
+    north).
+    """
+    west, south, east, north = bounds
+    dataset = gdal.Warp(
+        output_file, tile_paths, outputBounds = (west, south, east, north),
+        format = "GTiff", creationOptions = ["COMPRESS=DEFLATE", "TILED=YES"]
+        )
+    if dataset is None:
+        raise Exception(f"Failed to mosaic DEM tiles into {output_file}")
+    dataset = None
+    return output_file
+
+##ASTER GDEM--------------------------------------------------------------------
 def get_aster_dem(west, south, east, north, output_file, user, password):
     appeears_api = "https://appeears.earthdatacloud.nasa.gov/api/"
     response = requests.post(
@@ -111,10 +328,11 @@ def get_aster_dem(west, south, east, north, output_file, user, password):
                     stream = True
                 )
                 with open(output_file, "wb") as fd:
-                    for chunk in response.iter_content(chunk_size = 8192):
+                    for chunk in response.iter_content(chunk_size = CHUNK_SIZE):
                         fd.write(chunk)
                 print(f"Downloaded {out_name}")
 
+##DEM download------------------------------------------------------------------
 class GetDEMFromOpenTopography(QgsProcessingAlgorithm):
     def initAlgorithm(self, config = None):
         self.dem_options = [
@@ -160,6 +378,15 @@ class GetDEMFromOpenTopography(QgsProcessingAlgorithm):
                 defaultValue = True
             )
         )
+        self.addParameter(
+            QgsProcessingParameterFile(
+                "CACHE_DIR",
+                "DEM tile cache directory",
+                behavior = QgsProcessingParameterFile.Folder,
+                defaultValue = DEFAULT_CACHE_DIR,
+                optional = True
+            )
+        )
     def processAlgorithm(self, parameters, context, feedback):
         polygon = self.parameterAsSource(parameters, "POLYGON", context)
         dem_type = self.dem_options[
@@ -170,6 +397,9 @@ class GetDEMFromOpenTopography(QgsProcessingAlgorithm):
         add_geoid = self.parameterAsBool(
             parameters, "ADD_GEOID", context
             )
+        cache_dir = self.parameterAsFile(
+            parameters, "CACHE_DIR", context
+            ) or DEFAULT_CACHE_DIR
         
         extent = polygon.sourceExtent()
         west = extent.xMinimum() - buffer_deg
@@ -222,75 +452,28 @@ class GetDEMFromOpenTopography(QgsProcessingAlgorithm):
         else:
             apikey = mconfig.config("key")
             
-            url = (
-                f"https://portal.opentopography.org/API/globaldem?"
-                f"demtype={dem_type}&south={south}&north={north}"
-                f"&west={west}&east={east}&outputFormat=GTiff&API_Key={apikey}"
-            )
-            
-            feedback.pushInfo(f"Requesting DEM: {url}")
-            response = requests.get(url, headers = {"accept": "*/*"})
-            response.raise_for_status()
-            content_type = response.headers.get("Content-Type", "")
-            if "application/json" in content_type:
-                try:
-                    data = response.json()
-                except ValueError:
-                    feedback.pushInfo(
-                        f"Response is not valid JSON:\n{response.text}"
-                        )
-                    raise Exception("API returned invalid JSON")
-                download_url = data.get("result", {}).get("URL")
-                if not download_url:
-                    feedback.pushInfo(f"API response:\n{data}")
-                    raise Exception("No download URL found in JSON response")
-                
-                feedback.pushInfo(f"Downloading from URL: {download_url}")
-                r = requests.get(download_url, stream = True)
-                r.raise_for_status()
-                content_stream = r
-            else:
-                # Response is the file itself
-                feedback.pushInfo("Response contains the DEM file directly")
-                content_stream = response
-            # Write to file
-            with open(output_file, "wb") as f:
-                for chunk in content_stream.iter_content(chunk_size = 8192):
-                    f.write(chunk)
+            tile_paths = get_dem_tiles(
+                dem_type, west, south, east, north, apikey,
+                cache_dir = cache_dir, feedback = feedback
+                )
+            if feedback.isCanceled():
+                return {}
+            feedback.pushInfo("Mosaicking cached DEM tiles.")
+            mosaic_tiles(tile_paths, (west, south, east, north), output_file)
         
         if add_geoid:
             feedback.pushInfo("Download complete. Adding geoid height.")
 
-            raster1 = QgsRasterLayer(output_file, "dem")
-            raster2 = QgsRasterLayer(default_geoid, "geoid")
-            
-            # Subtract geoid
-            centre_x = (
-                raster1.extent().xMinimum() + raster1.extent().xMaximum()
-                ) / 2
-            centre_y = (
-                raster1.extent().yMinimum() + raster1.extent().yMaximum()
-                ) / 2
-            geoid_value, valid = raster2.dataProvider().sample(
-                    QgsPointXY(centre_x, centre_y), 1
-                )
-
-            processing.run(
-                "gdal:rastercalculator",
-                {
-                "INPUT_A": output_file,
-                "BAND_A": 1,
-                "FORMULA": f"A + {geoid_value}",
-                "OUTPUT": final_output,
-                "RTYPE": 6
-                },
-                context = context,
-                feedback = feedback
-            )
+            # Per-pixel EGM96 undulation, processed in blocks
+            get_geoid().correct_raster(output_file, final_output)
         
         else:
             feedback.pushInfo("Download complete.")
         
+        # The global DEMs hold heights above the geoid; with the geoid
+        # added, they are ellipsoidal and must not be corrected again
+        set_vertical_datum(final_output, "ellipsoid" if add_geoid else "egm96")
+        
         return {"OUTPUT": final_output}
 
     def name(self):
@@ -27,6 +27,13 @@ from qgis.core import (
 from qgis.PyQt.QtWidgets import QFileDialog
 
 import subprocess
+import numpy as np
+
+# Native merging requires laspy, otherwise the R script is used
+try:
+    import laspy
+except ImportError:
+    laspy = None
 
 script_dir = "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/git/FieldworkTools/R"
 script_name = "merge_las.R"
@@ -83,6 +90,120 @@ def get_rscript_path(feedback = None):
     
     return None
 
+##Native merging--------------------------------------------------------------
+CHUNK_SIZE = 2_000_000
+INT32_MAX = 2 ** 31 - 1
+
+def merged_header(las_paths):
+    """
+    Build the header of the merged point cloud from the input headers
+    only (no points are read).
+    
+    All inputs must share point format and version. The output keeps the
+    common scales and offsets if they are equal and cover the merged
+    extent; otherwise the finest scale and an offset at the minimum of
+    the merged extent are used.
+    
+    Returns the output header and, per input, whether its points have to
+    be rescaled.
+    """
+    headers = []
+    for path in las_paths:
+        with laspy.open(path) as reader:
+            headers.append(reader.header)
+    
+    first = headers[0]
+    for path, header in zip(las_paths, headers):
+        if header.point_format != first.point_format:
+            raise ValueError(
+                f"Point format of {path} ({header.point_format.id}) differs " +
+                f"from {las_paths[0]} ({first.point_format.id})."
+                )
+        if header.version != first.version:
+            raise ValueError(
+                f"LAS version of {path} ({header.version}) differs from " +
+                f"{las_paths[0]} ({first.version})."
+                )
+    
+    mins = np.min([h.mins for h in headers], axis = 0)
+    maxs = np.max([h.maxs for h in headers], axis = 0)
+    scales = np.min([h.scales for h in headers], axis = 0)
+    offsets = np.asarray(first.offsets, dtype = float)
+    same_scaling = all(
+        np.allclose(h.scales, first.scales) and
+        np.allclose(h.offsets, first.offsets) for h in headers
+        )
+    def fits(offsets):
+        extent = np.vstack([mins, maxs]) - offsets
+        return np.all(np.abs(extent / scales) < INT32_MAX)
+    
+    if not (same_scaling and fits(offsets)):
+        offsets = np.floor(mins)
+        if not fits(offsets):
+            raise ValueError(
+                f"The merged extent {mins} to {maxs} cannot be stored " +
+                f"with scales {scales} in 32-bit integer coordinates. " +
+                "Merge fewer or smaller point clouds."
+                )
+    
+    header = laspy.LasHeader(
+        point_format = first.point_format, version = first.version
+        )
+    header.scales = scales
+    header.offsets = offsets
+    header.vlrs = first.vlrs
+    header.mins = mins
+    header.maxs = maxs
+    header.point_count = sum(h.point_count for h in headers)
+    
+    rescale = [
+        not (np.allclose(h.scales, scales) and np.allclose(h.offsets, offsets))
+        for h in headers
+        ]
+    return header, rescale
+
+def merge_las(las_paths, output_path, chunk_size = CHUNK_SIZE, feedback = None):
+    """
+    Merge LAS files by streaming their points chunk by chunk into one
+    output file. Points are rescaled only for inputs whose scales or
+    offsets differ from the output.
+    
+    Returns the number of points written, or None if the run was
+    cancelled. The incomplete output is removed in that case.
+    """
+    header, rescale = merged_header(las_paths)
+    total = header.point_count
+    n_written = 0
+    cancelled = False
+    with laspy.open(output_path, mode = "w", header = header) as writer:
+        for path, needs_rescale in zip(las_paths, rescale):
+            if cancelled:
+                break
+            if feedback is not None:
+                feedback.pushInfo(f"Adding {os.path.basename(path)}...")
+            with laspy.open(path) as reader:
+                for points in reader.chunk_iterator(chunk_size):
+                    if needs_rescale:
+                        record = laspy.ScaleAwarePointRecord.zeros(
+                            len(points), header = writer.header
+                            )
+                        record.array[:] = points.array
+                        record.x = points.x
+                        record.y = points.y
+                        record.z = points.z
+                        points = record
+                    writer.write_points(points)
+                    n_written += len(points)
+                    if feedback is not None:
+                        if feedback.isCanceled():
+                            cancelled = True
+                            break
+                        feedback.setProgress(100 * n_written / max(total, 1))
+    if cancelled:
+        os.remove(output_path)
+        return None
+    return n_written
+
 ##CropPointCloud----------------------------------------------------------------
 class MergePointCloud(QgsProcessingAlgorithm):
     POINTCLOUDS = "POINTCLOUDS"
@@ -109,6 +230,28 @@ class MergePointCloud(QgsProcessingAlgorithm):
         
         output_path = self.parameterAsFile(parameters, self.OUTPUT, context)
         
+        if laspy is not None:
+            # The output may be written to the input folder
+            las_files = sorted(
+                os.path.join(las_paths, f) for f in os.listdir(las_paths)
+                if f.lower().endswith(".las") and os.path.abspath(
+                    os.path.join(las_paths, f)
+                    ) != os.path.abspath(output_path)
+                )
+            if not las_files:
+                feedback.reportError(f"No *.las files found in {las_paths}.")
+                return {}
+            feedback.pushInfo("Input files:\n" + "\n".join(las_files))
+            
+            n_written = merge_las(las_files, output_path, feedback = feedback)
+            if n_written is None:
+                feedback.reportError("Merging cancelled.")
+                return {}
+            feedback.pushInfo(
+                f"Merged {n_written} points into {output_path}"
+                )
+            return {}
+        
         # Path to your R script
         if not os.path.exists(os.path.join(script_dir, script_name)):
             feedback.reportError(f"R script not found: {script_dir}")
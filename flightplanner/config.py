@@ -62,6 +62,7 @@ class Defaults(Config):
     gridmode: str = "lines"
     safetybuffer: float = 10.0
     dtm_follow_segment_length: float = 20.0
+    dtm_datum: str = "auto"
     
     def __post_init__(self):
         self.setupchoices = (
@@ -96,6 +96,15 @@ parser.add_argument(
     "--dtm_path", "-dtm", type = str,
     help = "Path to the DTM file (required when altitude type is 'dtm')."
     )
+parser.add_argument(
+    "--dtm_datum", "-dtmd", type = str, default = defaults.dtm_datum,
+    choices = ["auto", "egm96", "ellipsoid"],
+    help = "Vertical datum of the DTM. Heights above the EGM96 geoid are " +
+        "converted to the ellipsoidal waypoint altitudes used by DJI. " +
+        "With auto, the datum is read from the DTM metadata (written by " +
+        "QGIS/downloaddem.py); untagged DTMs require egm96 or ellipsoid. " +
+        f"Defaults to {defaults.dtm_datum}."
+    )
 parser.add_argument(
     "--dtm_follow_segment_length", "-dtmseg", type = float,
     default = defaults.dtm_follow_segment_length,
@@ -41,6 +41,48 @@ def compile_action_group(
 
 #==============================================================================
 # Classes
+#------------------------------------------------------------------------------
+## Action group registry
+class ActionGroupRegistry():
+    """
+    Book-keeping of the action groups created for a single mission.
+
+    Groups are stored per class, together with their position within
+    that class, so that instance indices and the groups that still wait
+    for an end waypoint are available without scanning all groups ever
+    created.
+    """
+    def __init__(self):
+        self._instances = {}
+        self._open = {}
+    
+    def __len__(self):
+        return sum(len(groups) for groups in self._instances.values())
+    
+    def register(self, action_group):
+        action_class = type(action_group)
+        instances = self._instances.setdefault(action_class, [])
+        action_group._registry_idx = len(instances)
+        instances.append(action_group)
+        if action_group._action_end_wp is None:
+            self._open.setdefault(action_class, {})[action_group] = None
+    
+    def release(self, action_group):
+        self._open.get(type(action_group), {}).pop(action_group, None)
+    
+    def instances(self, action_class):
+        return self._instances.get(action_class, [])
+    
+    def open_groups(self, action_class):
+        return list(self._open.get(action_class, {}))
+    
+    def clear(self):
+        self._instances.clear()
+        self._open.clear()
+
+# Registry for action groups of waypoints that do not belong to a mission
+default_registry = ActionGroupRegistry()
+
 #------------------------------------------------------------------------------
 ## Action main class
 class ActionGroup():
@@ -60,6 +102,12 @@ class ActionGroup():
         self.config = config or getattr(
             waypoint, "config", None
             ) or globals()["config"]
+        self.registry = getattr(
+            getattr(waypoint, "mission", None), "action_groups", None
+            )
+        if self.registry is None:
+            self.registry = default_registry
+        self.registry.register(self)
     
     @property
     def action_start_wp(self):
@@ -71,13 +119,14 @@ class ActionGroup():
 
     @property
     def instance_idx(self):
-        return self.__class__.instances.index(self)
+        return self._registry_idx
     
     def __repr__(self):
         return f"ActionGroup: {self.actions}"
     
     def end_action_group(self, action_end_wp):
         self._action_end_wp = action_end_wp
+        self.registry.release(self)
     
     def add_action(self, action, **params):
         if not issubclass(action, Action):
@@ -88,13 +137,12 @@ class ActionGroup():
     
     def stop_action(self, action_class, index = None):
         if index is None:
-            for target in action_class.instances:
-                if target._action_end_wp is None and hasattr(
-                    self.waypoint, "index"
-                    ):
-                    target.end_action_group(self.waypoint)
-        elif index < len(action_class.instances):
-            target = action_class.instances[index]
+            targets = self.registry.open_groups(action_class)
+        elif index < len(self.registry.instances(action_class)):
+            targets = [self.registry.instances(action_class)[index]]
+        else:
+            targets = []
+        for target in targets:
             if target._action_end_wp is None and hasattr(
                 self.waypoint, "index"
                 ):
@@ -107,7 +155,6 @@ class ActionGroup():
 #------------------------------------------------------------------------------
 ## Specific action group classes
 class AircraftCalibrationGroup(ActionGroup):
-    instances = []
     def __init__(
             self,
             waypoint = None,
@@ -117,14 +164,12 @@ class AircraftCalibrationGroup(ActionGroup):
             config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             AircraftCalibration(self), Hover.new(self, 0.5)
         ] if hover else [AircraftCalibration(self)]
 
 class PrepareTimelapseNadirMSMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None,
@@ -132,7 +177,6 @@ class PrepareTimelapseNadirMSMapping(ActionGroup):
             config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "betweenAdjacentPoints"
         self.actions = [
             Pitch(
@@ -144,13 +188,11 @@ class PrepareTimelapseNadirMSMapping(ActionGroup):
         ]
 
 class StartNadirMSMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None, action_trigger_param = None,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "multipleDistance"
         self.action_trigger_param = action_trigger_param
         self.actions = [
@@ -163,13 +205,11 @@ class StartNadirMSMapping(ActionGroup):
         ]
 
 class StopNadirMSMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             StopContinuousShoot.new(self, ",".join(self.config.sensortypes))
@@ -177,7 +217,6 @@ class StopNadirMSMapping(ActionGroup):
         self.link_to([StartNadirMSMapping])
 
 class PrepareObliqueMSMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None, config = None
@@ -188,7 +227,6 @@ class PrepareObliqueMSMapping(ActionGroup):
             action_end_wp = action_end_wp or waypoint,
             config = config
             )
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             Pitch(
@@ -201,13 +239,11 @@ class PrepareObliqueMSMapping(ActionGroup):
         self.link_to([StartNadirMSMapping])
 
 class StartObliqueMSMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None, action_trigger_param = None,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "multipleDistance"
         self.action_trigger_param = action_trigger_param
         self.actions = [
@@ -221,13 +257,11 @@ class StartObliqueMSMapping(ActionGroup):
         self.link_to([StartNadirMSMapping])
 
 class StopObliqueMSMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             StopContinuousShoot.new(self, ",".join(self.config.sensortypes))
@@ -235,13 +269,11 @@ class StopObliqueMSMapping(ActionGroup):
         self.link_to([StartObliqueMSMapping])
 
 class StartRecordPointCloud(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None, imu_calibration = False,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             RecordPointCloud.new(self, "startRecord")
@@ -250,13 +282,11 @@ class StartRecordPointCloud(ActionGroup):
         self.actions.insert(0, AircraftCalibration(self))
 
 class StartLiDARMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None, action_trigger_param = None,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "multipleDistance"
         self.action_trigger_param = action_trigger_param
         self.actions = [
@@ -269,13 +299,11 @@ class StartLiDARMapping(ActionGroup):
         ]
 
 class StopRecordPointCloud(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             RecordPointCloud.new(self, "stopRecord")
@@ -284,7 +312,6 @@ class StopRecordPointCloud(ActionGroup):
         self.actions.insert(0, AircraftCalibration(self))
 
 class PrepareObliqueLiDARMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None, config = None
@@ -295,7 +322,6 @@ class PrepareObliqueLiDARMapping(ActionGroup):
             action_end_wp = action_end_wp or waypoint,
             config = config
             )
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             Pitch(
@@ -308,13 +334,11 @@ class PrepareObliqueLiDARMapping(ActionGroup):
         self.link_to([StartLiDARMapping])
 
 class StartObliqueLiDARMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None, action_trigger_param = None,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "multipleDistance"
         self.actions = [
             Pitch(
@@ -327,13 +351,11 @@ class StartObliqueLiDARMapping(ActionGroup):
         self.link_to([StartNadirMSMapping])
 
 class StopObliqueLiDARMapping(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None, config = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp, config)
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             Pitch(
@@ -199,6 +199,74 @@ def segment_duration(wp0, wp1):
 
     return duration
 
+def waypoint_distances(waypoints):
+    """
+    Calculate the distances between consecutive waypoints in one
+    vectorised geodesic computation.
+
+    Parameters
+    ----------
+    waypoints : list of Waypoint
+        Ordered waypoints.
+
+    Returns
+    -------
+    numpy.ndarray
+        The 3D distances in meters between waypoint i and i + 1.
+    """
+    if len(waypoints) < 2:
+        return np.zeros(0)
+    
+    g = Geod(ellps = "WGS84")
+    
+    coordinates = np.array([wp.coordinates for wp in waypoints], dtype = float)
+    altitudes = np.array(
+        [np.nan if wp.altitude is None else wp.altitude for wp in waypoints],
+        dtype = float
+        )
+    
+    _, _, horizontal = g.inv(
+        coordinates[:-1, 0], coordinates[:-1, 1],
+        coordinates[1:, 0], coordinates[1:, 1]
+        )
+    
+    vertical = np.diff(altitudes)
+    if np.isnan(vertical).any():
+        warn(
+            "Altitude information is missing for one or more " +
+            "waypoints. Cannot compute accurrate distance."
+            )
+        vertical = np.nan_to_num(vertical, nan = 0.0)
+    
+    return np.hypot(horizontal, vertical)
+
+def segment_durations(waypoints):
+    """
+    Calculate the durations of all flight segments between consecutive
+    waypoints.
+
+    Parameters
+    ----------
+    waypoints : list of Waypoint
+        Ordered waypoints.
+
+    Returns
+    -------
+    numpy.ndarray
+        The durations of the flight segments in seconds. Segments
+        starting at a waypoint without positive speed are NaN.
+    """
+    speeds = np.array(
+        [np.nan if wp.velocity is None else wp.velocity
+         for wp in waypoints[:-1]],
+        dtype = float
+        )
+    distances = waypoint_distances(waypoints)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        durations = np.where(speeds > 0, distances / speeds, np.nan)
+    
+    return durations
+
 def segment_altitude(
         dtm_path,
         wpt0,
@@ -0,0 +1,252 @@
+import os
+import numpy as np
+
+# The grid is read with rasterio or, e.g., within QGIS, with GDAL
+try:
+    import rasterio
+    from rasterio.windows import Window
+except ImportError:
+    rasterio = None
+    from osgeo import gdal
+
+# Settings--------------------------------------------------------------
+DEFAULT_GEOID = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..",
+    "data", "egm96", "us_nga_egm96_15.tif"
+    ))
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".fieldworktools", "geoid")
+BLOCK_SIZE = 1024
+# Raster metadata item with the vertical datum (egm96 or ellipsoid), as
+# written by QGIS/downloaddem.py
+DATUM_TAG = "VERTICAL_DATUM"
+
+_grids = {}
+
+# Functions-------------------------------------------------------------
+def _read_grid(path):
+    """
+    Read band 1 and the georeference (west, north, x resolution,
+    y resolution) of a raster in EPSG:4326.
+    """
+    if rasterio is not None:
+        with rasterio.open(path) as src:
+            if not src.crs.is_geographic:
+                raise NotImplementedError(
+                    "Geoid raster CRS is not EPSG:4326."
+                    )
+            values = src.read(1).astype(np.float32)
+            nodata = src.nodata
+            t = src.transform
+            georeference = (t.c, t.f, t.a, -t.e)
+    else:
+        src = gdal.Open(path)
+        if src is None:
+            raise FileNotFoundError(f"Cannot open geoid raster: {path}")
+        band = src.GetRasterBand(1)
+        values = band.ReadAsArray().astype(np.float32)
+        nodata = band.GetNoDataValue()
+        t = src.GetGeoTransform()
+        georeference = (t[0], t[3], t[1], -t[5])
+        src = None
+    if nodata is not None:
+        values[values == nodata] = np.nan
+    return values, georeference
+
+def _pixel_centres(west, north, res_x, res_y, col_off, row_off, width, height):
+    lon = west + (col_off + np.arange(width) + 0.5) * res_x
+    lat = north - (row_off + np.arange(height) + 0.5) * res_y
+    return lon, lat
+
+def get_geoid(path = DEFAULT_GEOID):
+    """
+    Geoid grid of a raster, loaded only once per process.
+    """
+    key = os.path.abspath(path)
+    if key not in _grids:
+        _grids[key] = GeoidGrid(path)
+    return _grids[key]
+
+def geoid_undulation(lon, lat, path = DEFAULT_GEOID):
+    """
+    Geoid undulation (EGM96 by default) at the given locations in
+    metres. Add it to heights above the geoid to obtain ellipsoidal
+    heights.
+    """
+    return get_geoid(path).undulation(lon, lat)
+
+def read_datum(path):
+    """
+    Vertical datum stored in the raster metadata, or None if the raster
+    is not tagged.
+    """
+    if rasterio is not None:
+        with rasterio.open(path) as src:
+            datum = src.tags().get(DATUM_TAG)
+    else:
+        src = gdal.Open(path)
+        if src is None:
+            raise FileNotFoundError(f"Cannot open raster: {path}")
+        datum = src.GetMetadataItem(DATUM_TAG)
+        src = None
+    return None if datum is None else datum.lower()
+
+# Classes---------------------------------------------------------------
+class GeoidGrid():
+    """
+    Geoid undulation grid (EPSG:4326) for bilinear interpolation.
+
+    The grid is converted once to a .npy file in the cache directory and
+    memory-mapped from there, so repeated loads neither decompress the
+    GeoTIFF nor copy the grid into memory.
+
+    Parameters
+    ----------
+    path : str, optional
+        Geoid raster. Defaults to the EGM96 15' grid in data/egm96.
+    cache_dir : str, optional
+        Directory of the memory-mapped grid.
+    """
+    def __init__(self, path = DEFAULT_GEOID, cache_dir = CACHE_DIR):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Geoid raster not found: {path}")
+        self.path = path
+        name = os.path.splitext(os.path.basename(path))[0]
+        cache_path = os.path.join(cache_dir, name + ".npy")
+        georeference_path = os.path.join(cache_dir, name + ".georef.npy")
+
+        if not os.path.isfile(georeference_path) or \
+                os.path.getmtime(georeference_path) < os.path.getmtime(path):
+            values, georeference = _read_grid(path)
+            os.makedirs(cache_dir, exist_ok = True)
+            for dst, array in (
+                    (cache_path, values),
+                    (georeference_path, np.asarray(georeference))
+                    ):
+                with open(dst + ".part", "wb") as f:
+                    np.save(f, array)
+                os.replace(dst + ".part", dst)
+
+        self.values = np.load(cache_path, mmap_mode = "r")
+        self.west, self.north, self.res_x, self.res_y = np.load(
+            georeference_path
+            )
+        self.height, self.width = self.values.shape
+
+    def undulation(self, lon, lat):
+        """
+        Bilinearly interpolated geoid undulation.
+
+        Parameters
+        ----------
+        lon, lat : float or array-like
+            Longitudes and latitudes in decimal degrees (broadcastable).
+
+        Returns
+        -------
+        numpy.ndarray
+            Geoid heights above the WGS84 ellipsoid in metres.
+        """
+        lon, lat = np.broadcast_arrays(
+            np.asarray(lon, dtype = float), np.asarray(lat, dtype = float)
+            )
+        lon = (lon + 180) % 360 - 180
+        # Fractional positions relative to the first pixel centre
+        col = (lon - self.west) / self.res_x - 0.5
+        row = (self.north - lat) / self.res_y - 0.5
+        c0 = np.clip(np.floor(col), 0, self.width - 2).astype(int)
+        r0 = np.clip(np.floor(row), 0, self.height - 2).astype(int)
+        fc = np.clip(col - c0, 0, 1)
+        fr = np.clip(row - r0, 0, 1)
+
+        v = self.values
+        top = v[r0, c0] * (1 - fc) + v[r0, c0 + 1] * fc
+        bottom = v[r0 + 1, c0] * (1 - fc) + v[r0 + 1, c0 + 1] * fc
+        return top * (1 - fr) + bottom * fr
+
+    def correct_raster(self, src_path, dst_path, sign = 1,
+                       block_size = BLOCK_SIZE):
+        """
+        Add (sign = 1) or subtract (sign = -1) the geoid undulation per
+        pixel, processing the raster in blocks. For instance, adding
+        converts EGM96 heights to ellipsoidal heights.
+
+        Parameters
+        ----------
+        src_path : str
+            Input raster in EPSG:4326.
+        dst_path : str
+            Output GeoTIFF (float32).
+        sign : int, optional
+            1 to add, -1 to subtract the undulation. The default is 1.
+        block_size : int, optional
+            Block width and height in pixels. The default is 1024.
+        """
+        if rasterio is not None:
+            self._correct_raster_rasterio(src_path, dst_path, sign, block_size)
+        else:
+            self._correct_raster_gdal(src_path, dst_path, sign, block_size)
+        return dst_path
+
+    def _blocks(self, width, height, block_size):
+        for row_off in range(0, height, block_size):
+            for col_off in range(0, width, block_size):
+                yield (
+                    col_off, row_off,
+                    min(block_size, width - col_off),
+                    min(block_size, height - row_off)
+                    )
+
+    def _correct_raster_rasterio(self, src_path, dst_path, sign, block_size):
+        with rasterio.open(src_path) as src:
+            if not src.crs.is_geographic:
+                raise NotImplementedError(
+                    "Input raster CRS is not EPSG:4326. CRS transformation " +
+                    "is not implemented."
+                    )
+            t = src.transform
+            georeference = (t.c, t.f, t.a, -t.e)
+            nodata = src.nodata
+            profile = src.profile
+            profile.update(
+                driver = "GTiff", dtype = "float32", count = 1,
+                compress = "deflate", tiled = True,
+                blockxsize = 256, blockysize = 256
+                )
+            with rasterio.open(dst_path, "w", **profile) as dst:
+                for block in self._blocks(src.width, src.height, block_size):
+                    window = Window(*block)
+                    data = src.read(1, window = window).astype(np.float32)
+                    lon, lat = _pixel_centres(*georeference, *block)
+                    n = self.undulation(lon[None, :], lat[:, None])
+                    valid = np.ones(data.shape, dtype = bool) \
+                        if nodata is None else data != nodata
+                    data[valid] += sign * n[valid]
+                    dst.write(data, 1, window = window)
+
+    def _correct_raster_gdal(self, src_path, dst_path, sign, block_size):
+        src = gdal.Open(src_path)
+        if src is None:
+            raise FileNotFoundError(f"Cannot open raster: {src_path}")
+        t = src.GetGeoTransform()
+        georeference = (t[0], t[3], t[1], -t[5])
+        band = src.GetRasterBand(1)
+        nodata = band.GetNoDataValue()
+        dst = gdal.GetDriverByName("GTiff").Create(
+            dst_path, src.RasterXSize, src.RasterYSize, 1, gdal.GDT_Float32,
+            options = ["COMPRESS=DEFLATE", "TILED=YES"]
+            )
+        dst.SetGeoTransform(t)
+        dst.SetProjection(src.GetProjection())
+        dst_band = dst.GetRasterBand(1)
+        if nodata is not None:
+            dst_band.SetNoDataValue(nodata)
+        for block in self._blocks(src.RasterXSize, src.RasterYSize, block_size):
+            data = band.ReadAsArray(*block).astype(np.float32)
+            lon, lat = _pixel_centres(*georeference, *block)
+            n = self.undulation(lon[None, :], lat[:, None])
+            valid = np.ones(data.shape, dtype = bool) \
+                if nodata is None else data != nodata
+            data[valid] += sign * n[valid]
+            dst_band.WriteArray(data, block[0], block[1])
+        dst_band.FlushCache()
+        dst = src = None
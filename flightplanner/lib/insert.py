@@ -1,6 +1,6 @@
 import numpy as np
+import geopandas as gpd
 from lib.waypoints import Waypoint
-from lib.geo import coordinates_to_lonlat
 
 def interpolate_waypoints(wp0, wp1, num_wpts):
     """
@@ -24,26 +24,58 @@ def interpolate_waypoints(wp0, wp1, num_wpts):
     if num_wpts < 1:
         return []
     
+    fractions = np.linspace(0, 1, num_wpts + 2)[1:-1]
+    
+    return interpolate_waypoints_at(wp0, wp1, fractions)
+
+def interpolate_waypoints_at(wp0, wp1, fractions):
+    """
+    Generate intermediate waypoints at given positions along a segment
+    defined by the two input waypoints.
+
+    Parameters
+    ----------
+    wp0 : Waypoint
+        The starting waypoint.
+    wp1 : Waypoint
+        The ending waypoint.
+    fractions : array-like of float
+        Relative positions along the segment (0 = wp0, 1 = wp1) at
+        which to insert waypoints, in ascending order.
+
+    Returns
+    -------
+    list of Waypoint
+        A list of interpolated waypoints.
+    """
+    fractions = np.asarray(fractions, dtype = float)
+    if fractions.size == 0:
+        return []
+    
     # Linear interpolation between waypoints
     utm_crs = wp0.utm_crs
     if utm_crs is None:
         raise ValueError("UTM CRS must be set for the waypoints.")
-    coords_wp0 = wp0.coordinates_utm
-    coords_wp1 = wp1.coordinates_utm
-    x_values = np.linspace(coords_wp0[0], coords_wp1[0], num_wpts + 2)[1:-1]
-    y_values = np.linspace(coords_wp0[1], coords_wp1[1], num_wpts + 2)[1:-1]
-    altitudes = np.linspace(wp0.altitude, wp1.altitude, num_wpts + 2)[1:-1]
-    velocities = np.linspace(wp0.velocity, wp1.velocity, num_wpts + 2)[1:-1]
+    coords_wp0 = np.asarray(wp0.coordinates_utm)
+    coords_wp1 = np.asarray(wp1.coordinates_utm)
+    xy = coords_wp0 + np.outer(fractions, coords_wp1 - coords_wp0)
+    altitudes = wp0.altitude + fractions * (wp1.altitude - wp0.altitude)
+    velocities = wp0.velocity + fractions * (wp1.velocity - wp0.velocity)
+    
+    # Reproject all intermediate points at once
+    lonlat = gpd.GeoSeries(
+        gpd.points_from_xy(xy[:, 0], xy[:, 1]), crs = utm_crs
+        ).to_crs("EPSG:4326").get_coordinates().to_numpy()
     
     intermediate_waypoints = []
-    for x, y, alt, vel in zip(x_values, y_values, altitudes, velocities):
-        lon, lat = coordinates_to_lonlat(x, y, utm_crs)
+    for (lon, lat), alt, vel in zip(lonlat, altitudes, velocities):
         wpx = Waypoint(
             coordinates = (lon, lat),
             altitude = alt,
             velocity = vel,
-            utm_crs = utm_crs
+            utm_crs = utm_crs,
+            mission = wp0.mission
         )
         intermediate_waypoints.append(wpx)
     
-    return intermediate_waypoints
\ No newline at end of file
+    return intermediate_waypoints
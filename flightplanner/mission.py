@@ -26,10 +26,13 @@ from lib.validation import validate_args
 from lib.waypoints import Waypoint
 from lib.grid import simple_grid, double_grid, rotate_gdf
 from lib.geo import (
-    waypoint_distance, segment_duration, waypoint_altitude, segment_altitude
+    waypoint_distance, segment_duration, segment_durations,
+    waypoint_altitude, segment_altitude
 )
-from lib.insert import interpolate_waypoints
+from lib.geoid import geoid_undulation, read_datum
+from lib.insert import interpolate_waypoints, interpolate_waypoints_at
 from lib.actiongroups import (
+    ActionGroupRegistry,
     StartNadirMSMapping, StopNadirMSMapping,
     PrepareObliqueMSMapping,
     StartObliqueMSMapping, StopObliqueMSMapping,
@@ -57,8 +60,9 @@ class Mission():
         ## Set plot extent
         self.set_plot()
 
-        ## Initiate waypoint list
+        ## Initiate waypoint list and action group registry
         self.waypoints = []
+        self.action_groups = ActionGroupRegistry()
 
         # Relative DTM output directory
         self.dtm_out = None
@@ -360,6 +364,7 @@ class Mission():
                 "At least two waypoints are required to calculate " +
                 f"altitudes. Found {len(self.waypoints)}."
                 )
+        datum = self.dtm_datum()
         # First, get altitude for existing waypoints
         for wpt in self.waypoints:
             altitude = waypoint_altitude(
@@ -392,6 +397,31 @@ class Mission():
                 horizontal_safety_buffer_m = self.args.safetybuffer
             )
         )
+        # DJI expects ellipsoidal altitudes
+        if datum == "egm96":
+            self.add_geoid_undulation()
+    
+    def dtm_datum(self):
+        # Explicit datum or the one tagged in the DTM; never guessed, as
+        # a wrong guess shifts all altitudes by the geoid undulation
+        datum = self.args.dtm_datum.lower()
+        if datum == "auto":
+            datum = read_datum(self.args.dtm_path)
+        if datum not in ("egm96", "ellipsoid"):
+            raise ValueError(
+                f"Unknown vertical datum of {self.args.dtm_path}. Set " +
+                "--dtm_datum to egm96 (heights above the geoid) or " +
+                "ellipsoid (e.g., DEMs downloaded with ADD_GEOID)."
+                )
+        return datum
+    
+    def add_geoid_undulation(self):
+        coordinates = np.array(
+            [wpt.coordinates for wpt in self.waypoints], dtype = float
+            )
+        undulation = geoid_undulation(coordinates[:, 0], coordinates[:, 1])
+        for wpt, n in zip(self.waypoints, undulation):
+            wpt.set_altitude(wpt.altitude + n)
     
     def add_heading_angles(self):
         if len(self.waypoints) < 2:
@@ -405,26 +435,57 @@ class Mission():
         wp1.set_heading_angle(0)
 
     def add_imu_calibration_groups(self):
-        cumulative_time = self.args.imucalibrationinterval
-        self.split_waylines(
-            by = "time", tmax = self.args.imucalibrationinterval
-            )
+        interval = self.args.imucalibrationinterval
+        durations = segment_durations(self.waypoints)
+        if np.isnan(durations).any():
+            raise ValueError(
+                "Cannot place IMU calibrations: one or more waypoints " +
+                "have no positive velocity."
+                )
+        cumulative_time = np.concatenate([[0.], np.cumsum(durations)])
+        
+        # Calibrate at take-off and every full interval thereafter
+        if np.isfinite(interval) and interval > 0:
+            cut_times = np.arange(0., cumulative_time[-1], interval)
+        else:
+            cut_times = np.zeros(1)
+        
+        # Locate the segment containing each cut point; cut points that
+        # coincide with an existing waypoint reuse that waypoint
+        segment_idx = np.searchsorted(
+            cumulative_time, cut_times, side = "right"
+            ) - 1
+        segment_idx = np.clip(segment_idx, 0, len(durations) - 1)
+        offsets = cut_times - cumulative_time[segment_idx]
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            fractions = np.where(
+                durations[segment_idx] > 0,
+                offsets / durations[segment_idx], 0.
+                )
+        at_waypoint = np.isclose(offsets, 0., atol = 1e-6)
         
         new_waypoints = []
-        for wp0, wp1 in zip(self.waypoints[:-1], self.waypoints[1:]):
-            if cumulative_time >= self.args.imucalibrationinterval:
+        for i, wp0 in enumerate(self.waypoints):
+            in_segment = segment_idx == i
+            if (in_segment & at_waypoint).any():
                 wp0.add_calibration(hover = self.args.droneid == 89)
-                cumulative_time = 0
-            
             new_waypoints.append(wp0)
-            cumulative_time += segment_duration(wp0, wp1)
+            
+            inserts = in_segment & ~at_waypoint
+            if inserts.any():
+                new_wpts = interpolate_waypoints_at(
+                    wp0, self.waypoints[i + 1], fractions[inserts]
+                    )
+                for wpx in new_wpts:
+                    wpx.add_calibration(hover = self.args.droneid == 89)
+                new_waypoints.extend(new_wpts)
         
-        new_waypoints.append(wp1)
         self.waypoints = new_waypoints
     
     def make_waypoints(self):
         warn("Clearing existing waypoints.")
         self.waypoints.clear()
+        self.action_groups.clear()
 
         if self.args.gridmode in ["lines", "simple"]:
             self._make_simple_grid()
@@ -629,4 +690,6 @@ class Mission():
             destfile = self.args.destfile,
             altitude_mode = self.altitude_mode
             )
+        # Action groups are compiled; release the registry
+        self.action_groups.clear()
         print(f"Mission exported to {self.args.destfile}.")
\ No newline at end of file
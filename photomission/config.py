@@ -36,4 +36,5 @@ class Defaults(Config):
     dsm_follow_segment_length: float = 20.0
     transitionspeed: float = 2.5
     num_photos: int = 6
-    photo_radius: float = 2.0
\ No newline at end of file
+    photo_radius: float = 2.0
+    optimise_route: bool = False
\ No newline at end of file
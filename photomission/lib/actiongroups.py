@@ -33,6 +33,48 @@ def compile_action_group(
 
 #==============================================================================
 # Classes
+#------------------------------------------------------------------------------
+## Action group registry
+class ActionGroupRegistry():
+    """
+    Book-keeping of the action groups created for a single mission.
+
+    Groups are stored per class, together with their position within
+    that class, so that instance indices and the groups that still wait
+    for an end waypoint are available without scanning all groups ever
+    created.
+    """
+    def __init__(self):
+        self._instances = {}
+        self._open = {}
+    
+    def __len__(self):
+        return sum(len(groups) for groups in self._instances.values())
+    
+    def register(self, action_group):
+        action_class = type(action_group)
+        instances = self._instances.setdefault(action_class, [])
+        action_group._registry_idx = len(instances)
+        instances.append(action_group)
+        if action_group._action_end_wp is None:
+            self._open.setdefault(action_class, {})[action_group] = None
+    
+    def release(self, action_group):
+        self._open.get(type(action_group), {}).pop(action_group, None)
+    
+    def instances(self, action_class):
+        return self._instances.get(action_class, [])
+    
+    def open_groups(self, action_class):
+        return list(self._open.get(action_class, {}))
+    
+    def clear(self):
+        self._instances.clear()
+        self._open.clear()
+
+# Registry for action groups of waypoints that do not belong to a mission
+default_registry = ActionGroupRegistry()
+
 #------------------------------------------------------------------------------
 ## Action main class
 class ActionGroup():
@@ -48,6 +90,12 @@ class ActionGroup():
         self.action_trigger_param = None
         self.actions = []
         self.action_duration = None
+        self.registry = getattr(
+            getattr(waypoint, "mission", None), "action_groups", None
+            )
+        if self.registry is None:
+            self.registry = default_registry
+        self.registry.register(self)
     
     @property
     def action_start_wp(self):
@@ -59,13 +107,14 @@ class ActionGroup():
 
     @property
     def instance_idx(self):
-        return self.__class__.instances.index(self)
+        return self._registry_idx
     
     def __repr__(self):
         return f"ActionGroup: {self.actions}"
     
     def end_action_group(self, action_end_wp):
         self._action_end_wp = action_end_wp
+        self.registry.release(self)
     
     def add_action(self, action, **params):
         if not issubclass(action, Action):
@@ -76,13 +125,12 @@ class ActionGroup():
     
     def stop_action(self, action_class, index = None):
         if index is None:
-            for target in action_class.instances:
-                if target._action_end_wp is None and hasattr(
-                    self.waypoint, "index"
-                    ):
-                    target.end_action_group(self.waypoint)
-        elif index < len(action_class.instances):
-            target = action_class.instances[index]
+            targets = self.registry.open_groups(action_class)
+        elif index < len(self.registry.instances(action_class)):
+            targets = [self.registry.instances(action_class)[index]]
+        else:
+            targets = []
+        for target in targets:
             if target._action_end_wp is None and hasattr(
                 self.waypoint, "index"
                 ):
@@ -95,13 +143,11 @@ class ActionGroup():
 #------------------------------------------------------------------------------
 ## Specific action group classes
 class PreparePhotoActionGroup(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp)
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.action_duration = None
         self.actions = [
@@ -109,13 +155,11 @@ class PreparePhotoActionGroup(ActionGroup):
         ]
 
 class PreparePhotoZoom(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp)
-        self.__class__.instances.append(self)
         self.action_trigger = "betweenAdjacentPoints"
         self.action_duration = 1
         self.actions = [
@@ -123,13 +167,11 @@ class PreparePhotoZoom(ActionGroup):
         ]
 
 class PhotoActionGroup(ActionGroup):
-    instances = []
     def __init__(
             self, waypoint = None,
             action_start_wp = None, action_end_wp = None
             ):
         super().__init__(waypoint, action_start_wp, action_end_wp)
-        self.__class__.instances.append(self)
         self.action_trigger = "reachPoint"
         self.actions = [
             Photo(self),
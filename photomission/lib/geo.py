@@ -1,7 +1,9 @@
 import math
+import warnings
 import numpy as np
 import geopandas as gpd
 import rasterio
+import rasterio.windows
 from rasterio import mask
 from rasterio.warp import calculate_default_transform, reproject, Resampling
 from shapely.geometry import Point, LineString, mapping
@@ -380,4 +382,166 @@ def waypoint_altitude(dsm_path, wpt, altitude_agl = 0.0):
     
     altitude = circle_max_elevation + altitude_agl
     
-    return altitude
\ No newline at end of file
+    return altitude
+
+class DSMWindow():
+    """
+    DSM values around a set of locations, read in a single window.
+
+    Point and corridor maxima are computed from the cached array. Metric
+    distances use a local equirectangular approximation, which is
+    accurate to well below a pixel over the extent of a photo mission.
+
+    Parameters
+    ----------
+    dsm_path : str
+        The file path to the DSM raster (EPSG:4326).
+    coordinates : array-like
+        Array of shape (n, 2) with (longitude, latitude) of all
+        locations to cover.
+    margin_m : float, optional
+        Margin around the locations in meters. The default is 20.
+    """
+    EARTH_RADIUS = 6371008.8
+
+    def __init__(self, dsm_path, coordinates, margin_m = 20.):
+        coordinates = np.asarray(coordinates, dtype = float)
+        lat0 = np.radians(coordinates[:, 1].mean())
+        self._m_per_deg_lat = np.radians(1) * self.EARTH_RADIUS
+        self._m_per_deg_lon = self._m_per_deg_lat * np.cos(lat0)
+        dlon = margin_m / self._m_per_deg_lon
+        dlat = margin_m / self._m_per_deg_lat
+        
+        with rasterio.open(dsm_path) as src:
+            if not src.crs.is_geographic:
+                raise NotImplementedError(
+                    "Input raster CRS is not EPSG:4326. CRS transformation is not implemented."
+                )
+            bounds = rasterio.windows.from_bounds(
+                coordinates[:, 0].min() - dlon,
+                coordinates[:, 1].min() - dlat,
+                coordinates[:, 0].max() + dlon,
+                coordinates[:, 1].max() + dlat,
+                transform = src.transform
+                )
+            col_off = math.floor(bounds.col_off)
+            row_off = math.floor(bounds.row_off)
+            window = rasterio.windows.Window(
+                col_off, row_off,
+                math.ceil(bounds.col_off + bounds.width) - col_off,
+                math.ceil(bounds.row_off + bounds.height) - row_off
+                )
+            values = src.read(1, window = window, masked = True,
+                              boundless = True)
+            self.transform = src.window_transform(window)
+        
+        self.values = values.astype(float).filled(np.nan)
+        self._pixel_w = abs(self.transform.a) * self._m_per_deg_lon
+        self._pixel_h = abs(self.transform.e) * self._m_per_deg_lat
+    
+    def _pixel_index(self, coordinates):
+        cols, rows = ~self.transform * (
+            coordinates[..., 0], coordinates[..., 1]
+            )
+        return np.floor(rows).astype(int), np.floor(cols).astype(int)
+    
+    def _metric_offsets(self, rows, cols, lon, lat):
+        x, y = self.transform * (cols + 0.5, rows + 0.5)
+        dx = (x - lon) * self._m_per_deg_lon
+        dy = (y - lat) * self._m_per_deg_lat
+        return dx, dy
+    
+    def _gather(self, rows, cols):
+        valid = (rows >= 0) & (rows < self.values.shape[0]) & \
+            (cols >= 0) & (cols < self.values.shape[1])
+        out = np.full(rows.shape, np.nan)
+        out[valid] = self.values[rows[valid], cols[valid]]
+        return out
+    
+    def point_max(self, coordinates, radius_m = 2.):
+        """
+        Maximum DSM value of all pixels touched by a circle around each
+        location.
+
+        Parameters
+        ----------
+        coordinates : array-like
+            Array of shape (n, 2) with (longitude, latitude).
+        radius_m : float, optional
+            Circle radius in meters. The default is 2.
+
+        Returns
+        -------
+        numpy.ndarray
+            Maximum DSM value per location (NaN without data).
+        """
+        coordinates = np.atleast_2d(np.asarray(coordinates, dtype = float))
+        rows, cols = self._pixel_index(coordinates)
+        r = int(np.ceil(radius_m / self._pixel_h)) + 1
+        c = int(np.ceil(radius_m / self._pixel_w)) + 1
+        dr, dc = np.meshgrid(
+            np.arange(-r, r + 1), np.arange(-c, c + 1), indexing = "ij"
+            )
+        rows = rows[:, None] + dr.ravel()[None, :]
+        cols = cols[:, None] + dc.ravel()[None, :]
+        dx, dy = self._metric_offsets(
+            rows, cols, coordinates[:, [0]], coordinates[:, [1]]
+            )
+        # Distance from each location to the nearest edge of the pixel
+        dist = np.hypot(
+            np.maximum(np.abs(dx) - self._pixel_w / 2, 0),
+            np.maximum(np.abs(dy) - self._pixel_h / 2, 0)
+            )
+        values = np.where(
+            dist <= radius_m, self._gather(rows, cols), np.nan
+            )
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.nanmax(values, axis = 1)
+    
+    def corridor_max(self, coordinates_0, coordinates_1, buffer_m = 20.):
+        """
+        Maximum DSM value within a buffer around a straight segment.
+
+        Parameters
+        ----------
+        coordinates_0 : tuple
+            (longitude, latitude) of the segment start.
+        coordinates_1 : tuple
+            (longitude, latitude) of the segment end.
+        buffer_m : float, optional
+            Horizontal buffer in meters. The default is 20.
+
+        Returns
+        -------
+        float
+            Maximum DSM value in the corridor (NaN without data).
+        """
+        p0 = np.asarray(coordinates_0, dtype = float)
+        p1 = np.asarray(coordinates_1, dtype = float)
+        dlon = buffer_m / self._m_per_deg_lon
+        dlat = buffer_m / self._m_per_deg_lat
+        corners = np.array([
+            [min(p0[0], p1[0]) - dlon, max(p0[1], p1[1]) + dlat],
+            [max(p0[0], p1[0]) + dlon, min(p0[1], p1[1]) - dlat]
+            ])
+        (row_min, row_max), (col_min, col_max) = self._pixel_index(corners)
+        rows, cols = np.meshgrid(
+            np.arange(row_min, row_max + 1),
+            np.arange(col_min, col_max + 1),
+            indexing = "ij"
+            )
+        # Pixel centres relative to the segment start in meters
+        px, py = self._metric_offsets(rows, cols, p0[0], p0[1])
+        sx = (p1[0] - p0[0]) * self._m_per_deg_lon
+        sy = (p1[1] - p0[1]) * self._m_per_deg_lat
+        length2 = sx ** 2 + sy ** 2
+        t = np.clip(
+            (px * sx + py * sy) / length2 if length2 > 0 else 0., 0., 1.
+            )
+        dist = np.hypot(px - t * sx, py - t * sy)
+        half_diagonal = np.hypot(self._pixel_w, self._pixel_h) / 2
+        values = self._gather(rows, cols)[dist <= buffer_m + half_diagonal]
+        if values.size == 0 or np.isnan(values).all():
+            return np.nan
+        return np.nanmax(values)
@@ -1,4 +1,5 @@
 import numpy as np
+import geopandas as gpd
 from lib.waypoints import Waypoint
 from lib.geo import coordinates_to_lonlat
 
@@ -42,7 +43,8 @@ def interpolate_waypoints(wp0, wp1, num_wpts):
             coordinates = (lon, lat),
             altitude = alt,
             velocity = vel,
-            utm_crs = utm_crs
+            utm_crs = utm_crs,
+            mission = wp0.mission
         )
         intermediate_waypoints.append(wpx)
     
@@ -66,30 +68,70 @@ def generate_circle(wp, num_wpts, radius = 2):
     list of Waypoint
         A list of circular waypoints.
     """
+    return generate_circles([wp], num_wpts, radius)[0]
+
+def generate_circles(wps, num_wpts, radius = 2, utm_crs = None):
+    """
+    Generate circles of waypoints around several central waypoints.
+    
+    All circle points are computed as one array in a common UTM CRS and
+    reprojected to geographic coordinates in a single batch.
+
+    Parameters
+    ----------
+    wps : list of Waypoint
+        The central waypoints.
+    num_wpts : int
+        The number of waypoints per circle.
+    radius : float
+        The radius of the circles in meters.
+    utm_crs : pyproj.CRS, optional
+        UTM CRS for the offsets. Defaults to the UTM CRS of the first
+        waypoint.
+    
+    Returns
+    -------
+    list of list of Waypoint
+        One list of circular waypoints per central waypoint.
+    """
     if num_wpts < 1:
-        return []
+        return [[] for _ in wps]
     
     if num_wpts == 1:
-        return [wp]
+        return [[wp] for wp in wps]
+    
+    if len(wps) == 0:
+        return []
     
     # Generate circular waypoints
-    utm_crs = wp.utm_crs
+    utm_crs = wps[0].utm_crs if utm_crs is None else utm_crs
     if utm_crs is None:
         raise ValueError("UTM CRS must be set for the waypoint.")
-    coords_wp = wp.coordinates_utm
+    lonlat = np.array([wp.coordinates for wp in wps], dtype = float)
+    centres = gpd.GeoSeries(
+        gpd.points_from_xy(lonlat[:, 0], lonlat[:, 1]), crs = "EPSG:4326"
+        ).to_crs(utm_crs).get_coordinates().to_numpy()
+    
     angles = np.linspace(0, 2 * np.pi, num_wpts, endpoint = False)
-
-    circular_waypoints = []
-    for angle in angles:
-        x = coords_wp[0] + radius * np.cos(angle)
-        y = coords_wp[1] + radius * np.sin(angle)
-        lon, lat = coordinates_to_lonlat(x, y, utm_crs)
-        wpx = Waypoint(
-            coordinates = (lon, lat),
-            altitude = wp.altitude,
-            velocity = wp.velocity,
-            utm_crs = utm_crs
-        )
-        circular_waypoints.append(wpx)
-
-    return circular_waypoints
\ No newline at end of file
+    offsets = radius * np.column_stack([np.cos(angles), np.sin(angles)])
+    points = (centres[:, None, :] + offsets[None, :, :]).reshape(-1, 2)
+    points_lonlat = gpd.GeoSeries(
+        gpd.points_from_xy(points[:, 0], points[:, 1]), crs = utm_crs
+        ).to_crs("EPSG:4326").get_coordinates().to_numpy().reshape(
+            len(wps), num_wpts, 2
+            )
+    
+    circles = []
+    for wp, circle_lonlat in zip(wps, points_lonlat):
+        circles.append([
+            Waypoint(
+                coordinates = (lon, lat),
+                altitude = wp.altitude,
+                velocity = wp.velocity,
+                utm_crs = utm_crs,
+                mission = wp.mission
+            )
+            for lon, lat in circle_lonlat
+            ])
+    
+    return circles
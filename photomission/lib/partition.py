@@ -0,0 +1,139 @@
+import numpy as np
+from lib.route import distance_matrix
+
+# Functions-------------------------------------------------------------
+def kmeans(xy, k, max_iterations = 100, seed = 0):
+    """
+    Cluster points into k spatially compact groups (k-means with
+    k-means++ initialisation).
+
+    Parameters
+    ----------
+    xy : numpy.ndarray
+        Array of shape (n, 2) with projected coordinates.
+    k : int
+        Number of clusters.
+    max_iterations : int, optional
+        Maximum number of Lloyd iterations. The default is 100.
+    seed : int, optional
+        Seed for the initialisation. The default is 0.
+
+    Returns
+    -------
+    numpy.ndarray
+        Cluster label per point.
+    """
+    xy = np.asarray(xy, dtype = float)
+    n = len(xy)
+    if k >= n:
+        return np.arange(n)
+
+    rng = np.random.default_rng(seed)
+    centroids = [xy[rng.integers(n)]]
+    for _ in range(1, k):
+        d2 = np.min(
+            ((xy[:, None, :] - np.array(centroids)[None]) ** 2).sum(-1),
+            axis = 1
+            )
+        # Uniform choice if all points coincide with a centroid
+        p = d2 / d2.sum() if d2.sum() > 0 else None
+        centroids.append(xy[rng.choice(n, p = p)])
+    centroids = np.array(centroids)
+
+    labels = np.full(n, -1)
+    for _ in range(max_iterations):
+        d2 = ((xy[:, None, :] - centroids[None]) ** 2).sum(-1)
+        new_labels = np.argmin(d2, axis = 1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            if (labels == c).any():
+                centroids[c] = xy[labels == c].mean(axis = 0)
+            else:
+                # Re-seed empty clusters with the worst-fitting point
+                worst = int(np.argmax(d2[np.arange(n), labels]))
+                centroids[c] = xy[worst]
+                labels[worst] = c
+
+    return labels
+
+def partition_points(xy, n_parts, cost, max_moves = 1000, n_candidates = 3):
+    """
+    Split points into spatially compact parts of balanced cost.
+
+    The points are clustered with k-means. Afterwards, points are moved
+    from the most expensive part to another part, as long as this lowers
+    the cost of the most expensive part. Only the points of the most
+    expensive part closest to the centroid of the receiving part are
+    considered, which keeps parts compact.
+
+    Parameters
+    ----------
+    xy : numpy.ndarray
+        Array of shape (n, 2) with projected coordinates.
+    n_parts : int
+        Number of parts.
+    cost : callable
+        Function mapping an array of point indices to the cost (e.g.,
+        predicted flight duration) of visiting these points. It is
+        called several times per move, so a cheap estimate (e.g., based
+        on a nearest-neighbour tour) should be used.
+    max_moves : int, optional
+        Maximum number of point moves. The default is 1000.
+    n_candidates : int, optional
+        Number of points tested per receiving part and move. The
+        default is 3.
+
+    Returns
+    -------
+    list of numpy.ndarray
+        Point indices per part.
+    """
+    xy = np.asarray(xy, dtype = float)
+    if n_parts < 1:
+        raise ValueError(f"Invalid number of parts: {n_parts}.")
+    if n_parts > len(xy):
+        raise ValueError(
+            f"Cannot split {len(xy)} points into {n_parts} parts."
+            )
+
+    labels = kmeans(xy, n_parts)
+    parts = [np.flatnonzero(labels == p) for p in range(n_parts)]
+    costs = np.array([cost(part) for part in parts])
+
+    for _ in range(max_moves):
+        heaviest = int(np.argmax(costs))
+        if len(parts[heaviest]) < 2:
+            break
+        best = None
+        for receiver in range(n_parts):
+            if receiver == heaviest:
+                continue
+            centroid = xy[parts[receiver]].mean(axis = 0)
+            d = distance_matrix(
+                np.vstack([centroid, xy[parts[heaviest]]])
+                )[0, 1:]
+            for candidate in parts[heaviest][np.argsort(d)[:n_candidates]]:
+                donor_part = parts[heaviest][parts[heaviest] != candidate]
+                receiver_part = np.append(parts[receiver], candidate)
+                donor_cost = cost(donor_part)
+                receiver_cost = cost(receiver_part)
+                new_max = max(donor_cost, receiver_cost)
+                if new_max < costs[heaviest] and (
+                    best is None or new_max < best[0]
+                    ):
+                    best = (
+                        new_max, receiver, donor_part, receiver_part,
+                        donor_cost, receiver_cost
+                        )
+        if best is None:
+            break
+        _, receiver, donor_part, receiver_part, donor_cost, \
+            receiver_cost = best
+        parts[heaviest] = donor_part
+        parts[receiver] = receiver_part
+        costs[heaviest] = donor_cost
+        costs[receiver] = receiver_cost
+
+    return [np.sort(part) for part in parts]
@@ -0,0 +1,271 @@
+import numpy as np
+
+# Functions-------------------------------------------------------------
+def distance_matrix(xy):
+    """
+    Compute the pairwise Euclidean distance matrix of projected points.
+
+    Parameters
+    ----------
+    xy : numpy.ndarray
+        Array of shape (n, 2) with projected (e.g., UTM) coordinates.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, n) with distances in the units of the input.
+    """
+    xy = np.asarray(xy, dtype = float)
+    diff = xy[:, None, :] - xy[None, :, :]
+    return np.hypot(diff[..., 0], diff[..., 1])
+
+def _extended_matrix(xy, start_xy = None, return_to_start = False):
+    """
+    Extend the POI distance matrix by a head and a tail node.
+
+    The head node (index n) is the start location or, if no start is
+    given, a dummy at zero distance from all POIs. The tail node (index
+    n + 1) is the start location if the route returns to it, otherwise
+    a dummy at zero distance. Routes are then sequences
+    [head, POIs..., tail] of which only the interior is permuted.
+    """
+    n = len(xy)
+    dist = np.zeros((n + 2, n + 2))
+    dist[:n, :n] = distance_matrix(xy)
+    if start_xy is not None:
+        d_start = np.hypot(*(np.asarray(xy) - np.asarray(start_xy)).T)
+        dist[n, :n] = dist[:n, n] = d_start
+        if return_to_start:
+            dist[n + 1, :n] = dist[:n, n + 1] = d_start
+    return dist
+
+def route_length(sequence, dist):
+    """
+    Length of a route given as a sequence of node indices.
+
+    Parameters
+    ----------
+    sequence : array-like of int
+        Node indices in visiting order.
+    dist : numpy.ndarray
+        Distance matrix.
+
+    Returns
+    -------
+    float
+        Sum of the distances between consecutive nodes.
+    """
+    sequence = np.asarray(sequence)
+    return float(dist[sequence[:-1], sequence[1:]].sum())
+
+def nearest_neighbour_route(dist, head, nodes):
+    """
+    Construct a route by repeatedly visiting the nearest unvisited node.
+
+    Parameters
+    ----------
+    dist : numpy.ndarray
+        Distance matrix.
+    head : int
+        Index of the node the route starts from.
+    nodes : array-like of int
+        Indices of the nodes to visit.
+
+    Returns
+    -------
+    numpy.ndarray
+        Node indices in visiting order (excluding the head).
+    """
+    unvisited = np.zeros(len(dist), dtype = bool)
+    unvisited[np.asarray(nodes)] = True
+    unvisited[head] = False
+    route = []
+    current = head
+    while unvisited.any():
+        candidates = np.where(unvisited, dist[current], np.inf)
+        current = int(np.argmin(candidates))
+        route.append(current)
+        unvisited[current] = False
+    return np.array(route, dtype = int)
+
+def two_opt(sequence, dist, tol = 1e-9):
+    """
+    Improve a route by reversing sub-sequences (2-opt) until no reversal
+    shortens it. The first and last node of the sequence stay fixed.
+
+    Parameters
+    ----------
+    sequence : numpy.ndarray
+        Node indices in visiting order, including the fixed ends.
+    dist : numpy.ndarray
+        Symmetric distance matrix.
+    tol : float, optional
+        Minimum improvement to accept a move. The default is 1e-9.
+
+    Returns
+    -------
+    tuple
+        The improved sequence and whether any move was applied.
+    """
+    sequence = np.array(sequence, dtype = int)
+    m = len(sequence)
+    improved = False
+    if m < 4:
+        return sequence, improved
+
+    i_idx = np.arange(1, m - 1)
+    upper = np.triu(np.ones((m - 2, m - 2), dtype = bool), k = 1)
+    while True:
+        prev = sequence[i_idx - 1]
+        cur = sequence[i_idx]
+        nxt = sequence[i_idx + 1]
+        # Gain of reversing sequence[i..j] for all pairs i < j at once
+        delta = (
+            dist[prev[:, None], cur[None, :]]
+            + dist[cur[:, None], nxt[None, :]]
+            - dist[prev, cur][:, None]
+            - dist[cur, nxt][None, :]
+            )
+        delta = np.where(upper, delta, np.inf)
+        i, j = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[i, j] >= -tol:
+            return sequence, improved
+        sequence[i + 1:j + 2] = sequence[i + 1:j + 2][::-1]
+        improved = True
+
+def or_opt(sequence, dist, max_segment_length = 3, tol = 1e-9):
+    """
+    Improve a route by relocating short sub-sequences (Or-opt), possibly
+    reversed, to the position where they fit best. The first and last
+    node of the sequence stay fixed.
+
+    Parameters
+    ----------
+    sequence : numpy.ndarray
+        Node indices in visiting order, including the fixed ends.
+    dist : numpy.ndarray
+        Symmetric distance matrix.
+    max_segment_length : int, optional
+        Longest sub-sequence to relocate. The default is 3.
+    tol : float, optional
+        Minimum improvement to accept a move. The default is 1e-9.
+
+    Returns
+    -------
+    tuple
+        The improved sequence and whether any move was applied.
+    """
+    sequence = np.array(sequence, dtype = int)
+    improved = False
+    moved = True
+    while moved:
+        moved = False
+        m = len(sequence)
+        for length in range(1, max_segment_length + 1):
+            for i in range(1, m - length):
+                first = sequence[i]
+                last = sequence[i + length - 1]
+                prev = sequence[i - 1]
+                nxt = sequence[i + length]
+                removal_gain = dist[prev, first] + dist[last, nxt] \
+                    - dist[prev, nxt]
+
+                # Candidate edges (a, b) of the route without the segment
+                rest = np.concatenate(
+                    [sequence[:i], sequence[i + length:]]
+                    )
+                a = rest[:-1]
+                b = rest[1:]
+                forward = dist[a, first] + dist[last, b] - dist[a, b]
+                backward = dist[a, last] + dist[first, b] - dist[a, b]
+                # Re-inserting at the original position is no move
+                forward[i - 1] = backward[i - 1] = np.inf
+                k_fwd = int(np.argmin(forward))
+                k_bwd = int(np.argmin(backward))
+                if forward[k_fwd] <= backward[k_bwd]:
+                    k, cost, reverse = k_fwd, forward[k_fwd], False
+                else:
+                    k, cost, reverse = k_bwd, backward[k_bwd], True
+
+                if cost - removal_gain < -tol:
+                    segment = sequence[i:i + length]
+                    if reverse:
+                        segment = segment[::-1]
+                    sequence = np.concatenate(
+                        [rest[:k + 1], segment, rest[k + 1:]]
+                        )
+                    improved = moved = True
+                    break
+            if moved:
+                break
+
+    return sequence, improved
+
+def optimise_route(
+        xy, start_xy = None, return_to_start = False, max_iterations = 100
+        ):
+    """
+    Find a short visiting order for a set of points.
+
+    A nearest-neighbour route is improved by alternating 2-opt and
+    Or-opt moves until neither shortens it any further.
+
+    Parameters
+    ----------
+    xy : numpy.ndarray
+        Array of shape (n, 2) with projected coordinates of the points.
+    start_xy : tuple, optional
+        Projected coordinates of a fixed start location (e.g., the
+        takeoff point). The default is None (free start).
+    return_to_start : bool, optional
+        Whether the distance back to the start location counts towards
+        the route length. Ignored without start location. The default
+        is False.
+    max_iterations : int, optional
+        Maximum number of 2-opt/Or-opt rounds. The default is 100.
+
+    Returns
+    -------
+    tuple
+        The visiting order (indices into xy), the route length in input
+        order, and the route length in optimised order.
+    """
+    xy = np.asarray(xy, dtype = float)
+    n = len(xy)
+    dist = _extended_matrix(xy, start_xy, return_to_start)
+    head, tail = n, n + 1
+    length_input = route_length(
+        np.concatenate([[head], np.arange(n), [tail]]), dist
+        )
+    # Without fixed start, the order of two points does not matter
+    if n < 2 or (n < 3 and start_xy is None):
+        return np.arange(n), length_input, length_input
+
+    if start_xy is None:
+        # Free start: keep the best nearest-neighbour route over all
+        # possible first points
+        candidates = [
+            np.concatenate([[first], nearest_neighbour_route(
+                dist[:n, :n], first, np.arange(n)
+                )]) for first in range(n)
+            ]
+        route = min(
+            candidates,
+            key = lambda r: route_length(r, dist[:n, :n])
+            )
+    else:
+        route = nearest_neighbour_route(dist, head, np.arange(n))
+
+    sequence = np.concatenate([[head], route, [tail]])
+    for _ in range(max_iterations):
+        sequence, improved_2opt = two_opt(sequence, dist)
+        sequence, improved_oropt = or_opt(sequence, dist)
+        if not (improved_2opt or improved_oropt):
+            break
+
+    order = sequence[1:-1]
+    length_optimised = route_length(sequence, dist)
+    if length_optimised >= length_input:
+        return np.arange(n), length_input, length_input
+
+    return order, length_input, length_optimised
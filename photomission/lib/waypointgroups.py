@@ -1,6 +1,5 @@
 #==============================================================================
 # Imports
-import copy
 from lib.actiongroups import PreparePhotoActionGroup, PhotoActionGroup, PreparePhotoZoom
 from lib.waypoints import Waypoint
 from lib.insert import generate_circle
@@ -16,14 +15,20 @@ class WaypointGroup():
     
     @property
     def n_actions(self):
-        return sum([w.n_actions for w in self.waypoints])
+        return sum([w.num_actions for w in self.waypoints])
     
     @property
     def waypoints(self):
-        return self.create_waypoint_group()
+        # Materialise the group once; creation attaches action groups
+        if getattr(self, "_waypoints", None) is None:
+            self._waypoints = self.create_waypoint_group()
+        return self._waypoints
     
     def create_waypoint(self, coordinates, altitude, actions):
-        return Waypoint(coordinates, altitude, actions)
+        return Waypoint(
+            coordinates, altitude, actions,
+            mission = getattr(self, "mission", None)
+            )
     
     def create_waypoint_group(self):
         print(
@@ -60,18 +65,21 @@ class WaypointGroup():
 ## Specific waypoint group classes
 ### Calibrate IMU
 class Photogroup(WaypointGroup):
-    def __init__(self, waypoint, num_photos = 1, radius = 2.0):
+    def __init__(
+            self, waypoint, num_photos = 1, radius = 2.0, circle = None
+            ):
         self.wp_type = "photo"
         self.waypoint_group_type = "photogroup"
         self.waypoint = waypoint
+        self.mission = waypoint.mission
         self.n = num_photos
         self.radius = radius
+        self.circle = circle
     
     def create_waypoint_group(self):
         wpt_group = [self.waypoint]
-        circular_waypoints = generate_circle(
-            self.waypoint, self.n, self.radius
-            )
+        circular_waypoints = self.circle if self.circle is not None else \
+            generate_circle(self.waypoint, self.n, self.radius)
         for wpt_i in circular_waypoints:
             wpt_i.wp_type = "photo"
             wpt_i.add_action_group(PhotoActionGroup)
@@ -79,7 +87,7 @@ class Photogroup(WaypointGroup):
             #wpt_i.add_action_group(PreparePhotoZoom)
             wpt_group.append(wpt_i)
         
-        wpt_group.append(copy.deepcopy(self.waypoint))
+        wpt_group.append(self.waypoint.clone())
         self.waypoint.add_action_group(PreparePhotoActionGroup)
         self.n_waypoints = len(wpt_group)
         
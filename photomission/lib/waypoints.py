@@ -1,3 +1,4 @@
+import copy
 from warnings import warn
 from lib.geo import get_utm_crs, round_coords, coordinates_to_utm
 from lib.actions import Action
@@ -57,10 +58,9 @@ class Waypoint():
     @property
     def utm_crs(self):
         if self._utm_crs is None:
-            if self.mission is None:
+            self._utm_crs = getattr(self.mission, "local_crs", None)
+            if self._utm_crs is None:
                 self._utm_crs = get_utm_crs(self.coordinates)
-            else:
-                self._utm_crs = self.mission.local_crs
         return self._utm_crs
     
     @property
@@ -116,6 +116,15 @@ class Waypoint():
         
         return "\n".join(action_xmls)
     
+    def clone(self):
+        # Structural copy sharing immutable attributes and the mission;
+        # actions and the position within the mission are not carried over
+        wpt = copy.copy(self)
+        wpt.actions = []
+        wpt._index = None
+        wpt.__dict__.pop("pass_backwards", None)
+        return wpt
+    
     def _add_action(self, action):
         if not isinstance(action, Action):
             raise TypeError(
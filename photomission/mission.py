@@ -23,9 +23,16 @@ from matplotlib import pyplot as plt
 from lib.utils import get_heading_angle
 from lib.io import write_template_kml, write_wayline_wpml, copy_dsm
 from lib.waypointgroups import Photogroup
+from lib.insert import generate_circles
 from lib.waypoints import Waypoint
+from lib.actiongroups import ActionGroupRegistry
+from lib.route import (
+    optimise_route, route_length, distance_matrix, nearest_neighbour_route
+    )
+from lib.partition import partition_points
 from lib.geo import (
-    waypoint_distance, segment_duration, waypoint_altitude, segment_altitude
+    waypoint_distance, segment_duration, waypoint_altitude, segment_altitude,
+    DSMWindow
 )
 
 from config import Config
@@ -33,9 +40,10 @@ from config import Config
 config = Config()
 
 class Mission():
-    def __init__(self, args):
+    def __init__(self, args, slot = None):
         self.args = args
-        self.mission_slot = list(config.slots.values())[args.slot]
+        self.args.slot = args.slot if slot is None else slot
+        self.mission_slot = list(config.slots.values())[self.args.slot]
         self.args.destfile = os.path.join(
             args.out_dir,
             self.mission_slot,
@@ -45,6 +53,8 @@ class Mission():
         self.args.wpturnmode = "toPointAndPassWithContinuityCurvature"
         self.template_kml_directory = config.template_kml_directory
         self._takeoff_altitude = None
+        self.waypoints = []
+        self.action_groups = ActionGroupRegistry()
         self.num_photos = self.args.num_photos
         self.photo_radius = self.args.photo_radius
 
@@ -118,7 +128,7 @@ class Mission():
                 f" Found {len(self.waypoints)}."
                 )
     
-    def waypoint_altitudes_from_dsm(self):
+    def waypoint_altitudes_from_dsm(self, transit_legs = True):
         if not os.path.isfile(self.args.dsm_path):
             if self.args.dsm_path != "fixed_altitude":
                 raise ValueError("DSM file not found.")
@@ -129,6 +139,7 @@ class Mission():
                 f"altitudes. Found {len(self.waypoints)}."
                 )
         
+        offsets = []
         for wpt in self.waypoints:
             if wpt.wp_type == "fly":
                 offset = max(
@@ -140,13 +151,57 @@ class Mission():
                 offset = 0.0
             else:
                 raise ValueError(f"Unknown waypoint type: {wpt.wp_type}.")
-            
-            altitude = waypoint_altitude(
-                dsm_path = self.args.dsm_path,
-                wpt = wpt,
-                altitude_agl = offset
+            offsets.append(offset)
+        offsets = np.array(offsets)
+        
+        if self.args.dsm_path == "fixed_altitude":
+            for wpt, altitude in zip(self.waypoints, offsets):
+                wpt.set_altitude(altitude)
+            return None
+        
+        # Sample all waypoints from a single DSM window read
+        coordinates = np.array([wpt.coordinates for wpt in self.waypoints])
+        dsm = DSMWindow(
+            self.args.dsm_path, coordinates,
+            margin_m = max(self.args.safetybuffer, 2.0) + 5.0
             )
-            wpt.set_altitude(altitude)
+        elevations = dsm.point_max(coordinates, radius_m = 2.0)
+        for wpt, elevation, offset in zip(
+            self.waypoints, elevations, offsets
+            ):
+            if np.isnan(elevation):
+                raise ValueError(
+                    f"DSM value is NaN at location {wpt.coordinates}"
+                    )
+            if elevation <= 0:
+                warn(
+                    f"DSM value is ({elevation} m) at location " +
+                    f"{wpt.coordinates}. This seems unlikely. Check DSM data."
+                    )
+            wpt.set_altitude(elevation + offset)
+        
+        if transit_legs:
+            self.transit_altitudes_from_dsm(dsm)
+        return dsm
+    
+    def transit_altitudes_from_dsm(self, dsm):
+        if dsm is None:
+            return
+        # Raise transit legs between photo groups where the canopy in the
+        # safety corridor requires it
+        for wp0, wp1 in zip(self.waypoints[:-1], self.waypoints[1:]):
+            if wp0.wp_type != "fly" or wp1.wp_type != "fly":
+                continue
+            corridor_max = dsm.corridor_max(
+                wp0.coordinates, wp1.coordinates,
+                buffer_m = self.args.safetybuffer
+                )
+            if np.isnan(corridor_max):
+                continue
+            required = corridor_max + self.args.minimum_flightaltitude
+            for wpt in (wp0, wp1):
+                if wpt.altitude < required:
+                    wpt.set_altitude(required)
     
     def add_heading_angles(self):
         if len(self.waypoints) < 2:
@@ -159,8 +214,8 @@ class Mission():
 
         wp1.set_heading_angle(0)
     
-    def make_waypoints(self):
-        # Open input POI file and create waypoints from coordinates
+    def read_pois(self):
+        # Open input POI file
         if not os.path.isfile(self.args.poi_path):
             raise ValueError("POI file not found.")
         poi_gdf = gpd.read_file(self.args.poi_path)
@@ -170,31 +225,111 @@ class Mission():
             poi_gdf = poi_gdf.to_crs(epsg = 4326)
         if not all(poi_gdf.geometry.type == "Point"):
             raise ValueError("POI file must contain only point geometries.")
-        self.waypoints = [
+        return poi_gdf
+    
+    def project_pois(self, poi_gdf):
+        # Local metric coordinates of the POIs and the takeoff location
+        local_crs = poi_gdf.estimate_utm_crs()
+        xy = poi_gdf.to_crs(local_crs).get_coordinates().to_numpy()
+        start_xy = None
+        if self.args.takeoff_latitude is not None \
+            and self.args.takeoff_longitude is not None:
+            takeoff = gpd.GeoSeries(
+                gpd.points_from_xy(
+                    [self.args.takeoff_longitude],
+                    [self.args.takeoff_latitude]
+                    ),
+                crs = "EPSG:4326"
+                ).to_crs(local_crs)
+            start_xy = (takeoff.x.iloc[0], takeoff.y.iloc[0])
+        return xy, start_xy
+    
+    def route_order(self, xy, start_xy = None, verbose = True):
+        # Reorder POIs to shorten the transit route, starting from (and
+        # returning to) the takeoff location if provided
+        order, length_input, length_optimised = optimise_route(
+            xy, start_xy = start_xy, return_to_start = start_xy is not None
+            )
+        if verbose:
+            print(
+                "Route optimisation: transit distance " +
+                f"{length_input:.0f} m -> {length_optimised:.0f} m " +
+                f"(saved {length_input - length_optimised:.0f} m)."
+                )
+        return order
+    
+    def order_pois(self, poi_gdf):
+        xy, start_xy = self.project_pois(poi_gdf)
+        order = self.route_order(xy, start_xy)
+        return poi_gdf.iloc[order].reset_index(drop = True)
+    
+    def photo_circles(self, poi_gdf):
+        # POI waypoints and their photo circles, without action groups
+        utm_crs = poi_gdf.estimate_utm_crs()
+        pois = [
             Waypoint(
                 coordinates = (pt.x, pt.y),
                 altitude = None,
-                velocity = self.args.transitionspeed
+                velocity = self.args.transitionspeed,
+                utm_crs = utm_crs,
+                mission = self
                 )
             for pt in poi_gdf.geometry
             ]
-        
-        # Add photo waypoints
-        new_waypoints = []
-        for wpt in self.waypoints:
-            photogroup = Photogroup(
-                wpt, num_photos = self.num_photos, radius = self.photo_radius
-                )
-            waypoints = photogroup.create_waypoint_group()
-            new_waypoints.extend(waypoints)
-        self.waypoints = new_waypoints
+        circles = generate_circles(
+            pois, self.num_photos, self.photo_radius, utm_crs = utm_crs
+            )
+        return pois, circles
+    
+    def photogroups(self, pois, circles):
+        # One photo group (POI, photo circle, return) per POI; the action
+        # groups are registered with this mission
+        groups = []
+        for wpt, circle in zip(pois, circles):
+            for wpt_i in [wpt] + circle:
+                wpt_i.mission = self
+            groups.append(Photogroup(
+                wpt, num_photos = self.num_photos, radius = self.photo_radius,
+                circle = circle
+                ).waypoints)
+        return groups
+    
+    def expand_pois(self, poi_gdf):
+        return self.photogroups(*self.photo_circles(poi_gdf))
+    
+    def set_waypoints(self, waypoints):
+        self.waypoints = waypoints
         # Set stable waypoint indices
         for i, wpt in enumerate(self.waypoints):
             wpt._index = i
+    
+    def make_waypoints(self):
+        # Create waypoints from POI coordinates
+        poi_gdf = self.read_pois()
+        if self.args.optimise_route:
+            poi_gdf = self.order_pois(poi_gdf)
+        
+        # Add photo waypoints
+        self.set_waypoints([
+            wpt for photogroup in self.expand_pois(poi_gdf)
+            for wpt in photogroup
+            ])
         
         # Set waypoint altitudes based on DSM
         self.waypoint_altitudes_from_dsm()
     
+    def predicted_duration(self, route_length, num_pois):
+        # Rough flight time estimate: transit, photo circle, descent to
+        # and ascent from photo altitude, and hovering for each photo
+        speed = self.args.transitionspeed
+        circle_length = 2 * self.photo_radius + \
+            2 * np.pi * self.photo_radius
+        vertical = 2 * max(
+            self.args.flightaltitude - self.args.photoaltitude, 0.0
+            )
+        per_poi = (circle_length + vertical) / speed + self.num_photos * 1.0
+        return route_length / speed + num_pois * per_poi
+    
     # IO----------------------------------------------------------------
     def export_mission(self):
         self.add_heading_angles()
@@ -237,4 +372,95 @@ class Mission():
             altitude_mode = self.altitude_mode,
             destfile = self.args.destfile
             )
-        print(f"Mission exported to {self.args.destfile}.")
\ No newline at end of file
+        self.action_groups.clear()
+        print(f"Mission exported to {self.args.destfile}.")
+
+def make_slot_missions(args, slots):
+    """
+    Split the POIs across several mission slots.
+
+    The POIs are partitioned into spatially compact parts of balanced
+    predicted flight duration, one per slot. Photo circles and DSM
+    altitudes of the waypoints are computed once for all POIs from a
+    single DSM read. Transit legs are checked per slot, in the order in
+    which they are flown.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed photomission arguments.
+    slots : list of int
+        Indices of the mission slots to fill.
+
+    Returns
+    -------
+    list of Mission
+        One mission per slot, ready for export.
+    """
+    if len(set(slots)) != len(slots):
+        raise ValueError(f"Duplicate mission slots: {slots}.")
+    
+    missions = [Mission(copy.copy(args), slot = slot) for slot in slots]
+    base = missions[0]
+    
+    poi_gdf = base.read_pois()
+    xy, start_xy = base.project_pois(poi_gdf)
+    dist = distance_matrix(
+        xy if start_xy is None else np.vstack([xy, start_xy])
+        )
+    
+    def part_order(part):
+        if base.args.optimise_route:
+            return part[base.route_order(
+                xy[part], start_xy, verbose = False
+                )]
+        return part
+    
+    def part_cost(part, order = None):
+        # Without order, a nearest-neighbour tour serves as a cheap
+        # estimate while the parts are balanced
+        if len(part) == 0:
+            return 0.0
+        if order is None:
+            if start_xy is None:
+                order = np.concatenate([
+                    [part[0]], nearest_neighbour_route(dist, part[0], part)
+                    ])
+            else:
+                order = nearest_neighbour_route(dist, len(xy), part)
+        if start_xy is not None:
+            order = np.concatenate([[len(xy)], order, [len(xy)]])
+        return base.predicted_duration(route_length(order, dist), len(part))
+    
+    parts = partition_points(xy, len(slots), cost = part_cost)
+    
+    # Circle generation shared across all slots; the photo groups are
+    # created per slot so that each mission holds its own action groups
+    pois, circles = base.photo_circles(poi_gdf)
+    orders = [part_order(part) for part in parts]
+    slot_waypoints = []
+    for mission, order in zip(missions, orders):
+        slot_waypoints.append([
+            wpt for group in mission.photogroups(
+                [pois[i] for i in order], [circles[i] for i in order]
+                )
+            for wpt in group
+            ])
+    
+    # DSM sampling shared across all slots
+    base.set_waypoints([wpt for wpts in slot_waypoints for wpt in wpts])
+    dsm = base.waypoint_altitudes_from_dsm(transit_legs = False)
+    takeoff_altitude = base.takeoff_altitude
+    
+    for mission, part, order, wpts in zip(
+            missions, parts, orders, slot_waypoints
+            ):
+        mission._takeoff_altitude = takeoff_altitude
+        mission.set_waypoints(wpts)
+        mission.transit_altitudes_from_dsm(dsm)
+        print(
+            f"Slot {mission.mission_slot}: {len(part)} POIs, " +
+            f"predicted duration {part_cost(part, order) / 60:.1f} min."
+            )
+    
+    return missions
\ No newline at end of file
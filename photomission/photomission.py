@@ -17,7 +17,7 @@ import zipfile
 from warnings import warn
 
 from config import Defaults
-from mission import Mission
+from mission import Mission, make_slot_missions
 from lib.utils import get_heading_angle
 
 # Inputs----------------------------------------------------------------
@@ -28,6 +28,11 @@ parser.add_argument(
     "--slot", "-slt", type = int, default = defaults.slot,
     help = "Mission slot index."
     )
+parser.add_argument(
+    "--slots", "-slts", type = int, nargs = "+", default = None,
+    help = "Mission slot indices. If given, the POIs are split into " +
+        "one mission per slot, balanced by predicted flight duration."
+    )
 parser.add_argument(
     "--flightaltitude", "-flalt", type = float,
     default = defaults.flightaltitude,
@@ -88,17 +93,29 @@ parser.add_argument(
     help = "Radius for photo capture around each waypoint in meters. " +
         f"Defaults to {defaults.photo_radius}."
     )
+parser.add_argument(
+    "--optimise_route", "-opt", action = "store_true",
+    default = defaults.optimise_route,
+    help = "Reorder the POIs to minimise the transit distance " +
+        "(anchored at the takeoff location if provided)."
+    )
 args = parser.parse_args()
 
 # Body------------------------------------------------------------------
 if __name__ == "__main__":
-    ## Create mission object
-    mission = Mission(args)
-    
-    ## Add waypoints and actions
-    mission.make_waypoints()
-    mission.waypoints[0].turn_mode = "toPointAndStopWithContinuityCurvature"
-    mission.waypoints[-1].turn_mode = "toPointAndStopWithContinuityCurvature"
+    ## Create mission objects and add waypoints and actions
+    if args.slots is not None:
+        missions = make_slot_missions(args, args.slots)
+    else:
+        mission = Mission(args)
+        mission.make_waypoints()
+        missions = [mission]
     
-    ## Export mission to KMZ
-    mission.export_mission()
\ No newline at end of file
+    for mission in missions:
+        mission.waypoints[0].turn_mode = \
+            "toPointAndStopWithContinuityCurvature"
+        mission.waypoints[-1].turn_mode = \
+            "toPointAndStopWithContinuityCurvature"
+        
+        ## Export mission to KMZ
+        mission.export_mission()
\ No newline at end of file
@@ -11,14 +11,17 @@ __status__ = "Development"
 
 # Imports---------------------------------------------------------------
 import os
-import time
 import argparse
 import numpy as np
 import pandas as pd
 import geopandas as gpd
 from shapely.geometry import Point, LineString, Polygon
 from pyproj import Geod
-from warnings import warn
+
+from lib.layout import optimal_point_distribution, label_points
+from lib.batch import read_plot_table, build_plots, write_campaign
+from lib.export import KMLWriter, GPXWriter
+from lib.route import walking_order, entry_point
 
 # Inputs----------------------------------------------------------------
 ## Parse input arguments
@@ -37,7 +40,8 @@ parser.add_argument(
     )
 parser.add_argument(
     "--output_format", "-of", type = str, default = None,
-    help = "Output file format."
+    help = "Output file format (gpkg, kml or kmz). Defaults to the " +
+        "extension of --destfile."
     )
 parser.add_argument(
     "--plotangle", "-ra", type = int, default = 90,
@@ -65,6 +69,33 @@ parser.add_argument(
     "--addgpx", "-gpx", action = "store_true",
     help = "Enable additional GPX output."
     )
+parser.add_argument(
+    "--layout_cache", "-lc", type = str, default = None,
+    help = "Path to the on-disk cache of computed point layouts. " +
+        "Defaults to ~/.fieldworktools/plot_layouts.json."
+    )
+parser.add_argument(
+    "--batch", "-b", type = str, default = None,
+    help = "CSV or GPKG file with plot definitions (plot_id, latitude, " +
+        "longitude and optionally width, height, plotangle, numpoints). " +
+        "All plots are written to one file at --destfile."
+    )
+parser.add_argument(
+    "--per_plot", "-pp", action = "store_true",
+    help = "In batch mode, additionally write separate files per plot " +
+        "in the format given by --output_format."
+    )
+parser.add_argument(
+    "--route", "-rt", action = "store_true",
+    help = "Compute a short walking order of the sample points and " +
+        "write it as GPX route and track (and as line to KML/KMZ)."
+    )
+parser.add_argument(
+    "--entry", "-e", type = str, default = "LL",
+    help = "Entry point of the walking route. Either a plot corner " +
+        "(LL, UL, UR, LR; relative to the unrotated plot) or " +
+        "'latitude,longitude'. Defaults to LL (lower left corner)."
+    )
 
 args = parser.parse_args()
 
@@ -154,157 +185,12 @@ def get_plot(latitude, longitude, width, height, plotangle):
     )
     return plot_polygon_gdf
 
-def optimal_point_distribution(width, height, N):
-    if not (isinstance(N, int) and N > 0):
-        raise ValueError("N must be a positive integer.")
-    if N == 1:
-        return np.array([[width / 2, height / 2]])
-    
-    if N == 2:
-        if width >= height:
-            return np.array(
-                [[width / 4, height / 2], [3 * width / 4, height / 2]]
-                )
-        else:
-            return np.array(
-                [[width / 2, height / 4], [width / 2, 3 * height / 4]]
-            )
-    if N == 3:
-        return np.array(
-            [
-                [width / 4, height / 4],
-                [3 * width / 4, height / 4],
-                [width / 2, 3 * height / 4]
-            ]
-        )
-    if N == 4:
-        return np.array(
-            [
-                [width / 4, height / 4],
-                [3 * width / 4, height / 4],
-                [width / 4, 3 * height / 4],
-                [3 * width / 4, 3 * height / 4]
-            ]
-        )
-    if N == 5:
-        return np.array(
-            [
-                [width / 4, height / 4],
-                [3 * width / 4, height / 4],
-                [width / 2, height / 2],
-                [width / 4, 3 * height / 4],
-                [3 * width / 4, 3 * height / 4]
-            ]
-        )
-    if N == 6:
-        if width >= height:
-            return np.array([
-                [width / 4, height / 4],
-                [width / 2, height / 4],
-                [3 * width / 4, height / 4],
-                [width / 4, 3 * height / 4],
-                [width / 2, 3 * height / 4],
-                [3 * width / 4, 3 * height / 4]
-            ])
-        else:
-            return np.array([
-                [width / 4, height / 4],
-                [width / 4, height / 2],
-                [width / 4, 3 * height / 4],
-                [3 * width / 4, height / 4],
-                [3 * width / 4, height / 2],
-                [3 * width / 4, 3 * height / 4]
-            ])
-    if N == 8:
-        if width > 2 / 3 * height and height > 2 / 3 * width:
-            return np.array([
-                [width / 4, height / 4],
-                [width / 4, height / 2],
-                [width / 4, 3 * height / 4],
-                [width / 2, height / 4],
-                [width / 2, 3 * height / 4],
-                [3 * width / 4, height / 4],
-                [3 * width / 4, height / 2],
-                [3 * width / 4, 3 * height / 4],
-            ])
-        if width >= 2 * height and width < 3 * height:
-            return np.array([
-                [width / 5, height / 3],
-                [width / 5, 2 * height / 3],
-                [2 * width / 5, height / 3],
-                [2 * width / 5, 2 * height / 3],
-                [3 * width / 5, height / 3],
-                [3 * width / 5, 2 * height / 3],
-                [4 * width / 5, height / 3],
-                [4 * width / 5, 2 * height / 3]
-            ])
-        if height >= 2 * width and height < 3 * width:
-            return np.array([
-                [width / 3, height / 5],
-                [width / 3, 2 * height / 5],
-                [width / 3, 3 * height / 5],
-                [width / 3, 4 * height / 5],
-                [2 * width / 3, height / 5],
-                [2 * width / 3, 2 * height / 5],
-                [2 * width / 3, 3 * height / 5],
-                [2 * width / 3, 4 * height / 5]
-            ])
-        if height >= 3 * width:
-            return np.array([
-                [width / 2, height / 9],
-                [width / 2, 2 * height / 9],
-                [width / 2, 3 * height / 9],
-                [width / 2, 4 * height / 9],
-                [width / 2, 5 * height / 9],
-                [width / 2, 6 * height / 9],
-                [width / 2, 7 * height / 9],
-                [width / 2, 8 * height / 9]
-            ])
-        if width >= 3 * height:
-            return np.array([
-                [width / 9, height / 2],
-                [2 * width / 9, height / 2],
-                [3 * width / 9, height / 2],
-                [4 * width / 9, height / 2],
-                [5 * width / 9, height / 2],
-                [6 * width / 9, height / 2],
-                [7 * width / 9, height / 2],
-                [8 * width / 9, height / 2]
-            ])
-    if N == 9:
-        if width > 2 / 3 * height and height > 2 / 3 * width:
-            return np.array([
-                [width / 4, height / 4],
-                [width / 4, height / 2],
-                [width / 4, 3 * height / 4],
-                [width / 2, height / 4],
-                [width / 2, height / 2],
-                [width / 2, 3 * height / 4],
-                [3 * width / 4, height / 4],
-                [3 * width / 4, height / 2],
-                [3 * width / 4, 3 * height / 4],
-            ])
-        else:
-            raise NotImplementedError(
-                "Optimal distribution for N=9 is only implemented for " +
-                "approximately square areas."
-            )
-    
 def get_point_locations(
         longitude, latitude, width, height, N, plotangle,
-        label = "{i}{j}"
+        label = "{i}{j}", cache_path = None
         ):
-    points = optimal_point_distribution(width, height, N)
-    order = np.lexsort((points[:, 0], points[:, 1]))
-    points = points[order]
-    rows, row_ids = np.unique(points[:, 1], return_inverse = True)
-    cols, col_ids = np.unique(points[:, 0], return_inverse = True)
-    row_ids = row_ids.max() - row_ids
-    labels = np.array([
-        label.format(
-            i = chr(ord("A") + r), j = c + 1
-            ) for r, c in zip(row_ids, col_ids)
-        ])
+    points = optimal_point_distribution(width, height, N, cache_path)
+    points, labels = label_points(points, label)
     gdf = gpd.GeoDataFrame(
         data = pd.DataFrame({"id": [1]}),
         geometry = gpd.points_from_xy([longitude], [latitude]),
@@ -335,8 +221,175 @@ def get_point_locations(
 
     return points_gdf
 
+def get_output_format(destfile, output_format = None):
+    if output_format is None:
+        output_format = os.path.splitext(
+            destfile
+            )[1].lower().replace(".", "")
+    else:
+        output_format = output_format.lower()
+    
+    if output_format not in ["gpkg", "kml", "kmz"]:
+        raise ValueError(
+            f"Invalid output format {output_format}. " +
+            "Supported formats are: gpkg, kml, kmz"
+            )
+    return output_format
+
+def get_route(ring, points, entry = "LL"):
+    """
+    Walking route through the sample points of a plot.
+
+    Parameters
+    ----------
+    ring : numpy.ndarray
+        Boundary corners (longitude, latitude) of the plot.
+    points : GeoDataFrame
+        Sample points with columns label and geometry (EPSG:4326).
+    entry : str, optional
+        Entry point as accepted by entry_point. The default is "LL".
+
+    Returns
+    -------
+    tuple
+        Route coordinates (longitude, latitude) starting at the entry
+        point, route point names, and the walking distance in m.
+    """
+    start = entry_point(ring, entry)
+    lonlat = points.get_coordinates().to_numpy()
+    order, length = walking_order(lonlat, start)
+    route_lonlat = np.vstack([start, lonlat[order]])
+    names = ["Entry"] + list(points["label"].to_numpy()[order])
+    return route_lonlat, names, length
+
+def write_plot(
+        plot_gdf, points, dst_name, output_format, addgpx = False,
+        route = None
+        ):
+    """
+    Write the boundary and sample points of a single plot.
+
+    Parameters
+    ----------
+    plot_gdf : GeoDataFrame
+        Plot boundary with columns label and geometry (EPSG:4326).
+    points : GeoDataFrame
+        Sample points with columns label and geometry (EPSG:4326).
+    dst_name : str
+        Output path without file extension.
+    output_format : str
+        One of gpkg, kml or kmz.
+    addgpx : bool, optional
+        Write the points to an additional GPX file. The default is False.
+    route : tuple, optional
+        Walking route as returned by get_route. If given, the route is
+        added to KML/KMZ output and written to GPX.
+
+    Returns
+    -------
+    str
+        Path of the main output file.
+    """
+    if output_format == "gpkg":
+        dst = dst_name + ".gpkg"
+        plot_gdf.to_file(
+            dst_name + "_boundary.gpkg",
+            layer = "polygons", driver = "GPKG"
+            )
+        points.to_file(
+            dst_name + "_points.gpkg",
+            layer = "points", driver = "GPKG"
+            )
+    elif output_format in ["kml", "kmz"]:
+        dst = dst_name + "." + output_format
+        with KMLWriter(dst) as kml:
+            kml.polygons(
+                [np.asarray(ring.coords)
+                 for ring in plot_gdf.geometry.exterior],
+                plot_gdf["label"]
+                )
+            kml.points(points.get_coordinates().to_numpy(), points["label"])
+            if route is not None:
+                kml.line(route[0], "Route")
+    if addgpx or route is not None:
+        with GPXWriter(dst_name + ".gpx") as gpx:
+            gpx.waypoints(
+                points.get_coordinates().to_numpy(), points["label"]
+                )
+            if route is not None:
+                gpx.route(route[0], route[1])
+                gpx.track(route[0])
+    return dst
+
 # Body------------------------------------------------------------------
-if __name__ == "__main__":
+if __name__ == "__main__" and args.batch is not None:
+    ## Build all plots at once
+    plots = read_plot_table(
+        args.batch,
+        width = args.width,
+        height = args.height,
+        plotangle = args.plotangle,
+        numpoints = args.numpoints
+        )
+    print(f"Building {len(plots)} plots...")
+    boundaries, points = build_plots(plots, cache_path = args.layout_cache)
+
+    points_by_plot = dict(tuple(points.groupby("plot_id", sort = False)))
+    rings = [
+        np.asarray(ring.coords) for ring in boundaries.geometry.exterior
+        ]
+    routes = {}
+    if args.route:
+        print("Computing walking routes...")
+        for plot_id, ring in zip(boundaries["plot_id"], rings):
+            routes[plot_id] = get_route(
+                ring, points_by_plot[plot_id], args.entry
+                )
+
+    output_format = get_output_format(args.destfile, args.output_format)
+    dst_name = os.path.splitext(args.destfile)[0]
+    dst = dst_name + "." + output_format
+    print(f"Writing to {output_format.upper()}...")
+    if output_format == "gpkg":
+        write_campaign(boundaries, points, dst)
+    else:
+        ## One folder per plot
+        with KMLWriter(dst) as kml:
+            for plot_id, ring in zip(boundaries["plot_id"], rings):
+                plot_points = points_by_plot[plot_id]
+                kml.begin_folder(plot_id)
+                kml.polygons([ring], ["Boundary"])
+                kml.points(
+                    plot_points.get_coordinates().to_numpy(),
+                    plot_points["label"]
+                    )
+                if plot_id in routes:
+                    kml.line(routes[plot_id][0], f"{plot_id} Route")
+                kml.end_folder()
+    if args.addgpx or args.route:
+        with GPXWriter(dst_name + ".gpx") as gpx:
+            gpx.waypoints(points.get_coordinates().to_numpy(), points["label"])
+            for plot_id, (route_lonlat, names, _) in routes.items():
+                gpx.route(route_lonlat, names, name = plot_id)
+            for plot_id, (route_lonlat, _, _) in routes.items():
+                gpx.track(route_lonlat, name = plot_id)
+
+    if args.per_plot:
+        print(f"Writing per-plot {output_format.upper()} output...")
+        dst_dir = os.path.dirname(dst)
+        for plot_id, boundary in boundaries.groupby("plot_id", sort = False):
+            write_plot(
+                boundary[["label", "geometry"]],
+                points_by_plot[plot_id][["label", "geometry"]],
+                dst_name = os.path.join(dst_dir, plot_id),
+                output_format = output_format,
+                addgpx = args.addgpx,
+                route = routes.get(plot_id)
+                )
+
+    print(f"Output written to {dst}.")
+
+elif __name__ == "__main__":
     ## Create plot boundaries
     plot_gdf_utm = get_plot(
         latitude = args.latitude,
@@ -346,30 +399,8 @@ if __name__ == "__main__":
         plotangle = args.plotangle
     )
     plot_gdf = plot_gdf_utm.to_crs("EPSG:4326")
-    if args.output_format is None:
-        output_format = os.path.splitext(
-            args.destfile
-            )[1].lower().replace(".", "")
-    else:
-        output_format = args.output_format.lower()
-    
-    if output_format not in ["gpkg", "kml", "kmz"]:
-        raise ValueError(
-            f"Invalid output format {args.output_format}. " +
-            "Supported formats are: gpkg, kml"
-            )
-    elif output_format == "gpkg":
-        out_ext = ".gpkg"
-    elif output_format == "kml":
-        out_ext = ".kml"
-    elif output_format == "kmz":
-        warn(
-            "Warning: Unsupported output format KMZ requested. Writing KML."
-            )
-        out_ext = ".kml"
-    
+    output_format = get_output_format(args.destfile, args.output_format)
     dst_name = os.path.splitext(args.destfile)[0]
-    dst = dst_name + out_ext
     
     ## Get measurement locations
     points = get_point_locations(
@@ -381,52 +412,27 @@ if __name__ == "__main__":
         plotangle = args.plotangle,
         label = os.path.basename(
             os.path.splitext(args.destfile)[0]
-         ) + "{i}{j}"
+         ) + "{i}{j}",
+        cache_path = args.layout_cache
     )
     points = points[["label", "geometry"]]
     
     plot_gdf[["label"]] = "Boundary"
     plot_gdf = plot_gdf[points.columns]
-    ## Write output
-    if output_format == "gpkg":
-        print("Writing to GPKG...")
-        plot_gdf.to_file(
-            dst_name + "_boundary.gpkg",
-            layer = "polygons", driver = "GPKG"
-            )
-        points.to_file(
-            dst_name + "_points.gpkg",
-            layer = "points", driver = "GPKG"
-            )
-    elif output_format in ["kml", "kmz"]:
-        print("Writing to KML...")
-        combined = pd.concat([plot_gdf, points], ignore_index = True)
-        combined = gpd.GeoDataFrame(
-            combined, geometry = "geometry", crs = plot_gdf.crs
-            )
-        combined["label"] = combined["label"].astype(str)
-        combined = combined.rename(columns = {"label": "Name"})
-        combined["Name"] = combined["Name"].astype(str)
-        combined[["Name", "geometry"]].to_file(dst, driver = "KML")
-    if args.addgpx:
-        print("Writing additional GPX output...")
-        points_gpx = points.rename(columns = {"label": "name"})
-        points_gpx["name"] = points_gpx["name"].astype(str)
-        points_gpx["ele"] = 0
-        points_gpx["time"] = time.strftime(
-            "%Y-%m-%dT%H:%M:%SZ", time.gmtime()
-            )
-        points_gpx["magvar"] = 0
-        points_gpx["geoidheight"] = 0
-        points_gpx = points_gpx[
-            ["geometry", "ele", "time", "magvar", "geoidheight", "name"]
-            ]
-        dst_gpx = os.path.splitext(args.destfile)[0] + ".gpx"
-        points_gpx.to_file(
-            dst_gpx,
-            driver = "GPX",
-            layer = "waypoints",
-            **{"GPX_USE_EXTENSIONS": "YES"}
+    ## Walking route
+    route = None
+    if args.route:
+        route = get_route(
+            np.asarray(plot_gdf.geometry[0].exterior.coords), points,
+            args.entry
             )
+        print(f"Walking route length: {route[2]:.0f} m")
+    
+    ## Write output
+    print(f"Writing to {output_format.upper()}...")
+    dst = write_plot(
+        plot_gdf, points, dst_name, output_format, addgpx = args.addgpx,
+        route = route
+        )
 
-    print(f"Output written to {dst}.")
\ No newline at end of file
+    print(f"Output written to {dst}.")
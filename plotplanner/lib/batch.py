@@ -0,0 +1,232 @@
+import os
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from lib.layout import optimal_point_distribution, label_points
+
+# Settings--------------------------------------------------------------
+PLOT_COLUMNS = ["plot_id", "width", "height", "plotangle", "numpoints"]
+
+# Functions-------------------------------------------------------------
+def read_plot_table(path, width = 100, height = 100, plotangle = 90,
+                    numpoints = 8):
+    """
+    Read plot definitions from a CSV file or a point vector file (e.g.,
+    GPKG).
+
+    CSV files require the columns plot_id, latitude and longitude (in
+    EPSG:4326). Vector files provide the plot centres as point
+    geometries. The optional columns width, height, plotangle and
+    numpoints override the defaults per plot.
+
+    Parameters
+    ----------
+    path : str
+        Path to the plot definition file.
+    width, height, plotangle, numpoints : optional
+        Defaults for plots without individual values.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per plot with the columns plot_id, latitude, longitude,
+        width, height, plotangle and numpoints.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Plot definition file not found: {path}")
+
+    if os.path.splitext(path)[1].lower() == ".csv":
+        table = pd.read_csv(path)
+        missing = {"plot_id", "latitude", "longitude"} - set(table.columns)
+        if missing:
+            raise ValueError(
+                f"Plot definition file lacks columns: {sorted(missing)}."
+                )
+    else:
+        gdf = gpd.read_file(path)
+        if gdf.crs is None:
+            raise ValueError("Plot definition file has no CRS defined.")
+        if not all(gdf.geometry.type == "Point"):
+            raise ValueError(
+                "Plot definition file must contain only point geometries."
+                )
+        gdf = gdf.to_crs("EPSG:4326")
+        table = pd.DataFrame(gdf.drop(columns = gdf.geometry.name))
+        table["longitude"] = gdf.geometry.x.to_numpy()
+        table["latitude"] = gdf.geometry.y.to_numpy()
+        if "plot_id" not in table.columns:
+            table["plot_id"] = [f"plot{i + 1}" for i in range(len(table))]
+
+    defaults = {
+        "width": width, "height": height,
+        "plotangle": plotangle, "numpoints": numpoints
+        }
+    for column, default in defaults.items():
+        if column not in table.columns:
+            table[column] = default
+        table[column] = table[column].fillna(default)
+    table["plot_id"] = table["plot_id"].astype(str)
+    table["numpoints"] = table["numpoints"].astype(int)
+    if table["plot_id"].duplicated().any():
+        raise ValueError("Plot IDs must be unique.")
+
+    return table[["latitude", "longitude"] + PLOT_COLUMNS].reset_index(
+        drop = True
+        )
+
+def utm_epsg(longitude, latitude):
+    """
+    EPSG codes of the WGS84 / UTM zones containing the given locations.
+    """
+    zone = (np.floor((np.asarray(longitude) + 180) / 6) % 60).astype(int) + 1
+    return np.where(np.asarray(latitude) >= 0, 32600, 32700) + zone
+
+def rotate(xy, angle):
+    """
+    Rotate coordinates relative to the plot centre like rotate_gdf, i.e.,
+    by 360 - angle degrees counter-clockwise.
+
+    Parameters
+    ----------
+    xy : numpy.ndarray
+        Array of shape (..., 2) with coordinates relative to the centre.
+    angle : numpy.ndarray or float
+        Rotation angle(s) in degrees, broadcastable to xy[..., 0].
+
+    Returns
+    -------
+    numpy.ndarray
+        Rotated coordinates.
+    """
+    theta = np.deg2rad(360 - np.asarray(angle, dtype = float))
+    cos, sin = np.cos(theta), np.sin(theta)
+    x, y = xy[..., 0], xy[..., 1]
+    return np.stack([cos * x - sin * y, sin * x + cos * y], axis = -1)
+
+def _to_lonlat(xy, epsg):
+    """
+    Reproject an array of coordinates in a single call.
+    """
+    shape = xy.shape
+    flat = xy.reshape(-1, 2)
+    lonlat = gpd.GeoSeries(
+        gpd.points_from_xy(flat[:, 0], flat[:, 1]), crs = f"EPSG:{epsg}"
+        ).to_crs("EPSG:4326").get_coordinates().to_numpy()
+    return lonlat.reshape(shape)
+
+def build_plots(table, cache_path = None):
+    """
+    Build plot boundaries and sample points for many plots at once.
+
+    Plots are processed per UTM zone: all centres are reprojected in one
+    call, the boundary corners and sample points are placed with array
+    operations, and all vertices are reprojected back in one call.
+    Point layouts are computed once per distinct (width, height, N).
+
+    Parameters
+    ----------
+    table : pandas.DataFrame
+        Plot definitions as returned by read_plot_table.
+    cache_path : str, optional
+        Path to the JSON layout cache file.
+
+    Returns
+    -------
+    tuple of geopandas.GeoDataFrame
+        Boundary polygons (one per plot) and labelled sample points, both
+        in EPSG:4326.
+    """
+    # Point layouts relative to the plot centre, shared by equal plots
+    layouts = {}
+    for width, height, numpoints in table[
+        ["width", "height", "numpoints"]
+        ].drop_duplicates().itertuples(index = False):
+        points = optimal_point_distribution(
+            width, height, int(numpoints), cache_path
+            )
+        points, labels = label_points(points)
+        layouts[(width, height, numpoints)] = (
+            points - np.array([width / 2, height / 2]), labels
+            )
+
+    epsg = utm_epsg(table["longitude"], table["latitude"])
+    boundaries = []
+    point_tables = []
+    for code in np.unique(epsg):
+        group = table[epsg == code]
+        centres = gpd.GeoSeries(
+            gpd.points_from_xy(group["longitude"], group["latitude"]),
+            crs = "EPSG:4326"
+            ).to_crs(f"EPSG:{code}").get_coordinates().to_numpy()
+        angles = group["plotangle"].to_numpy(dtype = float) - 90
+
+        # Boundary corners in the same order as get_plot
+        half_w = group["width"].to_numpy(dtype = float)[:, None] / 2
+        half_h = group["height"].to_numpy(dtype = float)[:, None] / 2
+        corners = np.stack([
+            np.array([-1, -1, 1, 1]) * half_w,
+            np.array([-1, 1, 1, -1]) * half_h
+            ], axis = -1)
+        corners = rotate(corners, angles[:, None]) + centres[:, None, :]
+        corners = _to_lonlat(corners, code)
+        boundaries.append(gpd.GeoDataFrame(
+            {"plot_id": group["plot_id"].to_numpy(), "label": "Boundary"},
+            geometry = shapely.polygons(corners),
+            crs = "EPSG:4326"
+            ))
+
+        # Sample points of all plots in the group
+        offsets, labels, plot_ids, idx = [], [], [], []
+        for i, row in enumerate(group.itertuples(index = False)):
+            offset, label = layouts[(row.width, row.height, row.numpoints)]
+            offsets.append(offset)
+            labels.append(np.char.add(row.plot_id, label.astype(str)))
+            plot_ids.append(np.full(len(offset), row.plot_id))
+            idx.append(np.full(len(offset), i))
+        idx = np.concatenate(idx)
+        xy = rotate(np.concatenate(offsets), angles[idx]) + centres[idx]
+        lonlat = _to_lonlat(xy, code)
+        point_tables.append(gpd.GeoDataFrame(
+            {
+                "plot_id": np.concatenate(plot_ids),
+                "label": np.concatenate(labels)
+                },
+            geometry = gpd.points_from_xy(lonlat[:, 0], lonlat[:, 1]),
+            crs = "EPSG:4326"
+            ))
+
+    boundaries = pd.concat(boundaries, ignore_index = True)
+    points = pd.concat(point_tables, ignore_index = True)
+
+    # Restore input order
+    order = pd.Categorical(
+        boundaries["plot_id"], categories = table["plot_id"], ordered = True
+        )
+    boundaries = boundaries.iloc[np.argsort(order.codes, kind = "stable")]
+    order = pd.Categorical(
+        points["plot_id"], categories = table["plot_id"], ordered = True
+        )
+    points = points.iloc[np.argsort(order.codes, kind = "stable")]
+
+    return boundaries.reset_index(drop = True), points.reset_index(drop = True)
+
+def write_campaign(boundaries, points, dst):
+    """
+    Write all plot boundaries and sample points to one GeoPackage with a
+    single write per layer.
+
+    Parameters
+    ----------
+    boundaries : geopandas.GeoDataFrame
+        Plot boundary polygons.
+    points : geopandas.GeoDataFrame
+        Sample points.
+    dst : str
+        Output GeoPackage path.
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    boundaries.to_file(dst, layer = "boundaries", driver = "GPKG")
+    points.to_file(dst, layer = "points", driver = "GPKG")
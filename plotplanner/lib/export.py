@@ -0,0 +1,258 @@
+import os
+import time
+import zipfile
+import numpy as np
+from xml.sax.saxutils import escape
+
+# Settings--------------------------------------------------------------
+COORDINATE_DECIMALS = 8
+
+# Functions-------------------------------------------------------------
+def _format_xy(lonlat, z = None):
+    """
+    Format an array of (longitude, latitude) pairs as KML coordinate
+    tuples.
+    """
+    lonlat = np.asarray(lonlat, dtype = float).reshape(-1, 2)
+    z = np.zeros(len(lonlat)) if z is None else np.broadcast_to(
+        np.asarray(z, dtype = float), len(lonlat)
+        )
+    fmt = f"{{:.{COORDINATE_DECIMALS}f}},{{:.{COORDINATE_DECIMALS}f}},{{:g}}"
+    return [fmt.format(x, y, h) for (x, y), h in zip(lonlat, z)]
+
+def _close_ring(ring):
+    ring = np.asarray(ring, dtype = float)
+    if not np.array_equal(ring[0], ring[-1]):
+        ring = np.vstack([ring, ring[:1]])
+    return ring
+
+def timestamp(t = None):
+    """
+    UTC timestamp in the ISO 8601 format used by KML and GPX.
+    """
+    return time.strftime(
+        "%Y-%m-%dT%H:%M:%SZ", time.gmtime(t)
+        )
+
+# Classes---------------------------------------------------------------
+class KMLWriter():
+    """
+    Streaming KML/KMZ writer. Placemarks are written directly from
+    coordinate arrays (EPSG:4326) as they are added.
+
+    Parameters
+    ----------
+    dst : str
+        Output file. Files ending in .kmz are written as zipped KML.
+    name : str, optional
+        Document name. Defaults to the file name.
+    """
+    def __init__(self, dst, name = None):
+        self.dst = dst
+        self.name = os.path.splitext(os.path.basename(dst))[0] \
+            if name is None else name
+        self.kmz = os.path.splitext(dst)[1].lower() == ".kmz"
+        self._zip = None
+        self._depth = 0
+
+    def __enter__(self):
+        if self.kmz:
+            self._zip = zipfile.ZipFile(
+                self.dst, "w", compression = zipfile.ZIP_DEFLATED
+                )
+            self._raw = self._zip.open("doc.kml", "w")
+        else:
+            self._raw = open(self.dst, "wb")
+        self.write(
+            '<?xml version="1.0" encoding="utf-8" ?>\n'
+            '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+            f'<Document><name>{escape(self.name)}</name>\n'
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        while self._depth > 0:
+            self.end_folder()
+        self.write("</Document></kml>\n")
+        self._raw.close()
+        if self._zip is not None:
+            self._zip.close()
+        return False
+
+    def write(self, text):
+        self._raw.write(text.encode("utf-8"))
+
+    def begin_folder(self, name):
+        self.write(f"<Folder><name>{escape(str(name))}</name>\n")
+        self._depth += 1
+
+    def end_folder(self):
+        self.write("</Folder>\n")
+        self._depth -= 1
+
+    def points(self, lonlat, names, z = None):
+        """
+        Add point placemarks.
+
+        Parameters
+        ----------
+        lonlat : numpy.ndarray
+            Array of shape (n, 2) with longitudes and latitudes.
+        names : array-like of str
+            Placemark names.
+        z : array-like, optional
+            Altitudes. Defaults to 0.
+        """
+        self.write("".join(
+            f"<Placemark><name>{escape(str(name))}</name>"
+            f"<Point><coordinates>{xyz}</coordinates></Point></Placemark>\n"
+            for name, xyz in zip(names, _format_xy(lonlat, z))
+            ))
+
+    def polygons(self, rings, names):
+        """
+        Add polygon placemarks.
+
+        Parameters
+        ----------
+        rings : list of numpy.ndarray
+            Exterior rings as arrays of shape (m, 2) with longitudes and
+            latitudes.
+        names : array-like of str
+            Placemark names.
+        """
+        self.write("".join(
+            f"<Placemark><name>{escape(str(name))}</name>"
+            "<Polygon><outerBoundaryIs><LinearRing><coordinates>"
+            + " ".join(_format_xy(_close_ring(ring))) +
+            "</coordinates></LinearRing></outerBoundaryIs></Polygon>"
+            "</Placemark>\n"
+            for name, ring in zip(names, rings)
+            ))
+
+    def line(self, lonlat, name):
+        """
+        Add a line string placemark.
+
+        Parameters
+        ----------
+        lonlat : numpy.ndarray
+            Array of shape (n, 2) with longitudes and latitudes.
+        name : str
+            Placemark name.
+        """
+        self.write(
+            f"<Placemark><name>{escape(str(name))}</name>"
+            "<LineString><tessellate>1</tessellate><coordinates>"
+            + " ".join(_format_xy(lonlat)) +
+            "</coordinates></LineString></Placemark>\n"
+            )
+
+class GPXWriter():
+    """
+    Streaming GPX 1.1 writer for waypoints, routes and tracks. As
+    required by the GPX schema, waypoints must be added before routes
+    and routes before tracks.
+
+    Parameters
+    ----------
+    dst : str
+        Output file.
+    creator : str, optional
+        Value of the creator attribute. The default is "plotplanner".
+    """
+    def __init__(self, dst, creator = "plotplanner"):
+        self.dst = dst
+        self.creator = creator
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.dst, "w", encoding = "utf-8")
+        self._file.write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n'
+            f'<gpx version="1.1" creator="{escape(self.creator)}" '
+            'xmlns="http://www.topografix.com/GPX/1/1">\n'
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._file.write("</gpx>\n")
+        self._file.close()
+        return False
+
+    def waypoints(
+            self, lonlat, names, ele = 0, t = None, magvar = 0,
+            geoidheight = 0
+            ):
+        """
+        Add waypoints.
+
+        Parameters
+        ----------
+        lonlat : numpy.ndarray
+            Array of shape (n, 2) with longitudes and latitudes.
+        names : array-like of str
+            Waypoint names.
+        ele : float or array-like, optional
+            Elevations. The default is 0.
+        t : str, optional
+            Timestamp. Defaults to the current time.
+        magvar, geoidheight : float, optional
+            Magnetic variation and geoid height. The defaults are 0.
+        """
+        lonlat = np.asarray(lonlat, dtype = float).reshape(-1, 2)
+        ele = np.broadcast_to(np.asarray(ele, dtype = float), len(lonlat))
+        t = timestamp() if t is None else t
+        self._file.write("".join(
+            f'<wpt lat="{y:.{COORDINATE_DECIMALS}f}" '
+            f'lon="{x:.{COORDINATE_DECIMALS}f}">'
+            f"<ele>{h:g}</ele><time>{t}</time>"
+            f"<magvar>{magvar:g}</magvar>"
+            f"<geoidheight>{geoidheight:g}</geoidheight>"
+            f"<name>{escape(str(name))}</name></wpt>\n"
+            for (x, y), h, name in zip(lonlat, ele, names)
+            ))
+
+    def route(self, lonlat, names, name = "Route"):
+        """
+        Add a route.
+
+        Parameters
+        ----------
+        lonlat : numpy.ndarray
+            Array of shape (n, 2) with longitudes and latitudes of the
+            route points in visiting order.
+        names : array-like of str
+            Route point names.
+        name : str, optional
+            Route name. The default is "Route".
+        """
+        lonlat = np.asarray(lonlat, dtype = float).reshape(-1, 2)
+        self._file.write(
+            f"<rte><name>{escape(str(name))}</name>\n" + "".join(
+                f'<rtept lat="{y:.{COORDINATE_DECIMALS}f}" '
+                f'lon="{x:.{COORDINATE_DECIMALS}f}">'
+                f"<name>{escape(str(point_name))}</name></rtept>\n"
+                for (x, y), point_name in zip(lonlat, names)
+                ) + "</rte>\n"
+            )
+
+    def track(self, lonlat, name = "Track"):
+        """
+        Add a track with a single segment.
+
+        Parameters
+        ----------
+        lonlat : numpy.ndarray
+            Array of shape (n, 2) with longitudes and latitudes.
+        name : str, optional
+            Track name. The default is "Track".
+        """
+        lonlat = np.asarray(lonlat, dtype = float).reshape(-1, 2)
+        self._file.write(
+            f"<trk><name>{escape(str(name))}</name><trkseg>\n" + "".join(
+                f'<trkpt lat="{y:.{COORDINATE_DECIMALS}f}" '
+                f'lon="{x:.{COORDINATE_DECIMALS}f}"/>\n'
+                for x, y in lonlat
+                ) + "</trkseg></trk>\n"
+            )
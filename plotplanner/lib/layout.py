@@ -0,0 +1,405 @@
+import os
+import json
+import numpy as np
+
+# Settings--------------------------------------------------------------
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".fieldworktools", "plot_layouts.json"
+    )
+ASPECT_DECIMALS = 2
+
+# Functions-------------------------------------------------------------
+def _row_counts(N, n_rows, centre_heavy = True):
+    """
+    Distribute N points over a number of rows as evenly as possible.
+
+    Parameters
+    ----------
+    N : int
+        Number of points.
+    n_rows : int
+        Number of rows.
+    centre_heavy : bool, optional
+        Place the rows holding an additional point in the centre
+        (True) or at the edges (False). The default is True.
+
+    Returns
+    -------
+    numpy.ndarray
+        Number of points per row.
+    """
+    counts = np.full(n_rows, N // n_rows)
+    extra = N % n_rows
+    # Rows ordered by distance to the centre row
+    by_centrality = np.argsort(
+        np.abs(np.arange(n_rows) - (n_rows - 1) / 2), kind = "stable"
+        )
+    if not centre_heavy:
+        by_centrality = by_centrality[::-1]
+    counts[by_centrality[:extra]] += 1
+    return counts
+
+def _positions(n, inset):
+    """
+    Relative positions of n evenly spaced points on the unit interval,
+    either centred in n equal cells or at j / (n + 1).
+    """
+    if inset:
+        return np.arange(1, n + 1) / (n + 1)
+    return (np.arange(n) + 0.5) / n
+
+def lattice_candidates(N):
+    """
+    Enumerate row-based lattice layouts of N points on the unit square.
+
+    Each layout consists of rows of evenly spaced points, so that points
+    keep a row/column structure suitable for labelling.
+
+    Parameters
+    ----------
+    N : int
+        Number of points.
+
+    Yields
+    ------
+    numpy.ndarray
+        Array of shape (N, 2) with relative (x, y) positions.
+    """
+    for n_rows in range(1, N + 1):
+        for centre_heavy in (True, False):
+            counts = _row_counts(N, n_rows, centre_heavy)
+            if centre_heavy is False and np.all(counts == counts[0]):
+                continue
+            for inset_x in (False, True):
+                for inset_y in (False, True):
+                    ys = _positions(n_rows, inset_y)
+                    yield np.vstack([
+                        np.column_stack([
+                            _positions(count, inset_x),
+                            np.full(count, y)
+                            ])
+                        for count, y in zip(counts, ys)
+                        ])
+
+def layout_energy(points, aspect, resolution = 48):
+    """
+    Spread criterion of a layout: the mean squared distance of the plot
+    area to the nearest point (the energy minimised by centroidal
+    Voronoi tessellations).
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Array of shape (N, 2) with relative (x, y) positions.
+    aspect : float
+        Plot width divided by plot height.
+    resolution : int, optional
+        Number of evaluation cells along the shorter plot side. The
+        default is 48.
+
+    Returns
+    -------
+    float
+        Energy in units of the squared plot height.
+    """
+    nx = max(int(round(resolution * max(aspect, 1.0))), 1)
+    ny = max(int(round(resolution / min(aspect, 1.0))), 1)
+    gx = (np.arange(nx) + 0.5) / nx * aspect
+    gy = (np.arange(ny) + 0.5) / ny
+    grid = np.stack(np.meshgrid(gx, gy), axis = -1).reshape(-1, 2)
+    scaled = points * np.array([aspect, 1.0])
+    d2 = ((grid[:, None, :] - scaled[None, :, :]) ** 2).sum(axis = -1)
+    return float(d2.min(axis = 1).mean())
+
+def general_point_distribution(N, aspect):
+    """
+    Well-spread layout of N points for a plot of the given aspect ratio.
+
+    All lattice candidates are scored by their energy and the best one
+    is returned.
+
+    Parameters
+    ----------
+    N : int
+        Number of points.
+    aspect : float
+        Plot width divided by plot height.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (N, 2) with relative (x, y) positions.
+    """
+    if not (isinstance(N, (int, np.integer)) and N > 0):
+        raise ValueError("N must be a positive integer.")
+    if aspect <= 0:
+        raise ValueError(f"Invalid aspect ratio: {aspect}.")
+    best, best_energy = None, np.inf
+    for candidate in lattice_candidates(int(N)):
+        energy = layout_energy(candidate, aspect)
+        if energy < best_energy - 1e-12:
+            best, best_energy = candidate, energy
+    return best
+
+class LayoutCache():
+    """
+    On-disk cache of relative point layouts keyed by the number of
+    points and the quantised aspect ratio.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path to the JSON cache file. Defaults to DEFAULT_CACHE_PATH.
+    """
+    def __init__(self, path = None):
+        self.path = DEFAULT_CACHE_PATH if path is None else path
+        self._layouts = None
+
+    @staticmethod
+    def key(N, aspect):
+        return f"{int(N)}:{round(float(aspect), ASPECT_DECIMALS)}"
+
+    @property
+    def layouts(self):
+        if self._layouts is None:
+            try:
+                with open(self.path, "r", encoding = "utf-8") as f:
+                    self._layouts = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._layouts = {}
+        return self._layouts
+
+    def get(self, N, aspect):
+        layout = self.layouts.get(self.key(N, aspect))
+        return None if layout is None else np.array(layout)
+
+    def put(self, N, aspect, layout):
+        self.layouts[self.key(N, aspect)] = np.asarray(layout).tolist()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok = True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding = "utf-8") as f:
+                json.dump(self.layouts, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Caching is an optimisation only
+            pass
+
+_caches = {}
+
+def cached_point_distribution(width, height, N, cache_path = None):
+    """
+    Well-spread layout of N points within a width x height rectangle,
+    memoised per (N, quantised aspect ratio) in an on-disk cache.
+
+    Parameters
+    ----------
+    width : float
+        Plot width.
+    height : float
+        Plot height.
+    N : int
+        Number of points.
+    cache_path : str, optional
+        Path to the JSON cache file. Defaults to DEFAULT_CACHE_PATH.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (N, 2) with point coordinates relative to the
+        lower left plot corner.
+    """
+    cache_path = DEFAULT_CACHE_PATH if cache_path is None else cache_path
+    cache = _caches.setdefault(cache_path, LayoutCache(cache_path))
+    aspect = round(width / height, ASPECT_DECIMALS)
+    layout = cache.get(N, aspect)
+    if layout is None:
+        layout = general_point_distribution(N, aspect)
+        cache.put(N, aspect, layout)
+    return layout * np.array([width, height])
+
+def optimal_point_distribution(width, height, N, cache_path = None):
+    """
+    Sample point layout within a width x height rectangle. Predefined
+    layouts are used where available, otherwise a layout is computed
+    (or loaded from the cache) by cached_point_distribution.
+
+    Parameters
+    ----------
+    width : float
+        Plot width.
+    height : float
+        Plot height.
+    N : int
+        Number of points.
+    cache_path : str, optional
+        Path to the JSON layout cache file.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (N, 2) with point coordinates relative to the
+        lower left plot corner.
+    """
+    if not (isinstance(N, int) and N > 0):
+        raise ValueError("N must be a positive integer.")
+    if N == 1:
+        return np.array([[width / 2, height / 2]])
+    
+    if N == 2:
+        if width >= height:
+            return np.array(
+                [[width / 4, height / 2], [3 * width / 4, height / 2]]
+                )
+        else:
+            return np.array(
+                [[width / 2, height / 4], [width / 2, 3 * height / 4]]
+            )
+    if N == 3:
+        return np.array(
+            [
+                [width / 4, height / 4],
+                [3 * width / 4, height / 4],
+                [width / 2, 3 * height / 4]
+            ]
+        )
+    if N == 4:
+        return np.array(
+            [
+                [width / 4, height / 4],
+                [3 * width / 4, height / 4],
+                [width / 4, 3 * height / 4],
+                [3 * width / 4, 3 * height / 4]
+            ]
+        )
+    if N == 5:
+        return np.array(
+            [
+                [width / 4, height / 4],
+                [3 * width / 4, height / 4],
+                [width / 2, height / 2],
+                [width / 4, 3 * height / 4],
+                [3 * width / 4, 3 * height / 4]
+            ]
+        )
+    if N == 6:
+        if width >= height:
+            return np.array([
+                [width / 4, height / 4],
+                [width / 2, height / 4],
+                [3 * width / 4, height / 4],
+                [width / 4, 3 * height / 4],
+                [width / 2, 3 * height / 4],
+                [3 * width / 4, 3 * height / 4]
+            ])
+        else:
+            return np.array([
+                [width / 4, height / 4],
+                [width / 4, height / 2],
+                [width / 4, 3 * height / 4],
+                [3 * width / 4, height / 4],
+                [3 * width / 4, height / 2],
+                [3 * width / 4, 3 * height / 4]
+            ])
+    if N == 8:
+        if width > 2 / 3 * height and height > 2 / 3 * width:
+            return np.array([
+                [width / 4, height / 4],
+                [width / 4, height / 2],
+                [width / 4, 3 * height / 4],
+                [width / 2, height / 4],
+                [width / 2, 3 * height / 4],
+                [3 * width / 4, height / 4],
+                [3 * width / 4, height / 2],
+                [3 * width / 4, 3 * height / 4],
+            ])
+        if width >= 2 * height and width < 3 * height:
+            return np.array([
+                [width / 5, height / 3],
+                [width / 5, 2 * height / 3],
+                [2 * width / 5, height / 3],
+                [2 * width / 5, 2 * height / 3],
+                [3 * width / 5, height / 3],
+                [3 * width / 5, 2 * height / 3],
+                [4 * width / 5, height / 3],
+                [4 * width / 5, 2 * height / 3]
+            ])
+        if height >= 2 * width and height < 3 * width:
+            return np.array([
+                [width / 3, height / 5],
+                [width / 3, 2 * height / 5],
+                [width / 3, 3 * height / 5],
+                [width / 3, 4 * height / 5],
+                [2 * width / 3, height / 5],
+                [2 * width / 3, 2 * height / 5],
+                [2 * width / 3, 3 * height / 5],
+                [2 * width / 3, 4 * height / 5]
+            ])
+        if height >= 3 * width:
+            return np.array([
+                [width / 2, height / 9],
+                [width / 2, 2 * height / 9],
+                [width / 2, 3 * height / 9],
+                [width / 2, 4 * height / 9],
+                [width / 2, 5 * height / 9],
+                [width / 2, 6 * height / 9],
+                [width / 2, 7 * height / 9],
+                [width / 2, 8 * height / 9]
+            ])
+        if width >= 3 * height:
+            return np.array([
+                [width / 9, height / 2],
+                [2 * width / 9, height / 2],
+                [3 * width / 9, height / 2],
+                [4 * width / 9, height / 2],
+                [5 * width / 9, height / 2],
+                [6 * width / 9, height / 2],
+                [7 * width / 9, height / 2],
+                [8 * width / 9, height / 2]
+            ])
+    if N == 9:
+        if width > 2 / 3 * height and height > 2 / 3 * width:
+            return np.array([
+                [width / 4, height / 4],
+                [width / 4, height / 2],
+                [width / 4, 3 * height / 4],
+                [width / 2, height / 4],
+                [width / 2, height / 2],
+                [width / 2, 3 * height / 4],
+                [3 * width / 4, height / 4],
+                [3 * width / 4, height / 2],
+                [3 * width / 4, 3 * height / 4],
+            ])
+    
+    # No predefined layout: compute (or load) a well-spread layout
+    return cached_point_distribution(width, height, N, cache_path)
+
+def label_points(points, label = "{i}{j}"):
+    """
+    Sort points row-wise and label them by row letter and column number
+    (e.g., A1 for the leftmost point of the top row).
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Array of shape (N, 2) with point coordinates.
+    label : str, optional
+        Label template with fields i (row) and j (column). The default
+        is "{i}{j}".
+
+    Returns
+    -------
+    tuple
+        The sorted points and an array of labels.
+    """
+    order = np.lexsort((points[:, 0], points[:, 1]))
+    points = points[order]
+    rows, row_ids = np.unique(points[:, 1], return_inverse = True)
+    cols, col_ids = np.unique(points[:, 0], return_inverse = True)
+    row_ids = row_ids.max() - row_ids
+    labels = np.array([
+        label.format(
+            i = chr(ord("A") + r), j = c + 1
+            ) for r, c in zip(row_ids, col_ids)
+        ])
+    return points, labels
@@ -0,0 +1,239 @@
+import numpy as np
+
+# Settings--------------------------------------------------------------
+EARTH_RADIUS = 6371008.8
+
+# Functions-------------------------------------------------------------
+def local_xy(lonlat, origin = None):
+    """
+    Project longitudes and latitudes to a local equirectangular plane in
+    metres. Accurate enough for distances within a plot.
+
+    Parameters
+    ----------
+    lonlat : numpy.ndarray
+        Array of shape (n, 2) with longitudes and latitudes.
+    origin : tuple, optional
+        (longitude, latitude) of the projection origin. Defaults to the
+        first point.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 2) with x and y in metres.
+    """
+    lonlat = np.asarray(lonlat, dtype = float).reshape(-1, 2)
+    origin = lonlat[0] if origin is None else np.asarray(origin, dtype = float)
+    rad = np.deg2rad(lonlat - origin)
+    return EARTH_RADIUS * np.column_stack([
+        rad[:, 0] * np.cos(np.deg2rad(origin[1])), rad[:, 1]
+        ])
+
+def distance_matrix(xy):
+    """
+    Pairwise Euclidean distances of projected points.
+    """
+    diff = xy[:, None, :] - xy[None, :, :]
+    return np.hypot(diff[..., 0], diff[..., 1])
+
+def nearest_neighbour_order(dist, start):
+    """
+    Visiting order obtained by repeatedly walking to the nearest
+    unvisited node, beginning at node start (not included).
+    """
+    n = len(dist)
+    unvisited = np.ones(n, dtype = bool)
+    unvisited[start] = False
+    order = np.empty(n - 1, dtype = int)
+    current = start
+    for k in range(n - 1):
+        current = int(np.argmin(np.where(unvisited, dist[current], np.inf)))
+        order[k] = current
+        unvisited[current] = False
+    return order
+
+def two_opt(sequence, dist, tol = 1e-9):
+    """
+    Improve a route by reversing sub-sequences (2-opt) until no reversal
+    shortens it. The first and last node of the sequence stay fixed.
+
+    Parameters
+    ----------
+    sequence : numpy.ndarray
+        Node indices in visiting order, including the fixed ends.
+    dist : numpy.ndarray
+        Symmetric distance matrix.
+    tol : float, optional
+        Minimum improvement to accept a move. The default is 1e-9.
+
+    Returns
+    -------
+    tuple
+        The improved sequence and whether any move was applied.
+    """
+    sequence = np.array(sequence, dtype = int)
+    m = len(sequence)
+    improved = False
+    if m < 4:
+        return sequence, improved
+
+    i_idx = np.arange(1, m - 1)
+    upper = np.triu(np.ones((m - 2, m - 2), dtype = bool), k = 1)
+    while True:
+        prev = sequence[i_idx - 1]
+        cur = sequence[i_idx]
+        nxt = sequence[i_idx + 1]
+        # Gain of reversing sequence[i..j] for all pairs i < j at once
+        delta = (
+            dist[prev[:, None], cur[None, :]]
+            + dist[cur[:, None], nxt[None, :]]
+            - dist[prev, cur][:, None]
+            - dist[cur, nxt][None, :]
+            )
+        delta = np.where(upper, delta, np.inf)
+        i, j = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[i, j] >= -tol:
+            return sequence, improved
+        sequence[i + 1:j + 2] = sequence[i + 1:j + 2][::-1]
+        improved = True
+
+def or_opt(sequence, dist, max_segment_length = 3, tol = 1e-9):
+    """
+    Improve a route by relocating short sub-sequences (Or-opt), possibly
+    reversed, to the position where they fit best. The first and last
+    node of the sequence stay fixed.
+
+    Parameters
+    ----------
+    sequence : numpy.ndarray
+        Node indices in visiting order, including the fixed ends.
+    dist : numpy.ndarray
+        Symmetric distance matrix.
+    max_segment_length : int, optional
+        Longest sub-sequence to relocate. The default is 3.
+    tol : float, optional
+        Minimum improvement to accept a move. The default is 1e-9.
+
+    Returns
+    -------
+    tuple
+        The improved sequence and whether any move was applied.
+    """
+    sequence = np.array(sequence, dtype = int)
+    improved = False
+    moved = True
+    while moved:
+        moved = False
+        m = len(sequence)
+        for length in range(1, max_segment_length + 1):
+            for i in range(1, m - length):
+                first = sequence[i]
+                last = sequence[i + length - 1]
+                prev = sequence[i - 1]
+                nxt = sequence[i + length]
+                removal_gain = dist[prev, first] + dist[last, nxt] \
+                    - dist[prev, nxt]
+
+                # Candidate edges (a, b) of the route without the segment
+                rest = np.concatenate(
+                    [sequence[:i], sequence[i + length:]]
+                    )
+                a = rest[:-1]
+                b = rest[1:]
+                forward = dist[a, first] + dist[last, b] - dist[a, b]
+                backward = dist[a, last] + dist[first, b] - dist[a, b]
+                # Re-inserting at the original position is no move
+                forward[i - 1] = backward[i - 1] = np.inf
+                k_fwd = int(np.argmin(forward))
+                k_bwd = int(np.argmin(backward))
+                if forward[k_fwd] <= backward[k_bwd]:
+                    k, cost, reverse = k_fwd, forward[k_fwd], False
+                else:
+                    k, cost, reverse = k_bwd, backward[k_bwd], True
+
+                if cost - removal_gain < -tol:
+                    segment = sequence[i:i + length]
+                    if reverse:
+                        segment = segment[::-1]
+                    sequence = np.concatenate(
+                        [rest[:k + 1], segment, rest[k + 1:]]
+                        )
+                    improved = moved = True
+                    break
+            if moved:
+                break
+
+    return sequence, improved
+
+def walking_order(lonlat, entry, max_iterations = 20):
+    """
+    Short visiting order of sample points for a walk starting at an
+    entry point and ending at the last point.
+
+    A nearest-neighbour walk from the entry point is improved by
+    alternating 2-opt and Or-opt moves. The open end is modelled by a
+    dummy node at zero distance from all points.
+
+    Parameters
+    ----------
+    lonlat : numpy.ndarray
+        Array of shape (n, 2) with longitudes and latitudes of the sample
+        points.
+    entry : tuple
+        (longitude, latitude) of the entry point.
+    max_iterations : int, optional
+        Maximum number of 2-opt/Or-opt rounds. The default is 20.
+
+    Returns
+    -------
+    tuple
+        The visiting order (indices into lonlat) and the walking
+        distance in metres.
+    """
+    lonlat = np.asarray(lonlat, dtype = float).reshape(-1, 2)
+    n = len(lonlat)
+    xy = local_xy(np.vstack([lonlat, entry]), origin = entry)
+    # Nodes: points 0..n-1, entry n, dummy end n + 1
+    dist = np.zeros((n + 2, n + 2))
+    dist[:n + 1, :n + 1] = distance_matrix(xy)
+
+    route = nearest_neighbour_order(dist[:n + 1, :n + 1], n)
+    sequence = np.concatenate([[n], route, [n + 1]])
+    for _ in range(max_iterations):
+        sequence, improved_2opt = two_opt(sequence, dist)
+        sequence, improved_oropt = or_opt(sequence, dist)
+        if not (improved_2opt or improved_oropt):
+            break
+    order = sequence[1:-1]
+    length = float(dist[sequence[:-2], sequence[1:-1]].sum())
+    return order, length
+
+def entry_point(ring, entry = "LL"):
+    """
+    Resolve the entry point of a plot.
+
+    Parameters
+    ----------
+    ring : numpy.ndarray
+        Boundary corners (longitude, latitude) in the order lower left,
+        upper left, upper right, lower right (as created by get_plot).
+    entry : str, optional
+        Either a corner (LL, UL, UR, LR) or coordinates given as
+        "latitude,longitude". The default is "LL".
+
+    Returns
+    -------
+    numpy.ndarray
+        Longitude and latitude of the entry point.
+    """
+    corners = ["LL", "UL", "UR", "LR"]
+    if entry.upper() in corners:
+        return np.asarray(ring, dtype = float)[corners.index(entry.upper())]
+    try:
+        latitude, longitude = (float(v) for v in entry.split(","))
+    except ValueError:
+        raise ValueError(
+            f"Invalid entry point {entry}. Use one of {corners} or " +
+            "'latitude,longitude'."
+            )
+    return np.array([longitude, latitude])
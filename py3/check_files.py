@@ -1,4 +1,6 @@
 import os
+import json
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill
@@ -24,69 +26,196 @@ files_to_check = {
     ]
 }
 
-folders = [
-    f for f in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, f))
-    ]
+max_workers = 16
+# Files smaller than this fraction of the median size of the same product
+# across plots are flagged as possibly truncated
+min_size_fraction = 0.1
+cache_path = os.path.join(base_dir, "file_check_cache.json")
+excel_path = os.path.join(base_dir, "file_check.xlsx")
 
-data = {
-    folder: {
-        os.path.join(sub, fname):
-        os.path.exists(
-            os.path.join(base_dir, folder, sub, fname.format(PLOT = folder))
-            )
-        for sub, fnames in files_to_check.items() for fname in fnames
-    }
-    for folder in folders
+column_names = {
+    "{PLOT}.gpx": "GPX",
+    "{PLOT}_points.gpkg": "Points",
+    "{PLOT}_boundary.gpkg": "Boundary",
+    "{PLOT}_L2.kmz": "L2 Mission",
+    "{PLOT}_M3M.kmz": "M3M Mission",
+    "{PLOT}_report_L2.txt": "L2 Report",
+    "{PLOT}_report_M3M.txt": "M3M Report",
+    "Licor\\Above/{PLOT}-A.txt": "Licor Above",
+    "Licor\\Below/{PLOT}-B.txt": "Licor Below",
+    "Licor\\{PLOT}_Processed_coords.xlsx": "Licor Processed",
+    "DJITerra\\GNDVI.tif": "GNDVI",
+    "DJITerra\\LCI.tif": "LCI",
+    "DJITerra\\NDRE.tif": "NDRE",
+    "DJITerra\\NDVI.tif": "NDVI",
+    "DJITerra\\OSAVI.tif": "OSAVI",
+    "DJITerra\\result.tif": "Result",
+    "DJITerra\\result_Green.tif": "Green",
+    "DJITerra\\result_NIR.tif": "NIR",
+    "DJITerra\\result_RedEdge.tif": "RedEdge",
+    "DJITerra\\result_Red.tif": "Red",
+    "DJITerra\\cloud_merged.las": "Pointcloud",
+    "DJITerra\\dem.tif": "DEM",
+    "DJITerra\\dom.tif": "DOM",
+    "DJITerra\\dsm.tif": "DSM",
+    "DJITerra\\dsm_m3m.tif": "DSM M3M"
 }
 
-df = pd.DataFrame(data).T
-
-df = df.rename(
-    columns = {
-        "{PLOT}.gpx": "GPX",
-        "{PLOT}_points.gpkg": "Points",
-        "{PLOT}_boundary.gpkg": "Boundary",
-        "{PLOT}_L2.kmz": "L2 Mission",
-        "{PLOT}_M3M.kmz": "M3M Mission",
-        "{PLOT}_report_L2.txt": "L2 Report",
-        "{PLOT}_report_M3M.txt": "M3M Report",
-        "Licor\\Above/{PLOT}-A.txt": "Licor Above",
-        "Licor\\Below/{PLOT}-B.txt": "Licor Below",
-        "Licor\\{PLOT}_Processed_coords.xlsx": "Licor Processed",
-        "DJITerra\\GNDVI.tif": "GNDVI",
-        "DJITerra\\LCI.tif": "LCI",
-        "DJITerra\\NDRE.tif": "NDRE",
-        "DJITerra\\NDVI.tif": "NDVI",
-        "DJITerra\\OSAVI.tif": "OSAVI",
-        "DJITerra\\result.tif": "Result",
-        "DJITerra\\result_Green.tif": "Green",
-        "DJITerra\\result_NIR.tif": "NIR",
-        "DJITerra\\result_RedEdge.tif": "RedEdge",
-        "DJITerra\\result_Red.tif": "Red",
-        "DJITerra\\cloud_merged.las": "Pointcloud",
-        "DJITerra\\dem.tif": "DEM",
-        "DJITerra\\dom.tif": "DOM",
-        "DJITerra\\dsm.tif": "DSM",
-        "DJITerra\\dsm_m3m.tif": "DSM M3M"
-    })
-excel_path = os.path.join(base_dir, "file_check.xlsx")
-df.to_excel(excel_path)
-
-wb = load_workbook(excel_path)
-ws = wb.active
 green = PatternFill(
     start_color = "C6EFCE", end_color = "C6EFCE", fill_type = "solid"
     )
 red = PatternFill(
     start_color = "FFC7CE", end_color = "FFC7CE", fill_type = "solid"
     )
+orange = PatternFill(
+    start_color = "FFEB9C", end_color = "FFEB9C", fill_type = "solid"
+    )
+
+def list_dir(path):
+    """
+    Size and modification time of all files in a directory from a single
+    scandir call.
+    """
+    try:
+        with os.scandir(path) as entries:
+            listing = {}
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    listing[entry.name] = [stat.st_size, stat.st_mtime_ns]
+            return listing
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+def scan_plot(folder):
+    """
+    Size and modification time of the expected files of a plot (None if
+    missing). Each plot directory is listed once and files are matched
+    in memory. Directory modification times are not used, since
+    overwriting a file does not change them (and FAT/exFAT drives do not
+    update them reliably).
+    """
+    expected = {
+        os.path.join(sub, fname):
+        os.path.join(base_dir, folder, sub, fname.format(PLOT = folder))
+        for sub, fnames in files_to_check.items() for fname in fnames
+    }
+    listings = {
+        d: list_dir(d)
+        for d in set(os.path.dirname(path) for path in expected.values())
+    }
+    return {
+        key: listings[os.path.dirname(path)].get(os.path.basename(path))
+        for key, path in expected.items()
+    }
+
+def write_row(ws_files, ws_sizes, r, folder, present, size, flags):
+    """
+    Write the row of a plot to both sheets and colour the Files sheet.
+    """
+    for ws in (ws_files, ws_sizes):
+        ws.cell(row = r, column = 1, value = folder)
+    for c, (p, s, f) in enumerate(zip(present, size, flags), start = 2):
+        cell = ws_files.cell(row = r, column = c, value = bool(p))
+        # Assigned directly, since cell(value = None) keeps old values
+        ws_sizes.cell(row = r, column = c).value = \
+            None if pd.isna(s) else int(s)
+        cell.fill = orange if f else (green if p else red)
+
+def update_report(rows, changed, removed):
+    """
+    Update the rows of changed and removed plots in the Excel report,
+    rebuilding it if it is missing or its columns changed.
+    """
+    size_df = pd.DataFrame(rows).T
+    size_df.columns = [column_names.get(c, c) for c in size_df.columns]
+    columns = list(size_df.columns)
+
+    # Rebuild the report if there is none or its columns changed
+    rebuild = not os.path.isfile(excel_path)
+    if not rebuild:
+        wb = load_workbook(excel_path)
+        rebuild = [c.value for c in wb["Files"][1]][1:] != columns
+    if rebuild:
+        with pd.ExcelWriter(excel_path) as writer:
+            size_df.notna().to_excel(writer, sheet_name = "Files")
+            size_df.to_excel(writer, sheet_name = "Sizes")
+        wb = load_workbook(excel_path)
+        changed = list(rows)
+    else:
+        print(f"Changes in {len(changed + removed)} plots: " +
+              ", ".join(sorted(changed + removed)))
+
+    # Flag empty and suspiciously small files of the changed plots
+    median_size = size_df.median()
+    changed_df = size_df.loc[changed]
+    flagged = (changed_df == 0) | \
+        (changed_df < min_size_fraction * median_size)
+
+    ws_files = wb["Files"]
+    ws_sizes = wb["Sizes"]
+    sheet_rows = {
+        ws_files.cell(row = r, column = 1).value: r
+        for r in range(2, ws_files.max_row + 1)
+        }
+    for folder in sorted(
+            removed, key = lambda f: sheet_rows.get(f, 0), reverse = True
+            ):
+        if folder in sheet_rows:
+            ws_files.delete_rows(sheet_rows[folder])
+            ws_sizes.delete_rows(sheet_rows[folder])
+    sheet_rows = {
+        ws_files.cell(row = r, column = 1).value: r
+        for r in range(2, ws_files.max_row + 1)
+        }
+    for folder in changed:
+        r = sheet_rows.get(folder, ws_files.max_row + 1)
+        sheet_rows[folder] = r
+        write_row(
+            ws_files, ws_sizes, r, folder,
+            size_df.loc[folder].notna(), size_df.loc[folder],
+            flagged.loc[folder]
+            )
+
+    wb.save(excel_path)
+
+if __name__ == "__main__":
+    try:
+        with open(cache_path, "r", encoding = "utf-8") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+    # Report rows of the last scan, keyed by the plot signature (name, size
+    # and modification time of the expected files)
+    previous = cache.get("plots", {})
+
+    folders = [
+        f.name for f in os.scandir(base_dir) if f.is_dir()
+        ]
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        signatures = dict(zip(folders, executor.map(scan_plot, folders)))
+
+    changed = [
+        folder for folder in folders
+        if signatures[folder] != previous.get(folder, {}).get("signature")
+        ]
+    removed = sorted(set(previous) - set(signatures))
+    rows = {
+        folder: previous[folder]["row"] if folder not in changed else {
+            key: None if entry is None else entry[0]
+            for key, entry in signatures[folder].items()
+            }
+        for folder in folders
+        }
 
-for r in range(2, ws.max_row + 1):
-    for c in range(2, ws.max_column + 1):
-        cell = ws.cell(row = r, column = c)
-        if cell.value is True:
-            cell.fill = green
-        elif cell.value is False:
-            cell.fill = red
+    with open(cache_path, "w", encoding = "utf-8") as f:
+        json.dump({"plots": {
+            folder: {"signature": signatures[folder], "row": rows[folder]}
+            for folder in folders
+            }}, f)
 
-wb.save(excel_path)
\ No newline at end of file
+    if not changed and not removed and os.path.isfile(excel_path):
+        print(f"No changes since the last scan. {excel_path} is up to date.")
+    else:
+        update_report(rows, changed, removed)
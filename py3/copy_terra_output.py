@@ -1,60 +1,117 @@
 import os
-import shutil
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+from sync_engine import copy_file, is_stale
 
 dji_directory = "C:/Users/dme/Documents/DJI/DJITerra/dme@wsl.ch"
 sample_main = "F:/FIELDWORK"
 sample_directories = os.listdir(sample_main)
 
-# Copy DJI Terra results for Mavic 3M
-for sample in sample_directories:
-    print(f"Processing M3M sample: {sample}")
-    if os.path.exists(os.path.join(dji_directory, sample + "MS")):
-        dst_dir = os.path.join(sample_main, sample, "DJITerra")
-
-        # Copy level 0 files
-        src_dir = os.path.join(dji_directory, sample + "MS", "map")
-        tif_files_src = [f for f in os.listdir(src_dir) if f.endswith(".tif")]
-        tif_files_dst = [
-            f if not f == "dsm.tif" else "dsm_m3m.tif" for f in tif_files_src
-            ]
-        print(f"M3M source files: {tif_files_src}")
-        print(f"Copy to: {tif_files_dst}")
-        for f_src, f_dst in zip(tif_files_src, tif_files_dst):
-            shutil.copy(
-                os.path.join(src_dir, f_src),
-                os.path.join(dst_dir, f_dst)
-                )
-        
-        # Copy level -1 files
-        src_dir = os.path.join(dji_directory, sample + "MS", "map", "index_map")
-        tif_files = [f for f in os.listdir(src_dir) if f.endswith(".tif")]
-        print(f"M3M maps: {tif_files}")
-        for f in tif_files:
-            if os.path.exists(
-                os.path.join(src_dir, f)
-                ) and not os.path.exists(os.path.join(dst_dir, f)):
-                shutil.copy(
-                    os.path.join(src_dir, f),
-                    os.path.join(dst_dir, f)
-                    )
-
-# Copy DJI Terra results for L2
-additional_files = {
-    "terra_las": "cloud_merged.las",
-    "terra_dsm": "dsm.tif",
-    "terra_dom": "dom.tif",
-    "terra_dem": "dem.tif"
+# Also compare file content (slow) if size and mtime are equal
+compare_hash = False
+max_workers = 4
+
+# DJI Terra outputs per sensor. Each mapping lists a source directory
+# relative to the DJI Terra project folder, the files to copy (glob
+# patterns) and optional renames. Files go to <sample>/DJITerra.
+sensors = {
+    "M3M": [
+        {
+            "src": os.path.join("{sample}MS", "map"),
+            "files": ["*.tif"],
+            "rename": {"dsm.tif": "dsm_m3m.tif"}
+        },
+        {
+            "src": os.path.join("{sample}MS", "map", "index_map"),
+            "files": ["*.tif"]
+        }
+    ],
+    "L2": [
+        {
+            "src": os.path.join("{sample}LiDAR", "lidars", "terra_las"),
+            "files": ["cloud_merged.las"]
+        },
+        {
+            "src": os.path.join("{sample}LiDAR", "lidars", "terra_dsm"),
+            "files": ["dsm.tif"]
+        },
+        {
+            "src": os.path.join("{sample}LiDAR", "lidars", "terra_dom"),
+            "files": ["dom.tif"]
+        },
+        {
+            "src": os.path.join("{sample}LiDAR", "lidars", "terra_dem"),
+            "files": ["dem.tif"]
+        }
+    ]
 }
 
-for sample in sample_directories:
-    print(f"Processing L2 sample: {sample}")
-    if os.path.exists(os.path.join(dji_directory, sample + "LiDAR", "lidars")):
-        for subfolder, filename in additional_files.items():
-            src_path = os.path.join(
-                dji_directory, sample + "LiDAR", "lidars", subfolder, filename
-                )
-            dst_path = os.path.join(
-                sample_main, sample, "DJITerra", filename
+def list_files(path):
+    try:
+        with os.scandir(path) as entries:
+            return [entry.name for entry in entries if entry.is_file()]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+def plan_copies(sample):
+    """
+    List all (sensor, src, dst, reason) copies required for a sample.
+    """
+    dst_dir = os.path.join(sample_main, sample, "DJITerra")
+    plan = []
+    for sensor, mappings in sensors.items():
+        for mapping in mappings:
+            src_dir = os.path.join(
+                dji_directory, mapping["src"].format(sample = sample)
                 )
-            if os.path.exists(src_path) and not os.path.exists(dst_path):
-                shutil.copy(src_path, dst_path)
\ No newline at end of file
+            rename = mapping.get("rename", {})
+            for f in list_files(src_dir):
+                if not any(fnmatch.fnmatch(f, p) for p in mapping["files"]):
+                    continue
+                src = os.path.join(src_dir, f)
+                dst = os.path.join(dst_dir, rename.get(f, f))
+                reason = is_stale(src, dst, compare_hash = compare_hash)
+                plan.append((sensor, src, dst, reason))
+    return plan
+
+# Plan all copies
+print(f"Planning copies for {len(sample_directories)} samples...")
+with ThreadPoolExecutor(max_workers = max_workers) as executor:
+    plan = [
+        job for jobs in executor.map(plan_copies, sample_directories)
+        for job in jobs
+        ]
+copies = [job for job in plan if job[3] is not None]
+print(
+    f"{len(plan)} DJI Terra outputs found, {len(copies)} new or stale."
+    )
+
+# Copy concurrently
+summary = {}
+failures = []
+with ThreadPoolExecutor(max_workers = max_workers) as executor:
+    futures = {
+        executor.submit(copy_file, src, dst): (sensor, src, dst, reason)
+        for sensor, src, dst, reason in copies
+        }
+    for future in tqdm(as_completed(futures), total = len(futures)):
+        sensor, src, dst, reason = futures[future]
+        try:
+            future.result()
+            key = (sensor, reason)
+            summary[key] = summary.get(key, 0) + 1
+        except Exception as e:
+            failures.append((src, dst, e))
+
+# Summary
+reasons = {
+    "new": "new", "size": "size changed", "mtime": "newer source",
+    "hash": "content changed"
+    }
+for (sensor, reason), n in sorted(summary.items()):
+    print(f"{sensor}: {n} files copied ({reasons[reason]})")
+print(f"{len(plan) - len(copies)} files up to date.")
+for src, dst, e in failures:
+    print(f"Failed to copy {src} to {dst}: {e}")
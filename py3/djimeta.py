@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Pure-Python reader for the EXIF GPS and DJI XMP tags of drone JPEGs.
+
+Only the JPEG header segments (APP1 EXIF and XMP) are read from a
+memory map of the file, so no exiftool process is needed. Records use
+exiftool tag names and numeric values as returned by "exiftool -j -n".
+
+Run as script to compare the reader with exiftool for some images:
+    python djimeta.py IMAGE [IMAGE ...]
+"""
+import re
+import sys
+import mmap
+import json
+import struct
+import subprocess
+
+XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+EXIF_HEADER = b"Exif\x00\x00"
+
+# DJI XMP values as attributes or elements
+XMP_ATTRIBUTE = re.compile(rb'drone-dji:(\w+)="([^"]*)"')
+XMP_ELEMENT = re.compile(rb"<drone-dji:(\w+)>([^<]*)</drone-dji:\1>")
+NUMBER = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+
+# TIFF tags
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+EXIF_TAGS = {
+    0x9003: "DateTimeOriginal",
+    0x9004: "CreateDate",
+    0x010F: "Make",
+    0x0110: "Model"
+}
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+def _read_ifd(tiff, offset, endian):
+    """
+    Entries of a TIFF image file directory as {tag: value}.
+    """
+    entries = {}
+    if offset + 2 > len(tiff):
+        return entries
+    n = struct.unpack_from(endian + "H", tiff, offset)[0]
+    for i in range(n):
+        pos = offset + 2 + 12 * i
+        if pos + 12 > len(tiff):
+            break
+        tag, typ, count = struct.unpack_from(endian + "HHI", tiff, pos)
+        size = TYPE_SIZES.get(typ, 1) * count
+        if size > 4:
+            data_pos = struct.unpack_from(endian + "I", tiff, pos + 8)[0]
+        else:
+            data_pos = pos + 8
+        data = tiff[data_pos:data_pos + size]
+        if len(data) < size:
+            continue
+        if typ == 2:
+            value = data.split(b"\x00", 1)[0].decode("ascii", "replace")
+        elif typ in (5, 10):
+            fmt = endian + ("I" if typ == 5 else "i") * (2 * count)
+            raw = struct.unpack(fmt, data)
+            value = [
+                raw[k] / raw[k + 1] if raw[k + 1] else float("nan")
+                for k in range(0, len(raw), 2)
+                ]
+        elif typ in (3, 4, 9):
+            fmt = endian + {3: "H", 4: "I", 9: "i"}[typ] * count
+            value = list(struct.unpack(fmt, data))
+        else:
+            value = bytes(data)
+        if isinstance(value, list) and len(value) == 1:
+            value = value[0]
+        entries[tag] = value
+    return entries
+
+def _parse_exif(tiff):
+    record = {}
+    endian = "<" if tiff[:2] == b"II" else ">"
+    ifd0 = _read_ifd(tiff, struct.unpack_from(endian + "I", tiff, 4)[0], endian)
+    for tag in (0x010F, 0x0110):
+        if tag in ifd0:
+            record[EXIF_TAGS[tag]] = ifd0[tag]
+    if EXIF_IFD in ifd0:
+        exif = _read_ifd(tiff, ifd0[EXIF_IFD], endian)
+        for tag in (0x9003, 0x9004):
+            if tag in exif:
+                record[EXIF_TAGS[tag]] = exif[tag]
+    if GPS_IFD in ifd0:
+        gps = _read_ifd(tiff, ifd0[GPS_IFD], endian)
+        for ref_tag, tag, name, negative in (
+                (1, 2, "GPSLatitude", "S"), (3, 4, "GPSLongitude", "W")
+                ):
+            # Degrees, minutes and seconds; other lengths are malformed
+            if isinstance(gps.get(tag), list) and len(gps[tag]) == 3:
+                d, m, s = gps[tag]
+                value = d + m / 60 + s / 3600
+                if gps.get(ref_tag, "").upper() == negative:
+                    value = -value
+                record[name] = value
+        if 6 in gps:
+            altitude = gps[6]
+            ref = gps.get(5, b"\x00")
+            if ref in (1, b"\x01"):
+                altitude = -altitude
+            record["GPSAltitude"] = altitude
+    return record
+
+def _parse_xmp(packet):
+    record = {}
+    for pattern in (XMP_ATTRIBUTE, XMP_ELEMENT):
+        for name, value in pattern.findall(packet):
+            value = value.decode("utf-8", "replace").strip()
+            record[name.decode("ascii")] = float(value) \
+                if NUMBER.match(value) else value
+    return record
+
+def read_metadata(path):
+    """
+    Read EXIF GPS/date tags and DJI XMP tags from the header of a JPEG.
+
+    Parameters
+    ----------
+    path : str
+        Image file.
+
+    Returns
+    -------
+    dict or None
+        Record with exiftool tag names (SourceFile, CreateDate,
+        GPSLatitude, GPSLongitude, AbsoluteAltitude, Gimbal*, Flight*,
+        LRFTarget*, ...) and numeric values, or None if the file is no
+        JPEG with EXIF or XMP data.
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return None
+    with mm:
+        if mm[:2] != b"\xff\xd8":
+            return None
+        record = {"SourceFile": path}
+        found = False
+        pos = 2
+        size = len(mm)
+        while pos + 4 <= size:
+            if mm[pos] != 0xFF:
+                break
+            marker = mm[pos + 1]
+            if marker == 0xFF:
+                pos += 1
+                continue
+            if marker in (0xD9, 0xDA):
+                # End of image or start of scan: no more metadata
+                break
+            length = struct.unpack(">H", mm[pos + 2:pos + 4])[0]
+            if marker == 0xE1:
+                segment = mm[pos + 4:pos + 2 + length]
+                if segment.startswith(EXIF_HEADER):
+                    record.update(_parse_exif(segment[len(EXIF_HEADER):]))
+                    found = True
+                elif segment.startswith(XMP_HEADER):
+                    record.update(_parse_xmp(segment[len(XMP_HEADER):]))
+                    found = True
+            pos += 2 + length
+    return record if found else None
+
+def read_metadata_many(paths):
+    """
+    Read records of many images. Files that cannot be parsed are
+    returned separately, e.g., for a fallback to exiftool.
+
+    Returns
+    -------
+    tuple
+        List of records and list of paths that could not be parsed.
+    """
+    records = []
+    failed = []
+    for path in paths:
+        try:
+            record = read_metadata(path)
+        except (OSError, struct.error, ValueError):
+            record = None
+        if record is None:
+            failed.append(path)
+        else:
+            records.append(record)
+    return records, failed
+
+def compare_with_exiftool(paths, tol = 1e-6):
+    """
+    Differential check of read_metadata against "exiftool -j -n". Prints
+    and returns all tags whose values differ.
+    """
+    result = subprocess.run(
+        ["exiftool", "-j", "-n", *paths],
+        stdout = subprocess.PIPE, stderr = subprocess.PIPE, text = True
+        )
+    reference = {r["SourceFile"]: r for r in json.loads(result.stdout)}
+    differences = []
+    for path in paths:
+        record = read_metadata(path) or {}
+        expected = reference.get(path, {})
+        for tag, value in record.items():
+            if tag == "SourceFile" or tag not in expected:
+                continue
+            other = expected[tag]
+            if isinstance(value, float) and isinstance(other, (int, float)):
+                equal = abs(value - other) <= tol * max(1, abs(other))
+            else:
+                equal = str(value) == str(other)
+            if not equal:
+                differences.append((path, tag, value, other))
+                print(f"{path}: {tag} = {value} (exiftool: {other})")
+    print(f"{len(differences)} differences in {len(paths)} images.")
+    return differences
+
+if __name__ == "__main__":
+    compare_with_exiftool(sys.argv[1:])
@@ -1,9 +1,34 @@
+import os
 import re
+import time
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
 import pykew.powo as powo
+from pykew.core import POWO_URL
 from pykew.powo_terms import Name, Filters
 
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".fieldworktools", "powo_cache"
+    )
+HTML_TAG = re.compile(r"<[^>]+>")
+
 def strip_html(text):
-    return re.sub(r"<[^>]+>", "", text)
+    return HTML_TAG.sub("", text)
+
+def compile_patterns(patterns):
+    """
+    Compile case-insensitive regular expressions once. Already compiled
+    patterns are passed through and empty patterns are dropped.
+    """
+    if not patterns:
+        return []
+    return [
+        p if isinstance(p, re.Pattern) else re.compile(p, re.IGNORECASE)
+        for p in patterns if p
+        ]
 
 def flatten_object(
         obj, level = 0, clean = True, include_tags = None, exclude_tags = None,
@@ -36,12 +61,7 @@ def flatten_object(
         The flattened string representation of the object.
     """
     def matches_any(key, patterns):
-        for pattern in patterns:
-            if not pattern:
-                continue
-            if re.search(pattern, key, re.IGNORECASE):
-                return True
-        return False
+        return any(pattern.search(key) for pattern in patterns)
     
     def has_include_tag(obj, patterns):
         if isinstance(obj, dict):
@@ -56,10 +76,9 @@ def flatten_object(
                     return True
         return False
     
-    if include_tags is None:
-        include_tags = []
-    if exclude_tags is None:
-        exclude_tags = []
+    include_tags = compile_patterns(include_tags)
+    exclude_tags = compile_patterns(exclude_tags)
+    keywords = compile_patterns(keywords)
     
     if isinstance(obj, str):
         text = strip_html(obj) if clean else obj
@@ -68,7 +87,7 @@ def flatten_object(
             text = text.split("\n")
             text = [
                 line.strip() for line in text if any(
-                    re.search(keyword, line, re.IGNORECASE) for keyword in keywords
+                    keyword.search(line) for keyword in keywords
                     )
                 ]
             text = "\n".join(text)
@@ -156,6 +175,157 @@ def get_descriptions(
     
     return flatten_object(descriptions, **kwargs) if flatten else descriptions
 
+class PowoClient():
+    """
+    Minimal client for the POWO API with an on-disk cache of the raw
+    JSON responses. Cached requests do not need network access.
+    
+    Parameters
+    ----------
+    base_url : str
+        API base URL. Defaults to POWO_URL (or a local stub server).
+    cache_dir : str | None
+        Directory of the response cache. Defaults to DEFAULT_CACHE_DIR.
+    timeout : float
+        Request timeout in seconds.
+    max_retries : int
+        Retries of rate-limited requests (status 249), waiting 5 s, 10 s,
+        20 s, ... in between.
+    """
+    def __init__(
+            self, base_url = POWO_URL, cache_dir = None, timeout = 30,
+            max_retries = 5
+            ):
+        self.base_url = base_url.rstrip("/")
+        self.cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._local = threading.local()
+        os.makedirs(self.cache_dir, exist_ok = True)
+    
+    @property
+    def session(self):
+        # One session per worker thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+    
+    def _cache_path(self, url, params):
+        key = json.dumps([url, sorted(params.items())])
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".json")
+    
+    def get(self, path, params):
+        url = f"{self.base_url}/{path}"
+        cache_path = self._cache_path(path, params)
+        if os.path.isfile(cache_path):
+            with open(cache_path, "r", encoding = "utf-8") as f:
+                return json.load(f)
+        
+        for attempt in range(self.max_retries + 1):
+            response = self.session.get(
+                url, params = params, timeout = self.timeout
+                )
+            if response.status_code != 249:
+                break
+            # Too many requests
+            if attempt < self.max_retries:
+                time.sleep(5 * 2 ** attempt)
+        else:
+            raise requests.HTTPError(
+                f"Too many requests to {url} after {self.max_retries} " +
+                "retries.", response = response
+                )
+        response.raise_for_status()
+        data = response.json()
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding = "utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+        return data
+    
+    def search(self, genus, epithet):
+        # Follow the cursor through all result pages
+        query = f"{Name.genus.value}:{genus},{Name.species.value}:{epithet}"
+        results = []
+        cursor = "*"
+        while True:
+            data = self.get("search", {
+                "q": query,
+                "f": f"{Filters.accepted.value},{Filters.species.value}",
+                "perPage": 500,
+                "cursor": cursor
+                })
+            page = data.get("results", [])
+            results.extend(page)
+            if not page or data.get("cursor") in (None, cursor) or \
+                    len(results) >= data.get("totalResults", float("inf")):
+                return results
+            cursor = data["cursor"]
+    
+    def lookup(self, fqid):
+        return self.get(f"taxon/{fqid}", {"fields": "descriptions"})
+
+def get_descriptions_bulk(
+        taxa, flatten = True, max_workers = 8, base_url = POWO_URL,
+        cache_dir = None, **kwargs
+        ):
+    """
+    Get descriptions for many plant species from kew.org at once.
+    Searches and lookups run concurrently and raw responses are cached
+    on disk, so re-runs work offline.
+    
+    Parameters
+    ----------
+    taxa : list
+        Species as "Genus epithet" strings or (genus, epithet) tuples.
+    flatten : bool
+        Whether to flatten the descriptions (see flatten_object).
+    max_workers : int
+        Number of concurrent requests.
+    base_url : str
+        API base URL, e.g., of a local stub server for testing.
+    cache_dir : str | None
+        Directory of the response cache.
+    **kwargs : dict
+        Additional keyword arguments to pass to the flatten function.
+    
+    Returns
+    -------
+    dict
+        Descriptions (or the exception raised) per taxon.
+    """
+    client = PowoClient(base_url = base_url, cache_dir = cache_dir)
+    for key in ["include_tags", "exclude_tags", "keywords"]:
+        kwargs[key] = compile_patterns(kwargs.get(key))
+    
+    def resolve(taxon):
+        genus, epithet = taxon.split()[:2] if isinstance(taxon, str) \
+            else taxon
+        descriptions = []
+        for result in client.search(genus, epithet):
+            details = client.lookup(result["fqId"])
+            descriptions.append(
+                details.get("descriptions") or details.get("description") \
+                    or "N/A"
+                )
+        return flatten_object(descriptions, **kwargs) if flatten \
+            else descriptions
+    
+    def safe_resolve(taxon):
+        try:
+            return resolve(taxon)
+        except Exception as e:
+            return e
+    
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        results = list(executor.map(safe_resolve, taxa))
+    
+    return {
+        taxon if isinstance(taxon, str) else " ".join(taxon): result
+        for taxon, result in zip(taxa, results)
+        }
+
 # Usage example
 if __name__ == "__main__":
     description = get_descriptions(
@@ -5,22 +5,55 @@ Spyder Editor
 This is a temporary script file.
 """
 import os
-import shutil
-import hashlib
-import pickle as pk
+import json
 from glob import glob
 from tqdm import tqdm
 
-def file_hash(path, algo = "sha256", chunk_size = 1024 * 1024):
-    h = hashlib.new(algo)
+from sync_engine import SyncJournal, copy_file, file_hash, run_sync
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding = "utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest, path):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding = "utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def cached_hash(path, manifest, algo = "sha256"):
+    """
+    Return the hash of a file, reusing the manifest entry if size and
+    modification time are unchanged. Otherwise, the file is hashed once
+    and the manifest is updated.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = manifest.get(key)
+    if entry is not None and entry["size"] == stat.st_size and \
+            entry["mtime"] == stat.st_mtime_ns and entry["algo"] == algo:
+        return entry["hash"]
     
-    with open(path, "rb") as f:
-        h.update(f.read(chunk_size))
+    digest = file_hash(path, algo = algo)
+    manifest[key] = {
+        "size": stat.st_size, "mtime": stat.st_mtime_ns,
+        "algo": algo, "hash": digest
+        }
+    return digest
+
+def equal_content(*files, manifest = None):
+    # Files of different size cannot be equal, no need to read them
+    if len(set(os.path.getsize(f) for f in files)) > 1:
+        return False
     
-    return h.hexdigest()
-
-def equal_content(*files):
-    hashes = [file_hash(f) for f in files]
+    if manifest is None:
+        hashes = [file_hash(f) for f in files]
+    else:
+        hashes = [cached_hash(f, manifest) for f in files]
     
     return len(set(hashes)) == 1
 
@@ -30,6 +63,11 @@ airborne_dst = os.path.join(dst_dir, "measurments", "airborne")
 ground_dst = os.path.join(dst_dir, "measurments", "ground")
 
 overwrite = False
+max_workers = 4
+
+# Size, mtime and hash of previously hashed files
+manifest_path = os.path.join(dst_dir, ".move_files_manifest.json")
+manifest = load_manifest(manifest_path)
 
 # Metadata filepattern
 boundary_src = os.path.join(src_dir, "{plot}", "{plot}_boundary.gpkg")
@@ -113,12 +151,11 @@ destinations = [
     osavi_dst, green_dst, nir_dst, red_dst, rededge_dst, licor_dst
     ]
 
-# Loop over plots
+# Plan copy jobs
 plot_folders = os.listdir(src_dir)
-exceptions = []
+jobs = []
 
-for i, folder in enumerate(plot_folders):
-    print(f"Copying files for {folder} ({i} of {len(plot_folders)})")
+for folder in plot_folders:
     if not any([
             os.path.isdir(os.path.join(src_dir, folder)) for f in [
                 "DJITerra", "Licor"
@@ -128,73 +165,63 @@ for i, folder in enumerate(plot_folders):
     
     plot = folder.lower()
     
-    for src, dst in tqdm(zip(sources, destinations)):
-        srcf = src.format(plot = folder)
-        dstf = dst.format(plot = plot)
-        exists = os.path.isfile(srcf)
-        
-        if exists and os.path.isfile(dstf):
-            equal = equal_content(srcf, dstf)
-            if not equal:
-                print(
-                    f"src: {srcf} and dst: {dstf} both exist but files " +
-                    "differ. Overwriting dst."
-                    )
-        else:
-            equal = False
-        
-        if overwrite or not equal:
-            try:
-                parent = os.path.dirname(dstf)
-                os.makedirs(parent, exist_ok = True)
-                shutil.copy(srcf, dstf)
-            
-            except Exception as e:
-                exceptions.append(e)
-                with open(os.path.join(src_dir, "move_files.err"), "wb") as f:
-                    pk.dump(exceptions, f, protocol = 4)
-                    print(e)
-        else:
-            print(
-                f"File already exists: {dstf}. Set overwrite=True to overwrite."
-                )
-
-# Copy TOC photos
-print("Copying TOC photos...")
+    for src, dst in zip(sources, destinations):
+        jobs.append((src.format(plot = folder), dst.format(plot = plot)))
+
+# TOC photos
 toc_photo_src = os.path.join(src_dir, "{plot}", "TOCPhotos")
 toc_photo_dst = os.path.join(airborne_dst, "visible_spectrum", "{plot}")
 
-for i, folder in enumerate(plot_folders):
-    print(f"Copying files for {folder} ({i + 1} of {len(plot_folders)})")
-    
+for folder in plot_folders:
     if not any([
             os.path.isdir(os.path.join(src_dir, folder)) for f in ["TOCPhotos"]
             ]) or folder in ["00_template", ["zz_misc"]]:
         continue
     
     plot = folder.lower()
-    src = toc_photo_src
-    dst = toc_photo_dst
-    
-    parent = os.path.dirname(dst).format(plot = plot)
-    os.makedirs(parent, exist_ok = True)
-    sources = glob(toc_photo_src.format(plot = folder) + "/*.JPG")
     
-    for src in sources:
+    for src in glob(toc_photo_src.format(plot = folder) + "/*.JPG"):
         dst = os.path.join(
             toc_photo_dst.format(plot = plot), os.path.basename(src).lower()
             )
-        
-        try:
-            shutil.copy(src, dst)
-        except Exception as e:
-            exceptions.append(e)
-            
-            with open(os.path.join(src_dir, "move_files.err"), "wb") as f:
-                pk.dump(exceptions, f, protocol = 4)
-                print(e)
-
+        jobs.append((src, dst))
+
+def sync_file(src, dst):
+    if os.path.isfile(dst) and not overwrite:
+        if equal_content(src, dst, manifest = manifest):
+            return "skipped"
+        print(
+            f"src: {src} and dst: {dst} both exist but files " +
+            "differ. Overwriting dst."
+            )
+    
+    copy_file(src, dst)
+    # Copied file has the same hash as the source
+    src_key = os.path.abspath(src)
+    if src_key in manifest:
+        stat = os.stat(dst)
+        manifest[os.path.abspath(dst)] = dict(
+            manifest[src_key], size = stat.st_size, mtime = stat.st_mtime_ns
+            )
+    return "copied"
+
+# Run jobs (resumes interrupted runs from the journal)
+print(f"Synchronising {len(jobs)} files from {len(plot_folders)} folders...")
+journal = SyncJournal(os.path.join(dst_dir, ".move_files_journal.sqlite"))
+
+try:
+    counts = run_sync(
+        jobs, journal, sync = sync_file, max_workers = max_workers,
+        progress = tqdm
+        )
+finally:
+    save_manifest(manifest, manifest_path)
+    report_path = os.path.join(src_dir, "move_files_errors.json")
+    report = journal.write_report(report_path)
+    journal.close()
+
+print(", ".join(f"{k}: {v}" for k, v in counts.items()))
 print(
-      f"All finished. View {os.path.join(src_dir, 'move_files.err')} to" +
-      " check for errors."
-      )
\ No newline at end of file
+      f"All finished. View {report_path} to check for errors " +
+      f"({len(report['failures'])} failed or missing files)."
+      )
@@ -2,13 +2,128 @@ import os
 import shutil
 import json
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import geopandas as gpd
 from dateutil import parser
 
+from djimeta import read_metadata_many
+
+class ExifTool():
+    """
+    Persistent exiftool process (-stay_open), so that metadata of many
+    files is read without launching a process per file.
+    """
+    sentinel = "{ready}"
+    
+    def __init__(self, executable = "exiftool"):
+        self.executable = executable
+        self.process = None
+    
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.executable, "-stay_open", "True", "-@", "-"],
+            stdin = subprocess.PIPE,
+            stdout = subprocess.PIPE,
+            stderr = subprocess.DEVNULL,
+            text = True,
+            encoding = "utf-8"
+        )
+    
+    def stop(self):
+        if self.process is not None:
+            self.process.stdin.write("-stay_open\nFalse\n")
+            self.process.stdin.flush()
+            self.process.communicate()
+            self.process = None
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+    
+    def execute(self, *args):
+        if self.process is None:
+            self.start()
+        self.process.stdin.write("\n".join(args) + "\n-execute\n")
+        self.process.stdin.flush()
+        lines = []
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("exiftool terminated unexpectedly.")
+            if line.strip() == self.sentinel:
+                break
+            lines.append(line)
+        return "".join(lines)
+    
+    def get_metadata(self, paths):
+        output = self.execute("-j", *paths)
+        if not output.strip():
+            return []
+        return json.loads(output)
+
+class MetadataCache():
+    """
+    Metadata records cached by path, size and modification time.
+    Optionally persisted to a JSON file.
+    """
+    def __init__(self, path = None, exiftool = None, batch_size = 200):
+        self.path = path
+        self.exiftool = ExifTool() if exiftool is None else exiftool
+        self.batch_size = batch_size
+        self.records = {}
+        if path is not None and os.path.isfile(path):
+            with open(path, "r", encoding = "utf-8") as f:
+                self.records = json.load(f)
+    
+    @staticmethod
+    def signature(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    
+    def get(self, paths):
+        """
+        Return metadata records for the given files. Uncached files are
+        read from their JPEG headers; files that cannot be parsed this way
+        are read in batches through a single exiftool process.
+        """
+        paths = [os.path.abspath(p) for p in paths]
+        signatures = {p: self.signature(p) for p in paths}
+        missing = [
+            p for p in paths if p not in self.records or
+            self.records[p]["signature"] != signatures[p]
+            ]
+        records, failed = read_metadata_many(missing)
+        for i in range(0, len(failed), self.batch_size):
+            records.extend(
+                self.exiftool.get_metadata(failed[i:i + self.batch_size])
+                )
+        for record in records:
+            source = os.path.abspath(record["SourceFile"])
+            self.records[source] = {
+                "signature": signatures.get(source),
+                "metadata": record
+                }
+        if missing:
+            self.save()
+        return {
+            p: self.records[p]["metadata"] for p in paths if p in self.records
+            }
+    
+    def save(self):
+        if self.path is not None:
+            with open(self.path, "w", encoding = "utf-8") as f:
+                json.dump(self.records, f)
+
+metadata_cache = MetadataCache()
+
 class Image():
-    def __init__(self, image_path):
+    def __init__(self, image_path, metadata = None):
+        self._metadata = metadata
         self.set_path(image_path)
     
     @property
@@ -34,6 +149,9 @@ class Image():
         metadata = self.full_metadata
     
     def _dms_to_decimal(self, dms_str):
+        if isinstance(dms_str, (int, float)):
+            # Numeric value (decimal degrees)
+            return float(dms_str)
         parts = dms_str.strip().split(" ")
         degrees = float(parts[0])
         minutes = float(parts[2].replace("'", ""))
@@ -47,21 +165,19 @@ class Image():
         return decimal
     
     def get_exif_data(self):
-        result = subprocess.run(
-            ["exiftool", "-j", self.image_path],
-            stdout = subprocess.PIPE,
-            stderr = subprocess.PIPE,
-            text = True
-        )
-        if result.returncode != 0:
-            raise RuntimeError(result.stderr)
+        if self._metadata is None:
+            records = metadata_cache.get([self.image_path])
+            if not records:
+                raise RuntimeError(
+                    f"Failed to read metadata of {self.image_path}."
+                    )
+            self._metadata = next(iter(records.values()))
         
-        data = json.loads(result.stdout)
-        return data[0]
+        return self._metadata
 
 class M4ProImage(Image):
-    def __init__(self, image_path):
-        Image.__init__(self, image_path)
+    def __init__(self, image_path, metadata = None):
+        Image.__init__(self, image_path, metadata)
     
     def set_attributes(self):
         metadata = self.full_metadata
@@ -73,8 +189,10 @@ class M4ProImage(Image):
         self.__dict__.update(shortened)
 
 class H30Image(Image):
-    def __init__(self, image_path):
-        Image.__init__(self, image_path)
+    required = ["LRFTargetLon", "LRFTargetLat", "LRFTargetAlt"]
+    
+    def __init__(self, image_path, metadata = None):
+        Image.__init__(self, image_path, metadata)
     
     def set_attributes(self):
         metadata = self.full_metadata
@@ -86,13 +204,13 @@ class H30Image(Image):
             "gpslon" : self._dms_to_decimal(metadata.get("GPSLongitude")),
             "absalt" : np.float64(metadata.get("AbsoluteAltitude")),
             "gbdeg" : np.float64(
-                np.array(metadata.get("GimbalDegree").split(","))
+                np.array(metadata.get("GimbalDegree", "nan").split(","))
                 ),
             "gbroll" : np.float64(metadata.get("GimbalRollDegree")),
             "gbyaw" : np.float64(metadata.get("GimbalYawDegree")),
             "gbpitch" : np.float64(metadata.get("GimbalPitchDegree")),
             "uavdeg" : np.float64(
-                np.array(metadata.get("FlightDegree").split(","))
+                np.array(metadata.get("FlightDegree", "nan").split(","))
                 ),
             "uavroll" : np.float64(metadata.get("FlightRollDegree")),
             "uavyaw" : np.float64(metadata.get("FlightYawDegree")),
@@ -104,42 +222,84 @@ class H30Image(Image):
         }
         self.__dict__.update(shortened)
 
+def image_from_metadata(image_path, metadata):
+    """
+    Create an image of the class matching the camera from a single
+    metadata record.
+    """
+    if all(metadata.get(key) is not None for key in H30Image.required):
+        img = H30Image(image_path, metadata)
+        location = (img.targetlon, img.targetlat)
+    else:
+        img = M4ProImage(image_path, metadata)
+        location = (img.gpslon, img.gpslat)
+    return img, location
+
 # Get plot boundaries
 fw_dir = os.path.join("D:", "FIELDWORK")
-plots = gpd.GeoDataFrame()
+max_workers = 4
+boundaries = []
 for plot in os.listdir(fw_dir):
     bbox_file = os.path.join(fw_dir, plot, f"{plot}_boundary.gpkg")
     if os.path.isfile(bbox_file):
-        bbox = gpd.read_file(bbox_file)
-        bbox.insert(0, "ID", [plot])
-        plots = gpd.GeoDataFrame(pd.concat([plots, bbox], ignore_index = True))
+        bbox = gpd.read_file(bbox_file).to_crs("EPSG:4326")
+        bbox.insert(0, "ID", [plot] * len(bbox))
+        boundaries.append(bbox[["ID", "geometry"]])
 
         if not os.path.exists(os.path.join(fw_dir, plot, "TOCPhotos")):
             os.makedirs(os.path.join(fw_dir, plot, "TOCPhotos"), exist_ok = True)
 
+plots = gpd.GeoDataFrame(
+    pd.concat(boundaries, ignore_index = True), crs = "EPSG:4326"
+    )
+
 sd_dir = os.path.join("E:", "DCIM")
-for path, n, filenames in os.walk(sd_dir):
-    if isinstance(path, str):
-        for filename in filenames:
-            file = os.path.join(path, filename)
-            if os.path.splitext(file)[1].lower() == ".jpg":
-                print(f"File: {file}")
-                try:
-                    img = H30Image(file)
-                    location = (img.targetlon, img.targetlat)
-                except:
-                    img = M4ProImage(file)
-                    location = (img.gpslon, img.gpslat)
-                point_gdf = gpd.GeoDataFrame(
-                    pd.DataFrame({"Row": [0]}),
-                    geometry = gpd.points_from_xy([location[0]], [location[1]]),
-                    crs = "EPSG:4326"
-                    )
-                joined = point_gdf.sjoin(plots)
-                if joined.shape[0] > 0:
-                    plot = joined["ID"].iloc[0]
-                    if not os.path.exists(os.path.join(fw_dir, plot, "TOCPhotos", filename)):
-                        print(f"Copying {filename} from {plot}")
-                        shutil.copyfile(file, os.path.join(fw_dir, plot, "TOCPhotos", filename))
-                    else:
-                        print("Exists in dst.")
\ No newline at end of file
+metadata_cache.path = os.path.join(fw_dir, "photo_metadata_cache.json")
+jpg_files = [
+    os.path.join(path, filename)
+    for path, n, filenames in os.walk(sd_dir)
+    for filename in filenames
+    if os.path.splitext(filename)[1].lower() == ".jpg"
+    ]
+
+try:
+    metadata = metadata_cache.get(jpg_files)
+finally:
+    metadata_cache.exiftool.stop()
+
+# Collect photo locations
+files = []
+locations = []
+for file in jpg_files:
+    record = metadata.get(os.path.abspath(file))
+    if record is None:
+        print(f"No metadata for {file}. Skipping.")
+        continue
+    
+    img, location = image_from_metadata(file, record)
+    files.append(file)
+    locations.append(location)
+
+# Assign all photos to plots at once
+locations = np.array(locations, dtype = float).reshape(-1, 2)
+photos = gpd.GeoDataFrame(
+    pd.DataFrame({"File": files}),
+    geometry = gpd.points_from_xy(locations[:, 0], locations[:, 1]),
+    crs = "EPSG:4326"
+    )
+joined = photos.sjoin(plots, how = "inner", predicate = "intersects")
+joined = joined[~joined.index.duplicated(keep = "first")]
+print(f"{len(joined)} of {len(jpg_files)} photos are located within plots.")
+
+# Copy photos concurrently
+def copy_photo(file, plot):
+    filename = os.path.basename(file)
+    dst = os.path.join(fw_dir, plot, "TOCPhotos", filename)
+    if os.path.exists(dst):
+        return f"Exists in dst: {filename}"
+    shutil.copyfile(file, dst)
+    return f"Copied {filename} from {plot}"
+
+with ThreadPoolExecutor(max_workers = max_workers) as executor:
+    for message in executor.map(copy_photo, joined["File"], joined["ID"]):
+        print(message)
@@ -1,6 +1,7 @@
 import os
 import shutil
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from warnings import warn
 
@@ -27,6 +28,20 @@ def parse_args():
         action = "store_true",
         help = "Overwrite existing files."
         )
+    parser.add_argument(
+        "-m", "--mode",
+        type = str,
+        choices = ["copy", "link"],
+        default = "copy",
+        help = "Copy the images or stage them as hardlinks (symlinks " +
+            "across devices, copies as last resort). Default is copy."
+        )
+    parser.add_argument(
+        "-w", "--workers",
+        type = int,
+        default = 8,
+        help = "Number of parallel file operations. Default is 8."
+        )
     
     return parser.parse_args()
 
@@ -61,7 +76,37 @@ def rename_img(filename, index = None, max_img = 1000):
     
     return out_name
 
-def copy_images(src_dir, dst_dir, overwrite = False):
+def stage_file(src, dst, mode = "copy"):
+    '''Materialise src at dst by copying or linking.
+
+    Args:
+        src (str): Source file.
+        dst (str): Destination file. Must not exist.
+        mode (str): "copy" or "link". In link mode, a hardlink is
+            created, or a symlink if src and dst are on different
+            devices. If linking is not possible, the file is copied.
+            Default is "copy".
+
+    Returns:
+        str: The method used ("hardlink", "symlink" or "copy").
+    '''
+    if mode == "link":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            # E.g., different devices or file systems without links
+            pass
+        try:
+            os.symlink(os.path.abspath(src), dst)
+            return "symlink"
+        except OSError:
+            pass
+    
+    shutil.copy2(src, dst)
+    return "copy"
+
+def copy_images(src_dir, dst_dir, overwrite = False, mode = "copy", workers = 8):
     '''Copy images to a new directory and rename them.
 
     Args:
@@ -69,6 +114,9 @@ def copy_images(src_dir, dst_dir, overwrite = False):
         dst_dir (str): Output directory.
         overwrite (bool): Overwrite existing files with the same name.
         Default is False.
+        mode (str): "copy" to copy the images or "link" to stage them as
+            links (see stage_file). Default is "copy".
+        workers (int): Number of parallel file operations. Default is 8.
     '''
     os.makedirs(dst_dir, exist_ok = True)
     if not isinstance(src_dir, list):
@@ -88,16 +136,16 @@ def copy_images(src_dir, dst_dir, overwrite = False):
             ) for file in image_paths
         ]
 
-    basename_setlist = list()
-    for file in file_basenames:
-        if file not in basename_setlist:
-            basename_setlist.append(file)
+    # Capture index by order of first occurrence
+    capture_indices = dict()
+    image_indices = [
+        capture_indices.setdefault(file, len(capture_indices))
+        for file in file_basenames
+        ]
     
-    image_indices = [basename_setlist.index(file) for file in file_basenames]
+    jobs = list()
     for index, filename, filepath in zip(
-        image_indices,
-        tqdm(image_files, desc = "Copying images", unit = "file"),
-        image_paths
+        image_indices, image_files, image_paths
         ):
         if len(src_dir) > 1:
             dst_file = rename_img(
@@ -108,16 +156,34 @@ def copy_images(src_dir, dst_dir, overwrite = False):
             dst_file = rename_img(os.path.join(dst_dir, filename))
         
         if filename.endswith(".TIF") or filename.endswith(".JPG"):
-            if os.path.isfile(dst_file):
+            if os.path.lexists(dst_file):
                 warn(f"File already exists: {dst_file}.")
                 
                 if not overwrite:
                     continue
+                
+                os.remove(dst_file)
             
-            shutil.copy2(filepath, dst_file)
+            jobs.append((filepath, dst_file))
+    
+    desc = "Copying images" if mode == "copy" else "Staging images"
+    methods = dict()
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        futures = [
+            executor.submit(stage_file, src, dst, mode) for src, dst in jobs
+            ]
+        for future in tqdm(futures, desc = desc, unit = "file"):
+            method = future.result()
+            methods[method] = methods.get(method, 0) + 1
+    
+    if mode == "link":
+        print(", ".join(f"{n} {method}s" for method, n in methods.items()))
     
     return
 
 if __name__ == "__main__":
     args = parse_args()
-    copy_images(args.src_dir, args.dst_dir, overwrite = args.overwrite)
+    copy_images(
+        args.src_dir, args.dst_dir, overwrite = args.overwrite,
+        mode = args.mode, workers = args.workers
+        )
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel, resumable file synchronisation.
+
+Copy jobs are recorded in a SQLite journal. Interrupted runs resume with
+the jobs that are not yet done, and failures are written to a structured
+error report instead of being pickled.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+BUFFER_SIZE = 16 * 1024 * 1024
+
+def copy_file(src, dst, buffer_size = BUFFER_SIZE):
+    """
+    Copy a file with a large buffer. The data is written to a temporary
+    file first, which replaces dst only once it is complete.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok = True)
+    tmp_dst = dst + ".part"
+
+    with open(src, "rb") as fsrc, open(tmp_dst, "wb") as fdst:
+        shutil.copyfileobj(fsrc, fdst, buffer_size)
+
+    src_size = os.path.getsize(src)
+    tmp_size = os.path.getsize(tmp_dst)
+    if tmp_size != src_size:
+        os.remove(tmp_dst)
+        raise OSError(
+            f"Incomplete copy of {src}: {tmp_size} of {src_size} bytes written."
+            )
+    shutil.copystat(src, tmp_dst)
+    os.replace(tmp_dst, dst)
+
+def file_hash(path, algo = "sha256", buffer_size = BUFFER_SIZE):
+    """
+    Hash of the full file content, read in chunks.
+    """
+    h = hashlib.new(algo)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    with open(path, "rb", buffering = 0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+
+    return h.hexdigest()
+
+def is_stale(src, dst, compare_hash = False):
+    """
+    Reason why dst needs to be (re-)copied from src, or None if it is up
+    to date. Files are compared by size and modification time and,
+    optionally, by content hash.
+    """
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return "new"
+    src_stat = os.stat(src)
+    if src_stat.st_size != dst_stat.st_size:
+        return "size"
+    if src_stat.st_mtime_ns > dst_stat.st_mtime_ns:
+        return "mtime"
+    if compare_hash and file_hash(src) != file_hash(dst):
+        return "hash"
+    return None
+
+class SyncJournal():
+    """
+    SQLite journal of copy jobs. Only the thread that created the journal
+    may use it.
+
+    Parameters
+    ----------
+    path : str
+        Path to the journal database.
+    """
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        self.path = path
+        self.con = sqlite3.connect(path)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "dst TEXT PRIMARY KEY, src TEXT NOT NULL, size INTEGER, "
+            "mtime INTEGER, status TEXT NOT NULL, error_type TEXT, "
+            "error TEXT, updated REAL)"
+            )
+        self.con.commit()
+
+    def is_done(self, src, dst):
+        """
+        Whether dst was synchronised from the current version of src.
+        """
+        row = self.con.execute(
+            "SELECT src, size, mtime, status FROM jobs WHERE dst = ?",
+            (dst,)
+            ).fetchone()
+        if row is None or row[3] not in ("copied", "skipped"):
+            return False
+        try:
+            stat = os.stat(src)
+        except OSError:
+            return False
+        return row[0] == src and row[1] == stat.st_size and \
+            row[2] == stat.st_mtime_ns and os.path.isfile(dst)
+
+    def record(self, src, dst, status, error = None):
+        try:
+            stat = os.stat(src)
+            size, mtime = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size = mtime = None
+        self.con.execute(
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                dst, src, size, mtime, status,
+                None if error is None else type(error).__name__,
+                None if error is None else str(error),
+                time.time()
+                )
+            )
+
+    def commit(self):
+        self.con.commit()
+
+    def close(self):
+        self.con.commit()
+        self.con.close()
+
+    def summary(self):
+        return dict(self.con.execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall())
+
+    def failures(self):
+        rows = self.con.execute(
+            "SELECT src, dst, status, error_type, error, updated FROM jobs "
+            "WHERE status IN ('failed', 'missing') ORDER BY src"
+            ).fetchall()
+        keys = ["src", "dst", "status", "error_type", "error", "time"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def write_report(self, path):
+        """
+        Write a JSON report with the job summary and all failed jobs.
+        """
+        report = {
+            "journal": os.path.abspath(self.path),
+            "summary": self.summary(),
+            "failures": self.failures()
+            }
+        with open(path, "w", encoding = "utf-8") as f:
+            json.dump(report, f, indent = 2)
+        return report
+
+def run_sync(
+        jobs, journal, sync = None, max_workers = 4, commit_every = 50,
+        progress = None
+        ):
+    """
+    Run copy jobs in a bounded thread pool.
+
+    Parameters
+    ----------
+    jobs : iterable of tuple
+        (src, dst) pairs.
+    journal : SyncJournal
+        Journal recording the outcome of each job. Jobs already done for
+        the current version of their source are not run again.
+    sync : callable, optional
+        Function sync(src, dst) performing a job and returning its status
+        (e.g., "copied" or "skipped"). Defaults to copy_file, which
+        always copies.
+    max_workers : int, optional
+        Number of concurrent I/O threads. The default is 4.
+    commit_every : int, optional
+        Number of finished jobs between journal commits. The default is
+        50.
+    progress : callable, optional
+        Wrapper for progress display (e.g., tqdm), called with the
+        iterator of finished jobs and the keyword argument total.
+
+    Returns
+    -------
+    dict
+        Number of jobs per status.
+    """
+    if sync is None:
+        def sync(src, dst):
+            copy_file(src, dst)
+            return "copied"
+
+    counts = {"resumed": 0}
+    pending = []
+    for src, dst in jobs:
+        if journal.is_done(src, dst):
+            counts["resumed"] += 1
+        elif not os.path.isfile(src):
+            journal.record(
+                src, dst, "missing",
+                FileNotFoundError(f"Source file not found: {src}")
+                )
+            counts["missing"] = counts.get("missing", 0) + 1
+        else:
+            pending.append((src, dst))
+    journal.commit()
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = {
+            executor.submit(sync, src, dst): (src, dst)
+            for src, dst in pending
+            }
+        finished = as_completed(futures)
+        if progress is not None:
+            finished = progress(finished, total = len(futures))
+        for i, future in enumerate(finished):
+            src, dst = futures[future]
+            try:
+                status = future.result()
+                journal.record(src, dst, status)
+            except Exception as e:
+                status = "failed"
+                journal.record(src, dst, status, e)
+                print(f"Failed to copy {src}: {e}")
+            counts[status] = counts.get(status, 0) + 1
+            if (i + 1) % commit_every == 0:
+                journal.commit()
+    journal.commit()
+
+    return counts
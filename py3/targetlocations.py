@@ -1,8 +1,36 @@
+import os
+import sys
+import glob
+import argparse
+import struct
 import subprocess
 import json
 import numpy as np
+import pandas as pd
+import geopandas as gpd
+from datetime import datetime
 from dateutil import parser
 
+from djimeta import read_metadata, read_metadata_many
+
+# Tags extracted in batch mode and their column names
+BATCH_TAGS = {
+    "CreateDate": "ctime",
+    "GPSLatitude": "gpslat",
+    "GPSLongitude": "gpslon",
+    "AbsoluteAltitude": "absalt",
+    "GimbalRollDegree": "gbroll",
+    "GimbalYawDegree": "gbyaw",
+    "GimbalPitchDegree": "gbpitch",
+    "FlightRollDegree": "uavroll",
+    "FlightYawDegree": "uavyaw",
+    "FlightPitchDegree": "uavpitch",
+    "LRFTargetDistance": "targetdist",
+    "LRFTargetLon": "targetlon",
+    "LRFTargetLat": "targetlat",
+    "LRFTargetAlt": "targetalt"
+}
+
 class H20Image():
     def __init__(self, image_path):
         self.set_path(image_path)
@@ -30,20 +58,19 @@ class H20Image():
         metadata = self.full_metadata
         
         shortened = {
-            "ctime" : parser.parse(metadata.get("CreateDate")),
-            "gpspos" : metadata.get("GPSPosition"),
+            "ctime" : self._parse_date(metadata.get("CreateDate")),
+            "gpspos" : metadata.get(
+                "GPSPosition",
+                f"{metadata.get('GPSLatitude')} {metadata.get('GPSLongitude')}"
+                ),
             "gpslat" : self._dms_to_decimal(metadata.get("GPSLatitude")),
             "gpslon" : self._dms_to_decimal(metadata.get("GPSLongitude")),
             "absalt" : np.float64(metadata.get("AbsoluteAltitude")),
-            "gbdeg" : np.float64(
-                np.array(metadata.get("GimbalDegree").split(","))
-                ),
+            "gbdeg" : self._split_degrees(metadata.get("GimbalDegree")),
             "gbroll" : np.float64(metadata.get("GimbalRollDegree")),
             "gbyaw" : np.float64(metadata.get("GimbalYawDegree")),
             "gbpitch" : np.float64(metadata.get("GimbalPitchDegree")),
-            "uavdeg" : np.float64(
-                np.array(metadata.get("FlightDegree").split(","))
-                ),
+            "uavdeg" : self._split_degrees(metadata.get("FlightDegree")),
             "uavroll" : np.float64(metadata.get("FlightRollDegree")),
             "uavyaw" : np.float64(metadata.get("FlightYawDegree")),
             "uavpitch" : np.float64(metadata.get("FlightPitchDegree")),
@@ -54,8 +81,15 @@ class H20Image():
         }
         self.__dict__.update(shortened)
     
-    def _dms_to_decimal(self, dms_str):
-        parts = dms_str.strip().split(" ")
+    def _dms_to_decimal(self, dms):
+        # Numeric values as returned by djimeta or exiftool -n
+        if dms is None or isinstance(dms, (int, float)):
+            return dms if dms is None else float(dms)
+        try:
+            return float(dms)
+        except ValueError:
+            pass
+        parts = dms.strip().split(" ")
         degrees = float(parts[0])
         minutes = float(parts[2].replace("'", ""))
         seconds = float(parts[3].replace('"', ""))
@@ -67,9 +101,29 @@ class H20Image():
         
         return decimal
     
+    def _parse_date(self, date):
+        # EXIF dates use colons, which dateutil would read as a time
+        try:
+            return datetime.strptime(date, "%Y:%m:%d %H:%M:%S")
+        except ValueError:
+            return parser.parse(date)
+    
+    def _split_degrees(self, degrees):
+        if degrees is None:
+            return None
+        return np.float64(np.array(str(degrees).split(",")))
+    
     def get_exif_data(self):
+        # Read the JPEG header directly; exiftool only as fallback
+        try:
+            metadata = read_metadata(self.image_path)
+        except (OSError, struct.error):
+            metadata = None
+        if metadata is not None and "LRFTargetLon" in metadata:
+            return metadata
+        
         result = subprocess.run(
-            ["exiftool", "-j", self.image_path],
+            ["exiftool", "-j", "-n", self.image_path],
             stdout = subprocess.PIPE,
             stderr = subprocess.PIPE,
             text = True
@@ -80,72 +134,207 @@ class H20Image():
         data = json.loads(result.stdout)
         return data[0]
 
-# Example usage
-plot = "Uttigen_01"
-image_path = os.path.join(
-    "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/org/fieldwork/Valais/img",
-    "DJI_20250617112457_0001_Z.JPG"
-)
-image = H20Image(image_path)
-image.target_location
-
-import os, shutil, folium
-dir_src = os.path.join(
-    "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/org/fieldwork/Valais/img",
-    plot
-    )
-dir_dst = os.path.join(
-    "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/org/fieldwork/Valais/img",
-    plot,
-    "Images"
-)
-
-if not os.path.exists(dir_dst):
-    os.makedirs(dir_dst)
-
-if not os.path.exists(os.path.join(dir_dst, "files")):
-    os.makedirs(os.path.join(dir_dst, "files"))
-
-for file in os.listdir(dir_src):
-    if file.endswith(".JPG"):
-        src_file = os.path.join(dir_src, file)
-        dst_file = os.path.join(dir_dst, "files", file)
-        shutil.copy(src_file, dst_file)
-        print(f"Copied {src_file} to {dst_file}")
-
-points = []
-for file in os.listdir(os.path.join(dir_dst, "files")):
-    if file.endswith("_Z.JPG"):
-        image = H20Image(os.path.join(dir_dst, "files", file))
-        location = image.target_location
-        points.append(
-            {
-                "name": file,
-                "lon": location[0],
-                "lat": location[1],
-                "alt": location[2],
-                "ctime": image.ctime.isoformat(),
-                "image": "files/" + file
-            }
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description = "Extract LRF target locations of H20/H30 images " +
+            "into a single GeoPackage or GeoParquet table."
+        )
+    parser.add_argument(
+        "-src", "--src_dir", type = str, nargs = "+",
+        help = "Directories containing the images."
+        )
+    parser.add_argument(
+        "-dst", "--dst", type = str,
+        help = "Output table (.gpkg or .parquet). Existing tables are " +
+            "extended by images not yet contained."
         )
+    parser.add_argument(
+        "-p", "--pattern", type = str, default = "*.JPG",
+        help = "Image file name pattern. Defaults to *.JPG."
+        )
+    return parser.parse_args()
 
-meanlat = np.mean([pt["lat"] for pt in points])
-meanlon = np.mean([pt["lon"] for pt in points])
+def read_metadata_batch(paths, batch_size = 500):
+    """
+    Read the BATCH_TAGS of many images from their JPEG headers. Images
+    that cannot be parsed are read with one exiftool call per batch.
+    Values are returned numerically (exiftool -n).
+    """
+    records, failed = read_metadata_many(paths)
+    tags = [f"-{tag}" for tag in BATCH_TAGS]
+    for i in range(0, len(failed), batch_size):
+        result = subprocess.run(
+            ["exiftool", "-j", "-n", *tags, *failed[i:i + batch_size]],
+            stdout = subprocess.PIPE,
+            stderr = subprocess.PIPE,
+            text = True
+        )
+        if result.stdout.strip():
+            records.extend(json.loads(result.stdout))
+    return records
 
-m = folium.Map(location = [meanlat, meanlon], zoom_start = 50)
+def extract_targets(paths):
+    """
+    Build a table of LRF target locations, gimbal and UAV attitude and
+    capture time for many images at once.
 
-for pt in points:
-    html = f"""
-    <b>{pt['name']}</b><br>
-    Elevation: {pt['alt']} m<br>
-    <img src='{pt['image']}' style='width:1024px; height:auto;'/>
+    Parameters
+    ----------
+    paths : list of str
+        Image files.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        One row per image with target points (EPSG:4326) as geometry.
     """
-    folium.Marker(
-        location = [pt["lat"], pt["lon"]],
-        popup = folium.Popup(
-            html
+    records = read_metadata_batch(paths)
+    df = pd.DataFrame(records, columns = ["SourceFile", *BATCH_TAGS])
+    df = df.rename(columns = {"SourceFile": "file", **BATCH_TAGS})
+    df["file"] = [os.path.abspath(f) for f in df["file"]]
+    df["ctime"] = pd.to_datetime(
+        df["ctime"], format = "%Y:%m:%d %H:%M:%S", errors = "coerce"
+        )
+    numeric = [c for c in BATCH_TAGS.values() if c != "ctime"]
+    df[numeric] = df[numeric].apply(pd.to_numeric, errors = "coerce")
+    stats = [os.stat(f) for f in df["file"]]
+    df["size"] = [st.st_size for st in stats]
+    df["mtime"] = [st.st_mtime_ns for st in stats]
+    return gpd.GeoDataFrame(
+        df,
+        geometry = gpd.points_from_xy(
+            df["targetlon"], df["targetlat"], df["targetalt"]
             ),
-    ).add_to(m)
+        crs = "EPSG:4326"
+        )
+
+def read_target_table(dst):
+    if not os.path.isfile(dst):
+        return None
+    if os.path.splitext(dst)[1].lower() == ".parquet":
+        return gpd.read_parquet(dst)
+    return gpd.read_file(dst)
+
+def update_target_table(src_dirs, dst, pattern = "*.JPG"):
+    """
+    Extract target locations of all images in the given directories and
+    write them to dst. Images already in an existing table (same path,
+    size and mtime) are not read again; new images are appended.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        Rows added to the table.
+    """
+    paths = sorted(set(
+        os.path.abspath(f) for d in src_dirs
+        for f in glob.glob(os.path.join(d, pattern))
+        ))
+    existing = read_target_table(dst)
+    if existing is not None:
+        known = set(zip(existing["file"], existing["size"], existing["mtime"]))
+        stats = {p: os.stat(p) for p in paths}
+        paths = [
+            p for p in paths
+            if (p, stats[p].st_size, stats[p].st_mtime_ns) not in known
+            ]
+        stale = existing["file"].isin(paths)
+    print(f"Reading {len(paths)} new or changed images...")
+    if not paths:
+        return None
+    new = extract_targets(paths)
+
+    if os.path.splitext(dst)[1].lower() == ".parquet":
+        if existing is not None:
+            new_table = pd.concat(
+                [existing[~stale], new], ignore_index = True
+                )
+        else:
+            new_table = new
+        new_table.to_parquet(dst)
+    elif existing is not None and not stale.any():
+        new.to_file(dst, driver = "GPKG", mode = "a")
+    else:
+        table = new if existing is None else gpd.GeoDataFrame(
+            pd.concat([existing[~stale], new], ignore_index = True),
+            crs = "EPSG:4326"
+            )
+        table.to_file(dst, driver = "GPKG")
+    print(f"{len(new)} images written to {dst}.")
+    return new
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        args = parse_args()
+        update_target_table(args.src_dir, args.dst, pattern = args.pattern)
+        sys.exit(0)
+
+    # Example usage
+    plot = "Uttigen_01"
+    image_path = os.path.join(
+        "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/org/fieldwork/Valais/img",
+        "DJI_20250617112457_0001_Z.JPG"
+    )
+    image = H20Image(image_path)
+    image.target_location
+
+    import shutil, folium
+    dir_src = os.path.join(
+        "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/org/fieldwork/Valais/img",
+        plot
+        )
+    dir_dst = os.path.join(
+        "D:/onedrive/OneDrive - Eidg. Forschungsanstalt WSL/switchdrive/PhD/org/fieldwork/Valais/img",
+        plot,
+        "Images"
+    )
+
+    if not os.path.exists(dir_dst):
+        os.makedirs(dir_dst)
+
+    if not os.path.exists(os.path.join(dir_dst, "files")):
+        os.makedirs(os.path.join(dir_dst, "files"))
+
+    for file in os.listdir(dir_src):
+        if file.endswith(".JPG"):
+            src_file = os.path.join(dir_src, file)
+            dst_file = os.path.join(dir_dst, "files", file)
+            shutil.copy(src_file, dst_file)
+            print(f"Copied {src_file} to {dst_file}")
+
+    points = []
+    for file in os.listdir(os.path.join(dir_dst, "files")):
+        if file.endswith("_Z.JPG"):
+            image = H20Image(os.path.join(dir_dst, "files", file))
+            location = image.target_location
+            points.append(
+                {
+                    "name": file,
+                    "lon": location[0],
+                    "lat": location[1],
+                    "alt": location[2],
+                    "ctime": image.ctime.isoformat(),
+                    "image": "files/" + file
+                }
+            )
+
+    meanlat = np.mean([pt["lat"] for pt in points])
+    meanlon = np.mean([pt["lon"] for pt in points])
+
+    m = folium.Map(location = [meanlat, meanlon], zoom_start = 50)
+
+    for pt in points:
+        html = f"""
+        <b>{pt['name']}</b><br>
+        Elevation: {pt['alt']} m<br>
+        <img src='{pt['image']}' style='width:1024px; height:auto;'/>
+        """
+        folium.Marker(
+            location = [pt["lat"], pt["lon"]],
+            popup = folium.Popup(
+                html
+                ),
+        ).add_to(m)
 
-os.chdir(dir_dst)
-m.save("image_map.html")
+    os.chdir(dir_dst)
+    m.save("image_map.html")